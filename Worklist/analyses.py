@@ -0,0 +1,251 @@
+"""
+This file describes some classic data-flow analyses in terms of the engine in
+solver.py: each analysis is a lattice, a direction and a transfer function.
+The descriptions only use the methods `definition` and `uses` of
+instructions, plus their IDs; hence, they work with the instructions of any
+of our labs.
+"""
+
+from solver import Analysis, GenKillAnalysis, UnionLattice, IntersectionLattice
+from solver import UNIVERSE
+from solver import FORWARD, BACKWARD, solve, name_out
+from lang import BinOp
+
+# Operators whose operands can be swapped:
+COMMUTATIVE = {"+", "*"}
+
+
+class ReachingDefinitions(GenKillAnalysis):
+    """
+    Reaching definitions: OUT[p] = (v, p) + (IN[p] - (v, _)).
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('c', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> sol, num_evals = solve(ReachingDefinitions(), [i0, i1])
+        >>> sorted(sol['IN_1']), sorted(sol['OUT_1'])
+        ([('c', 0)], [('c', 1)])
+    """
+
+    lattice = UnionLattice()
+
+    direction = FORWARD
+
+    def gen(self, inst):
+        return {(v, inst.ID) for v in inst.definition()}
+
+    def kill(self, inst):
+        return inst.definition()
+
+    def key(self, element):
+        return element[0]
+
+
+class Liveness(GenKillAnalysis):
+    """
+    Liveness analysis: IN[p] = uses(p) + (OUT[p] - defs(p)).
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> sol, num_evals = solve(Liveness(), [i0, i1])
+        >>> f"IN_0: {sorted(sol['IN_0'])}, OUT_0: {sorted(sol['OUT_0'])}"
+        "IN_0: ['a', 'b'], OUT_0: ['a', 'c']"
+    """
+
+    lattice = UnionLattice()
+
+    direction = BACKWARD
+
+    def gen(self, inst):
+        return inst.uses()
+
+    def kill(self, inst):
+        return inst.definition()
+
+    def transfer(self, inst, fact):
+        # The same as the default transfer function, as keys are variables:
+        return inst.uses() | (fact - inst.definition())
+
+
+class Dominance(Analysis):
+    """
+    Dominance analysis: D[n] = {n} U Intersection(D[p], for p in n.preds).
+    The dominators of n are given by OUT[n].
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> dom = dominators([c0, repeat, bt, c1, answer])
+        >>> [sorted(dom[str(i)]) for i in range(5)]
+        [[0], [0, 1], [0, 1, 2], [0, 1, 2, 3], [0, 1, 2, 4]]
+    """
+
+    lattice = IntersectionLattice()
+
+    direction = FORWARD
+
+    version = 2
+
+    def transfer(self, inst, fact):
+        return fact if fact is UNIVERSE else fact | {inst.ID}
+
+    def boundary(self, inst):
+        return set()
+
+
+def expression(inst):
+    """
+    The expression that `inst` computes, as a triple (operator, operand,
+    operand), or None if `inst` is not a binary operation. Operands of
+    commutative operators are sorted, so that 'a + b' and 'b + a' are the
+    same expression. Unlike the other analyses of this file, expressions
+    rely on the attributes `src0` and `src1` of binary operations.
+
+    Example:
+        >>> from lang import Add, Lth, Bt
+        >>> expression(Add('x', 'b', 'a')), expression(Lth('x', 'b', 'a'))
+        (('+', 'a', 'b'), ('<', 'b', 'a'))
+        >>> expression(Bt('x')) is None
+        True
+    """
+    if not isinstance(inst, BinOp):
+        return None
+    op = inst.get_opcode()
+    if op in COMMUTATIVE and inst.src1 < inst.src0:
+        return (op, inst.src1, inst.src0)
+    return (op, inst.src0, inst.src1)
+
+
+class AvailableExpressions(Analysis):
+    """
+    Available expressions: an expression is available at a program point if
+    it is computed on every path that reaches the point, and its operands
+    are not redefined after the last computation. The analysis is a must
+    analysis: facts are joined by intersection.
+
+        OUT[p] = (IN[p] - {e | e uses v}) + {e}, for p: v = e
+        IN[p] = Intersection(OUT[q], for q in p.preds)
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> i1 = Bt('c')
+        >>> i2 = Mul('a', 'a', 'b')
+        >>> i3 = Add('y', 'b', 'a')
+        >>> i0.add_next(i1)
+        >>> i1.add_true_next(i2)
+        >>> i1.add_next(i3)
+        >>> i2.add_next(i3)
+        >>> sol, num_evals = solve(AvailableExpressions(), [i0, i1, i2, i3])
+        >>> sol['IN_2'], sol['OUT_2'], sol['IN_3']
+        ({('+', 'a', 'b')}, set(), set())
+    """
+
+    lattice = IntersectionLattice()
+
+    direction = FORWARD
+
+    version = 2
+
+    def transfer(self, inst, fact):
+        if fact is UNIVERSE:
+            return fact
+        defs = inst.definition()
+        kept = {e for e in fact if e[1] not in defs and e[2] not in defs}
+        e = expression(inst)
+        if e is not None and e[1] not in defs and e[2] not in defs:
+            kept.add(e)
+        return kept
+
+    def boundary(self, inst):
+        return set()
+
+
+class VeryBusyExpressions(Analysis):
+    """
+    Very busy expressions: an expression is very busy at a program point if
+    every path that leaves the point computes it before redefining its
+    operands. The analysis is a backward must analysis:
+
+        IN[p] = {e} + (OUT[p] - {e | e uses v}), for p: v = e
+        OUT[p] = Intersection(IN[q], for q in p.nexts)
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Bt('c')
+        >>> i1 = Add('x', 'a', 'b')
+        >>> i2 = Mul('z', 'b', 'a')
+        >>> i3 = Add('y', 'b', 'a')
+        >>> i4 = Add('b', 'b', 'a')
+        >>> i0.add_true_next(i1)
+        >>> i0.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> i3.add_next(i4)
+        >>> sol, num_evals = solve(VeryBusyExpressions(), [i0, i1, i2, i3, i4])
+        >>> sol['OUT_0'], sol['OUT_1'], sol['IN_4']
+        ({('+', 'a', 'b')}, set(), {('+', 'a', 'b')})
+        >>> sorted(sol['IN_2'])
+        [('*', 'a', 'b'), ('+', 'a', 'b')]
+
+        A branch whose fall-through is None might end the program:
+        >>> i5 = Bt('p')
+        >>> i4.add_next(i5)
+        >>> i5.add_true_next(i0)
+        >>> sol, num_evals = solve(VeryBusyExpressions(), [i0, i1, i2, i3, i4, i5])
+        >>> sol['OUT_5'], sol['IN_0']
+        (set(), {('+', 'a', 'b')})
+    """
+
+    lattice = IntersectionLattice()
+
+    direction = BACKWARD
+
+    version = 2
+
+    def transfer(self, inst, fact):
+        if fact is UNIVERSE:
+            return fact
+        defs = inst.definition()
+        kept = {e for e in fact if e[1] not in defs and e[2] not in defs}
+        e = expression(inst)
+        if e is not None:
+            kept.add(e)
+        return kept
+
+    def boundary(self, inst):
+        return set()
+
+
+def dominators(insts):
+    """
+    Returns a dictionary that maps the ID of each instruction (as a string,
+    like in the Dominance lab) to the set of IDs of its dominators.
+    """
+    env, _ = solve(Dominance(), insts)
+    return {str(inst.ID): env[name_out(inst.ID)] for inst in insts}
+
+
+ANALYSES = {
+    "reaching_defs": ReachingDefinitions,
+    "liveness": Liveness,
+    "dominance": Dominance,
+}
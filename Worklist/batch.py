@@ -0,0 +1,346 @@
+"""
+This driver processes a bundle of programs (see bundle.py) in a single
+process, writing one JSON record per program to the standard output. Running
+many programs in the same process saves the cost of starting the interpreter,
+and of importing modules, for each one of them. Usage:
+
+    python3 batch.py < bundle.txt > results.jsonl
+    python3 batch.py --cache < bundle.txt > results.jsonl
+
+To distribute the programs among a pool of processes, each one solving the
+analyses of analyses.py, do:
+
+    python3 batch.py --workers=4 --analyses=liveness,dominance < bundle.txt
+
+Records are printed in the order of the bundle, whatever the number of
+workers, and the throughput of each worker is printed in the standard error.
+The analyses of analyses.py are reaching definitions, liveness and dominance.
+The other analyses of the course are solved by the drivers of their labs:
+constant propagation (../ConstantPropagation), alias analysis
+(../AliasAnalysis) and type checking (../TypeChecking). To run the driver of
+a lab on each program of a bundle written in the language of that lab (see
+labs.py), possibly in a pool of processes, do:
+
+    python3 batch.py --bundle ../AliasAnalysis/tests/*.txt > alias.txt
+    python3 batch.py --lab=../AliasAnalysis --workers=4 < alias.txt
+
+With `--cache-results`, the outputs of the driver of the lab are cached (see
+labs.py), and programs that did not change are not run again.
+
+To build a bundle out of the test files, do:
+
+    python3 batch.py --bundle tests/*.txt > bundle.txt
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+import lang
+import bundle
+import driver
+import parallel_parser
+import solver
+
+from analyses import ANALYSES
+
+
+def compare_solvers(program):
+    """
+    Runs the chaotic solver and the worklist solver on the program, as the
+    main driver does, and reports the number of evaluations of each one.
+    """
+    (env_chaotic, n_chaotic) = driver.chaotic_solver(program)
+    (env_worklist, n_worklist) = driver.worklist_solver(program)
+    return {
+        "same_env": env_chaotic == env_worklist,
+        "n_chaotic": n_chaotic,
+        "n_worklist": n_worklist,
+    }
+
+
+def parse(lines):
+    """
+    Parses a program of the bundle, without creating any process.
+    """
+    return parallel_parser.load_program(lines)
+
+
+def run_bundle(programs, analyze=compare_solvers, parse=parse):
+    """
+    Parses and analyzes each program in the list of pairs (name, lines), and
+    yields one record per program. Errors are reported in the record of the
+    program that caused them, and do not stop the batch.
+
+    Example:
+        >>> programs = [('p0', ['{"a": 1}', 'x = add a a']), ('p1', ['{}', 'x'])]
+        >>> count = lambda program: {"insts": len(program)}
+        >>> for record in run_bundle(programs, count):
+        ...     print(record)
+        {'name': 'p0', 'insts': 1}
+        {'name': 'p1', 'error': 'Invalid instruction: x'}
+    """
+    for name, lines in programs:
+        lang.Inst.next_index = 0
+        record = {"name": name}
+        try:
+            _, program = parse(lines)
+            record.update(analyze(program))
+        except Exception as e:
+            record["error"] = str(e)
+        yield record
+
+
+def digest(table):
+    """
+    A short fingerprint of the facts in `table`, which does not depend on the
+    order of the elements of each fact. Two runs give the same fingerprint if,
+    and only if (barring collisions), they find the same solution.
+
+    Example:
+        >>> from lang import Inst, Add
+        >>> Inst.next_index = 0
+        >>> insts = [Add('x', 'a', 'b'), Add('y', 'x', 'x')]
+        >>> t0, t1 = solver.FactTable(insts, set()), solver.FactTable(insts, set())
+        >>> t0['OUT_1'], t1['OUT_1'] = {'x', 'y'}, {'y', 'x'}
+        >>> digest(t0) == digest(t1), len(digest(t0))
+        (True, 16)
+    """
+    h = hashlib.sha1()
+    for fact in table.facts:
+        if fact is not solver.UNIVERSE:
+            fact = sorted(fact, key=repr)
+        h.update(repr(fact).encode())
+        h.update(b";")
+    return h.hexdigest()[:16]
+
+
+def solve_analyses(program, analyses=tuple(ANALYSES)):
+    """
+    Solves each analysis of analyses.py named in `analyses`, and reports the
+    number of evaluations, the number of elements in all the facts, and the
+    fingerprint of the solution. The facts themselves are not returned, as
+    they might be much larger than the program.
+    """
+    record = {"insts": len(program)}
+    for name in analyses:
+        table, num_evals = solver.solve(ANALYSES[name](), program)
+        record[name] = {
+            "evals": num_evals,
+            "elements": sum(
+                len(fact) for fact in table.facts if fact is not solver.UNIVERSE
+            ),
+            "digest": digest(table),
+        }
+    return record
+
+
+def analyze_task(task):
+    """
+    Runs in a worker: analyzes one program, given as a triple (name, lines,
+    analyses), and returns the ID of the worker process, the time it took,
+    the number of instructions of the program, and its record.
+    """
+    name, lines, analyses = task
+    start = time.perf_counter()
+    analyze = lambda program: solve_analyses(program, analyses)
+    record = next(run_bundle([(name, lines)], analyze))
+    seconds = time.perf_counter() - start
+    return (os.getpid(), seconds, record.get("insts", 0), record)
+
+
+def run_pool(run_task, tasks, num_workers, throughput, initializer=None, initargs=()):
+    """
+    Runs `run_task` on each task, in a pool of `num_workers` processes, and
+    yields the records of the tasks in their order. Each worker calls
+    `initializer(*initargs)` once, before its first task. Tasks return
+    quadruples (worker, seconds, instructions, record); if a dictionary
+    `throughput` is given, then it maps each worker to the number of
+    programs and of instructions that it analyzed, and to the time that it
+    spent.
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    if num_workers <= 1 or len(tasks) <= 1:
+        if initializer:
+            initializer(*initargs)
+        results = map(run_task, tasks)
+        pool = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(
+            max_workers=min(num_workers, len(tasks)),
+            initializer=initializer,
+            initargs=initargs,
+        )
+        results = pool.map(run_task, tasks)
+    try:
+        for pid, seconds, insts, record in results:
+            if throughput is not None:
+                worker = throughput.setdefault(
+                    pid, {"programs": 0, "insts": 0, "seconds": 0.0}
+                )
+                worker["programs"] += 1
+                worker["insts"] += insts
+                worker["seconds"] += seconds
+            yield record
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+def run_parallel(programs, analyses=tuple(ANALYSES), num_workers=None, throughput=None):
+    """
+    The same as `run_bundle(programs, analyze)`, where `analyze` solves the
+    given analyses, but the programs are analyzed in a pool of `num_workers`
+    processes (see `run_pool`). Records are yielded in the order of
+    `programs`.
+
+    Example:
+        >>> programs = [(f'p{i}', ['{}', 'x = add a b', 'y = mul x a']) for i in range(4)]
+        >>> programs.append(('bad', ['{}', 'x']))
+        >>> throughput = {}
+        >>> records = list(run_parallel(programs, ['liveness'], 2, throughput))
+        >>> [record['name'] for record in records]
+        ['p0', 'p1', 'p2', 'p3', 'bad']
+        >>> records[0]['liveness'] == records[3]['liveness'], records[4]
+        (True, {'name': 'bad', 'error': 'Invalid instruction: x'})
+        >>> sum(worker['programs'] for worker in throughput.values())
+        5
+    """
+    for name in analyses:
+        if name not in ANALYSES:
+            raise ValueError(f"Unknown analysis: {name}")
+    tasks = [(name, lines, tuple(analyses)) for name, lines in programs]
+    return run_pool(analyze_task, tasks, num_workers, throughput)
+
+
+LAB_RUNNER = None
+
+
+def start_lab(directory, cache_results=False):
+    """
+    Runs in a worker: loads the driver of the lab in `directory`, which the
+    worker then uses for all its programs (see labs.py). If `cache_results`
+    is True, then the outputs of the driver go through the cache.
+    """
+    global LAB_RUNNER
+    from labs import LabRunner
+
+    results = None
+    if cache_results:
+        import cache
+
+        results = cache.Cache()
+    LAB_RUNNER = LabRunner(directory, results=results)
+
+
+def lab_task(task):
+    """
+    Runs in a worker: runs the driver of the lab on one program, given as a
+    pair (name, lines).
+    """
+    from labs import run_lab
+
+    start = time.perf_counter()
+    record = next(run_lab([task], LAB_RUNNER))
+    seconds = time.perf_counter() - start
+    insts = sum(1 for line in task[1][1:] if line.strip())
+    return (os.getpid(), seconds, insts, record)
+
+
+def run_lab_parallel(
+    programs, directory, num_workers=1, throughput=None, cache_results=False
+):
+    """
+    Runs the driver of the lab in `directory` on each program, in a pool of
+    `num_workers` processes, and yields one record per program, in the order
+    of `programs`. Each worker loads the modules of the lab only once.
+
+    Example:
+        >>> import os, tempfile
+        >>> lab = tempfile.mkdtemp()
+        >>> with open(os.path.join(lab, "driver.py"), "w") as f:
+        ...     _ = f.write("import sys\\nprint(len(sys.stdin.readlines()))\\n")
+        >>> programs = [(f'p{i}', ['{}'] + ['x = add a b'] * i) for i in range(3)]
+        >>> throughput = {}
+        >>> for record in run_lab_parallel(programs, lab, 2, throughput):
+        ...     print(record)
+        {'name': 'p0', 'output': '1\\n'}
+        {'name': 'p1', 'output': '2\\n'}
+        {'name': 'p2', 'output': '3\\n'}
+        >>> sum(worker['insts'] for worker in throughput.values())
+        3
+    """
+    tasks = list(programs)
+    initargs = (directory, cache_results)
+    return run_pool(lab_task, tasks, num_workers, throughput, start_lab, initargs)
+
+
+def throughput_report(throughput):
+    """
+    One line per worker, in the order in which the workers first finished a
+    program, with the number of instructions analyzed per second.
+
+    Example:
+        >>> print(throughput_report({42: {"programs": 2, "insts": 300, "seconds": 0.5}}))
+        worker 0 (pid 42): 2 programs, 300 insts, 0.500 s, 600 insts/s
+    """
+    lines = []
+    for number, (pid, worker) in enumerate(throughput.items()):
+        rate = worker["insts"] / worker["seconds"] if worker["seconds"] else 0
+        lines.append(
+            f"worker {number} (pid {pid}): {worker['programs']} programs, "
+            f"{worker['insts']} insts, {worker['seconds']:.3f} s, {rate:.0f} insts/s"
+        )
+    return "\n".join(lines)
+
+
+def option(name, default=None):
+    """
+    The value of a command-line flag written as `--name=value`.
+    """
+    prefix = f"--{name}="
+    for arg in sys.argv[1:]:
+        if arg.startswith(prefix):
+            return arg[len(prefix) :]
+    return default
+
+
+if __name__ == "__main__":
+    if "--bundle" in sys.argv:
+        paths = [arg for arg in sys.argv[1:] if arg != "--bundle"]
+        bundle.files2bundle(paths, sys.stdout)
+        sys.exit(0)
+    programs = bundle.read_bundle(sys.stdin.read().splitlines())
+    workers, analyses, lab = option("workers"), option("analyses"), option("lab")
+    if lab:
+        throughput = {}
+        num_workers = int(workers) if workers else 1
+        cache_results = "--cache-results" in sys.argv
+        for record in run_lab_parallel(
+            programs, lab, num_workers, throughput, cache_results
+        ):
+            print(json.dumps(record))
+        if workers:
+            print(throughput_report(throughput), file=sys.stderr)
+        sys.exit(0)
+    if workers or analyses:
+        analyses = analyses.split(",") if analyses else tuple(ANALYSES)
+        throughput = {}
+        num_workers = int(workers) if workers else None
+        for record in run_parallel(programs, analyses, num_workers, throughput):
+            print(json.dumps(record))
+        print(throughput_report(throughput), file=sys.stderr)
+        sys.exit(0)
+    program_cache = None
+    if "--cache" in sys.argv:
+        import cache
+
+        program_cache = cache.Cache()
+        parse = program_cache.file2cfg_and_env
+    for record in run_bundle(programs, parse=parse):
+        print(json.dumps(record))
+    if program_cache:
+        print(f"Cache: {program_cache.report()}", file=sys.stderr)
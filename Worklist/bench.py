@@ -0,0 +1,739 @@
+"""
+This file contains benchmarks for the data-flow engine. Programs are either
+the ones in the tests folder, or random programs built by `random_program`.
+Usage:
+
+    python3 bench.py solvers [num_insts]
+    python3 bench.py strategies [num_insts]
+    python3 bench.py bitsets [num_insts]
+    python3 bench.py matrix [num_insts]
+    python3 bench.py depgraph [max_eqs]
+    python3 bench.py facts [num_insts]
+    python3 bench.py delta [num_insts]
+    python3 bench.py scc [num_insts]
+    python3 bench.py incremental [num_insts]
+    python3 bench.py blocks [num_insts]
+    python3 bench.py ssa [num_insts]
+    python3 bench.py hashcons [num_insts]
+    python3 bench.py collapse [num_insts]
+    python3 bench.py chains [num_insts]
+    python3 bench.py demand [num_insts]
+    python3 bench.py parallel [num_insts]
+    python3 bench.py results [num_insts]
+    python3 bench.py cse [num_insts]
+    python3 bench.py hoist [num_insts]
+"""
+
+import gc
+import json
+import random
+import sys
+import time
+
+import lang
+import parallel_parser
+import solver
+
+from analyses import ANALYSES
+from strategies import STRATEGIES, StrategySelector, program_shape
+
+BIN_OPS = ["add", "mul", "lth", "geq"]
+
+
+def random_program(num_insts, num_vars=16, seed=0):
+    """
+    Builds the text of a random program with about `num_insts` instructions.
+    The program is formed by straight-line code, conditionals and loops,
+    nested within each other, so that its control-flow graph looks like the
+    graph of a program produced by a compiler.
+
+    Example:
+        >>> lines = random_program(20, seed=1)
+        >>> env, insts = parallel_parser.load_program(lines)
+        >>> len(insts) >= 20
+        True
+    """
+    rand = random.Random(seed)
+    names = [f"v{i}" for i in range(num_vars)]
+    env = {name: rand.randint(0, 9) for name in names}
+    code = []
+
+    def binop():
+        op = rand.choice(BIN_OPS)
+        dst, src0, src1 = (rand.choice(names) for _ in range(3))
+        code.append([f"{dst} = {op} {src0} {src1}"])
+
+    def block(budget, depth):
+        while budget > 0:
+            kind = rand.random()
+            if depth < 4 and budget > 4 and kind < 0.1:
+                head = len(code)
+                size = rand.randint(2, budget // 2)
+                block(size, depth + 1)
+                code.append(["bt", rand.choice(names), head])
+                budget -= size + 1
+            elif depth < 4 and budget > 4 and kind < 0.2:
+                branch = ["bt", rand.choice(names), None]
+                code.append(branch)
+                size = rand.randint(1, budget // 2)
+                block(size, depth + 1)
+                branch[2] = len(code)
+                budget -= size + 1
+            else:
+                binop()
+                budget -= 1
+
+    block(num_insts, 0)
+    binop()
+    lines = [json.dumps(env)]
+    for inst in code:
+        lines.append(inst[0] if len(inst) == 1 else f"bt {inst[1]} {inst[2]}")
+    return lines
+
+
+def random_ssa_program(num_insts, num_inputs=4, seed=0):
+    """
+    Builds the text of a random program in SSA form, with the same shape as
+    the programs of `random_program`. Each instruction defines a new
+    variable, and only reads variables defined by instructions that dominate
+    it, or the inputs of the program.
+
+    Example:
+        >>> lines = random_ssa_program(20, seed=1)
+        >>> insts = parse(lines)
+        >>> defs = [v for inst in insts for v in inst.definition()]
+        >>> len(defs) == len(set(defs))
+        True
+    """
+    rand = random.Random(seed)
+    inputs = [f"v{i}" for i in range(num_inputs)]
+    env = {name: rand.randint(0, 9) for name in inputs}
+    code = []
+
+    def binop(scope):
+        op = rand.choice(BIN_OPS)
+        dst = f"t{len(code)}"
+        code.append([f"{dst} = {op} {rand.choice(scope)} {rand.choice(scope)}"])
+        scope.append(dst)
+
+    def block(budget, depth, scope):
+        scope = list(scope)
+        while budget > 0:
+            kind = rand.random()
+            if depth < 4 and budget > 4 and kind < 0.1:
+                head = len(code)
+                size = rand.randint(2, budget // 2)
+                body = block(size, depth + 1, scope)
+                code.append(["bt", rand.choice(body), head])
+                budget -= size + 1
+            elif depth < 4 and budget > 4 and kind < 0.2:
+                branch = ["bt", rand.choice(scope), None]
+                code.append(branch)
+                size = rand.randint(1, budget // 2)
+                block(size, depth + 1, scope)
+                branch[2] = len(code)
+                budget -= size + 1
+            else:
+                binop(scope)
+                budget -= 1
+        return scope
+
+    binop(block(num_insts, 0, inputs))
+    lines = [json.dumps(env)]
+    for inst in code:
+        lines.append(inst[0] if len(inst) == 1 else f"bt {inst[1]} {inst[2]}")
+    return lines
+
+
+def test_programs():
+    """
+    The programs in the tests folder, as pairs (name, lines).
+    """
+    import glob
+    import os
+
+    programs = []
+    for path in sorted(glob.glob(os.path.join("tests", "*.txt"))):
+        with open(path) as file:
+            programs.append((os.path.basename(path), file.readlines()))
+    return programs
+
+
+def parse(lines):
+    lang.Inst.next_index = 0
+    return parallel_parser.load_program(lines)[1]
+
+
+def timed(function, *args):
+    """
+    Calls `function`, and returns its result plus the time it took. Like
+    `timeit`, this function disables the garbage collector during the call,
+    so that the time does not depend on the objects alive before it.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = function(*args)
+        return result, time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def bench_solvers(num_insts):
+    """
+    Compares the number of evaluations (and the time) of the chaotic and of
+    the worklist solvers, for each analysis in analyses.py.
+    """
+    programs = test_programs() + [("random", random_program(num_insts))]
+    print(f"{'program':>18} {'analysis':>14} {'solver':>9} {'evals':>9} {'time':>8}")
+    for name, lines in programs:
+        insts = parse(lines)
+        for analysis_name, analysis in ANALYSES.items():
+            envs = []
+            for method in solver.SOLVERS:
+                (env, num_evals), t = timed(solver.solve, analysis(), insts, method)
+                envs.append(env)
+                print(f"{name:>18} {analysis_name:>14} {method:>9} "
+                      f"{num_evals:>9} {t:>8.3f}")
+            assert all(env == envs[0] for env in envs)
+
+
+def bench_strategies(num_insts):
+    """
+    Reports the number of evaluations and the time of each worklist strategy,
+    for each analysis, plus the strategy that the selector picks.
+    """
+    programs = test_programs() + [("random", random_program(num_insts))]
+    selector = StrategySelector()
+    print(f"{'program':>18} {'analysis':>14} {'strategy':>12} {'evals':>9} {'time':>8}")
+    for name, lines in programs:
+        insts = parse(lines)
+        for analysis_name, analysis in ANALYSES.items():
+            best = selector.select(analysis(), insts)
+            report = selector.reports[program_shape(analysis(), insts)]
+            for strategy, row in report.items():
+                mark = " *" if strategy == best.name else ""
+                print(f"{name:>18} {analysis_name:>14} {strategy:>12} "
+                      f"{row['num_evals']:>9} {row['time']:>8.3f}{mark}")
+
+
+def bench_bitsets(num_insts):
+    """
+    Compares the time to solve each analysis with facts encoded as sets and
+    with facts encoded as bitsets (see bitset.py), on a random program. The
+    benchmark also compares the reaching-definitions equations of the engine,
+    solved on a dictionary of sets, with the bitset counterparts of the
+    equations of dataflow.py.
+    """
+    import bitset
+
+    insts = parse(random_program(num_insts))
+    rpo = STRATEGIES["rpo"]
+    print(f"{'analysis':>14} {'sets':>8} {'bitsets':>8} {'speedup':>8}")
+    for name, analysis in bitset.BITSET_ANALYSES.items():
+        (sets, _), t0 = timed(solver.solve, ANALYSES[name](), insts, "worklist", rpo)
+        encoded = analysis()
+        (bits, _), t1 = timed(solver.solve, encoded, insts, "worklist", rpo)
+        assert encoded.decode(bits) == sets
+        print(f"{name:>14} {t0:>8.3f} {t1:>8.3f} {t0 / t1:>7.1f}x")
+    (sets, _), t0 = timed(
+        solver.interp, ANALYSES["reaching_defs"]().equations(insts)
+    )
+    (bits, _), t1 = timed(
+        bitset.abstract_interp, bitset.reaching_defs_constraint_gen(insts)
+    )
+    assert bits == sets
+    print(f"{'equations':>14} {t0:>8.3f} {t1:>8.3f} {t0 / t1:>7.1f}x")
+
+
+def bench_matrix(num_insts):
+    """
+    Compares the worklist solver with the bit-matrix solver of matrix.py, on
+    a random program. The time of the bit-matrix solver is split into the
+    time to solve the problem and the time to convert the solution into
+    sets.
+    """
+    import matrix
+
+    insts = parse(random_program(num_insts))
+    rpo = STRATEGIES["rpo"]
+    print(f"{'analysis':>14} {'worklist':>9} {'matrix':>8} {'decode':>8} {'sweeps':>7}")
+    for name, problem in matrix.PROBLEMS.items():
+        (expected, _), t0 = timed(solver.solve, ANALYSES[name](), insts, "worklist", rpo)
+        problem = problem(insts)
+        (before, after, num_sweeps), t1 = timed(matrix.solve, problem)
+        env, t2 = timed(matrix.to_env, problem, before, after)
+        assert env == expected
+        print(f"{name:>14} {t0:>9.3f} {t1:>8.3f} {t2:>8.3f} {num_sweeps:>7}")
+
+
+class SyntheticEq:
+    """
+    An equation that only has a name and dependences, used to benchmark the
+    construction of dependence graphs without the cost of building programs.
+    """
+
+    def __init__(self, name, deps):
+        self._name = name
+        self._deps = deps
+
+    def name(self):
+        return self._name
+
+    def deps(self):
+        return self._deps
+
+
+def synthetic_equations(num_eqs, seed=0):
+    """
+    A chain of equations where every equation also reads one random fact,
+    like the join equations of programs with branches.
+    """
+    rand = random.Random(seed)
+    names = [f"F_{i}" for i in range(num_eqs)]
+    return [
+        SyntheticEq(names[i], [names[i - 1], names[rand.randrange(num_eqs)]])
+        for i in range(num_eqs)
+    ]
+
+
+def bench_depgraph(max_eqs):
+    """
+    Measures the time to build dependence graphs of growing systems of
+    equations, up to `max_eqs` equations. The time per equation should stay
+    constant, as the construction is linear.
+    """
+    print(f"{'equations':>10} {'edges':>10} {'build':>8} {'us/eq':>7}")
+    num_eqs = 1000
+    while num_eqs <= max_eqs:
+        equations = synthetic_equations(num_eqs)
+        graph, t0 = timed(solver.build_dependence_graph, equations)
+        print(f"{num_eqs:>10} {graph.num_edges():>10} {t0:>8.3f} "
+              f"{1e6 * t0 / num_eqs:>7.2f}")
+        num_eqs *= 10
+
+
+def bench_facts(num_insts):
+    """
+    Compares the worklist solver on an environment indexed by names, such as
+    'IN_42', with the worklist solver on a FactTable, indexed by slots.
+    """
+    insts = parse(random_program(num_insts))
+    rpo = STRATEGIES["rpo"]
+    print(f"{'analysis':>14} {'names':>8} {'slots':>8} {'speedup':>8}")
+    for name, analysis in ANALYSES.items():
+        analysis = analysis()
+
+        def by_names():
+            equations = analysis.equations(insts)
+            env = {eq.name(): analysis.lattice.bottom() for eq in equations}
+            solver.worklist_solve(equations, env, strategy=rpo)
+            return env
+
+        env, t0 = timed(by_names)
+        (table, _), t1 = timed(solver.solve, analysis, insts, "worklist", rpo)
+        assert table == env
+        print(f"{name:>14} {t0:>8.3f} {t1:>8.3f} {t0 / t1:>7.1f}x")
+
+
+def bench_delta(num_insts):
+    """
+    Compares the worklist solver, which recomputes whole facts, with the
+    solver that propagates differences, on the distributive analyses.
+    """
+    insts = parse(random_program(num_insts))
+    rpo = STRATEGIES["rpo"]
+    print(f"{'analysis':>14} {'full':>8} {'delta':>8} {'speedup':>8}")
+    for name, analysis in ANALYSES.items():
+        if not analysis.distributive:
+            continue
+        (full, _), t0 = timed(solver.solve, analysis(), insts, "worklist", rpo)
+        (delta, _), t1 = timed(solver.delta_solve, analysis(), insts)
+        assert full == delta
+        print(f"{name:>14} {t0:>8.3f} {t1:>8.3f} {t0 / t1:>7.1f}x")
+
+
+def bench_scc(num_insts):
+    """
+    Reports the strongly connected components of the dependence graph of each
+    analysis, on a random program: how many components are acyclic, and how
+    many evaluations the largest cyclic component needed.
+    """
+    insts = parse(random_program(num_insts))
+    print(f"{'analysis':>14} {'sccs':>7} {'acyclic':>8} {'cyclic':>7} "
+          f"{'largest':>8} {'evals':>7} {'total':>8}")
+    for name, analysis in ANALYSES.items():
+        report = solver.scc_report(analysis(), insts)
+        size, evals = max(report["cyclic"], default=(0, 0))
+        print(f"{name:>14} {report['components']:>7} {report['acyclic']:>8} "
+              f"{len(report['cyclic']):>7} {size:>8} {evals:>7} "
+              f"{report['num_evals']:>8}")
+
+
+def bench_incremental(num_insts, num_edits=20):
+    """
+    Applies random edits (insertions and removals of instructions) to a
+    random program, and compares the incremental solver with solving the
+    analysis again, from scratch, after each edit.
+    """
+    from incremental import IncrementalSolver, insert_after, remove
+
+    rand = random.Random(0)
+    print(f"{'analysis':>14} {'edits':>6} {'scratch':>9} {'evals':>9} "
+          f"{'update':>9} {'evals':>9}")
+    for name, analysis in ANALYSES.items():
+        insts = parse(random_program(num_insts))
+        inc = IncrementalSolver(analysis(), insts)
+        scratch_time = scratch_evals = update_time = update_evals = edits = 0
+        for _ in range(num_edits):
+            i = rand.randrange(len(insts) - 1)
+            if isinstance(insts[i], lang.Bt) or isinstance(insts[i + 1], lang.Bt):
+                continue
+            if rand.random() < 0.5:
+                new_inst = lang.Add(insts[i].dst, insts[i].src0, insts[i].src1)
+                insts.insert(i + 1, new_inst)
+                changed = insert_after(insts[i], new_inst)
+            else:
+                changed = remove(insts.pop(i))
+            edits += 1
+            num_evals, t = timed(inc.update, insts, changed)
+            update_time, update_evals = update_time + t, update_evals + num_evals
+            (table, num_evals), t = timed(solver.solve, analysis(), insts)
+            scratch_time, scratch_evals = scratch_time + t, scratch_evals + num_evals
+            assert inc.table == table
+        print(f"{name:>14} {edits:>6} {scratch_time:>9.3f} {scratch_evals:>9} "
+              f"{update_time:>9.3f} {update_evals:>9}")
+
+
+def bench_blocks(num_insts):
+    """
+    Compares solving gen/kill analyses on instructions with solving them on
+    basic blocks (see blocks.py), and then recovering the facts of every
+    instruction.
+    """
+    from blocks import BlockSummaries
+
+    insts = parse(random_program(num_insts))
+    rpo = STRATEGIES["rpo"]
+    print(f"{'analysis':>14} {'insts':>8} {'evals':>8} {'blocks':>8} "
+          f"{'evals':>8} {'recover':>8}")
+    for name, analysis in ANALYSES.items():
+        if not issubclass(analysis, solver.GenKillAnalysis):
+            continue
+        (table, num_evals), t0 = timed(solver.solve, analysis(), insts, "worklist", rpo)
+        summaries, t1 = timed(BlockSummaries, analysis(), insts, rpo)
+        recovered, t2 = timed(summaries.to_table)
+        assert recovered == table
+        print(f"{name:>14} {t0:>8.3f} {num_evals:>8} {t1:>8.3f} "
+              f"{summaries.num_evals:>8} {t2:>8.3f}")
+
+
+def bench_ssa(num_insts):
+    """
+    Compares the worklist solver with the liveness analysis for SSA-form
+    programs of ssa_liveness.py, on a random program in SSA form, and on a
+    random program that is not in SSA form.
+    """
+    from analyses import Liveness
+    from ssa_liveness import SSALiveness
+
+    rpo = STRATEGIES["rpo"]
+    print(f"{'program':>8} {'strict':>7} {'other':>6} {'worklist':>9} "
+          f"{'ssa':>8} {'speedup':>8}")
+    programs = [("ssa", random_ssa_program), ("non-ssa", random_program)]
+    for name, generator in programs:
+        insts = parse(generator(num_insts))
+        (table, _), t0 = timed(solver.solve, Liveness(), insts, "worklist", rpo)
+        live, t1 = timed(SSALiveness, insts)
+        assert live.to_env() == table
+        print(f"{name:>8} {len(live.strict):>7} {len(live.other):>6} "
+              f"{t0:>9.3f} {t1:>8.3f} {t0 / t1:>7.1f}x")
+
+
+def bench_hashcons(num_insts):
+    """
+    Compares the gen/kill analyses solved on sets with the same analyses
+    solved on interned facts (see hashcons.py): time, number of distinct
+    fact objects in the solution, and memory of these objects, in MB.
+    """
+    from hashcons import Interned, memory_report
+
+    insts = parse(random_program(num_insts))
+    rpo = STRATEGIES["rpo"]
+    print(f"{'analysis':>14} {'sets':>8} {'interned':>9} {'objects':>8} "
+          f"{'shared':>7} {'MB':>7} {'shared':>7} {'memo':>6}")
+    for name, analysis in ANALYSES.items():
+        if not issubclass(analysis, solver.GenKillAnalysis):
+            continue
+        (table, _), t0 = timed(solver.solve, analysis(), insts, "worklist", rpo)
+        interned = Interned(analysis())
+        (shared, _), t1 = timed(solver.solve, interned, insts, "worklist", rpo)
+        assert shared == table
+        pool = interned.pool
+        hit_rate = pool.hits / max(1, pool.hits + pool.misses)
+        pool.compact(shared.facts)
+        before, after = memory_report(table.facts), memory_report(shared.facts)
+        print(f"{name:>14} {t0:>8.3f} {t1:>9.3f} {before['distinct']:>8} "
+              f"{after['distinct']:>7} {before['shared'] / 1e6:>7.1f} "
+              f"{after['shared'] / 1e6:>7.1f} {hit_rate:>6.1%}")
+
+
+def bench_collapse(num_insts):
+    """
+    Compares solving the reaching-definitions equations of the engine with
+    and without collapsing copy equations first (see collapse.py), on the
+    tests and on a random program.
+    """
+    import collapse
+
+    programs = test_programs() + [("random", random_program(num_insts))]
+    print(f"{'program':>18} {'eqs':>7} {'kept':>7} {'evals':>8} {'evals':>8} "
+          f"{'time':>8} {'time':>8}")
+    for name, lines in programs:
+        equations = ANALYSES["reaching_defs"]().equations(parse(lines))
+        (env, n0), t0 = timed(solver.interp, equations)
+        (collapsed, n1), t1 = timed(collapse.collapsed_interp, equations)
+        assert collapsed == env
+        kept = len(equations) - len(collapse.aliases(equations))
+        print(f"{name:>18} {len(equations):>7} {kept:>7} {n0:>8} {n1:>8} "
+              f"{t0:>8.3f} {t1:>8.3f}")
+
+
+def bench_chains(num_insts, num_queries=100):
+    """
+    Builds the def-use chains of a random program (see chains.py), and
+    compares finding the uses of `num_queries` definitions via the chains
+    with finding them by scanning the solution of reaching definitions.
+    """
+    from analyses import ReachingDefinitions
+    from chains import Chains
+
+    insts = parse(random_program(num_insts))
+    (table, _), t0 = timed(solver.solve, ReachingDefinitions(), insts)
+    chains, t1 = timed(Chains, insts, table)
+    defs = [inst for inst in insts if inst.definition()][:num_queries]
+
+    def scan():
+        return [
+            [u.ID for u in insts for (v, d) in table[solver.name_in(u.ID)]
+             if d == inst.ID and v in u.uses()]
+            for inst in defs
+        ]
+
+    def query():
+        return [list(chains.uses_of(inst.ID)) for inst in defs]
+
+    expected, t2 = timed(scan)
+    found, t3 = timed(query)
+    assert found == expected
+    print(f"{'solve':>8} {'build':>8} {'chains':>8} {'queries':>8} "
+          f"{'scan':>8} {'csr':>8}")
+    print(f"{t0:>8.3f} {t1:>8.3f} {len(chains):>8} {len(defs):>8} "
+          f"{t2:>8.3f} {t3:>8.5f}")
+
+
+def bench_demand(num_insts, num_queries=100):
+    """
+    Answers `num_queries` liveness questions on a random program with the
+    oracle of demand.py, and compares it with solving liveness for the whole
+    program. The last columns answer the question of the driver of
+    IntroDataFlow: the IN set of the first instruction.
+    """
+    from analyses import Liveness
+    from demand import LivenessOracle
+
+    insts = parse(random_program(num_insts))
+    (table, _), t0 = timed(solver.solve, Liveness(), insts)
+    rand = random.Random(0)
+    names = sorted({v for inst in insts for v in inst.uses()})
+    queries = [(rand.choice(names), rand.choice(insts)) for _ in range(num_queries)]
+
+    def ask():
+        oracle = LivenessOracle(insts)
+        return [oracle.is_live(v, inst) for v, inst in queries]
+
+    found, t1 = timed(ask)
+    assert found == [v in table[solver.name_in(inst.ID)] for v, inst in queries]
+    init_in, t2 = timed(lambda: LivenessOracle(insts).live_in(insts[0]))
+    assert init_in == table[solver.name_in(insts[0].ID)]
+    print(f"{'solve':>8} {'queries':>8} {'oracle':>8} {'init_in':>8}")
+    print(f"{t0:>8.3f} {len(queries):>8} {t1:>8.3f} {t2:>8.3f}")
+
+
+def bench_parallel(num_insts, num_programs=16):
+    """
+    Analyzes `num_programs` random programs, each one with `num_insts`
+    instructions, with the runner of batch.py, on pools of increasing size.
+    The records must be the same whatever the number of workers. Pools grow
+    up to the number of processors (and at least to two workers, so that the
+    pool itself is always measured).
+    """
+    import os
+    from batch import run_parallel
+
+    programs = [
+        (f"p{i}", random_program(num_insts, seed=i))
+        for i in range(num_programs)
+    ]
+    print(f"{'workers':>8} {'time':>8} {'speedup':>8}")
+    max_workers = max(2, os.cpu_count() or 1)
+    baseline = None
+    workers = 1
+    while True:
+        records, t = timed(list, run_parallel(programs, num_workers=workers))
+        baseline = baseline or (records, t)
+        assert records == baseline[0]
+        print(f"{workers:>8} {t:>8.3f} {baseline[1] / t:>8.2f}")
+        if workers == max_workers:
+            break
+        workers = min(2 * workers, max_workers)
+
+
+def bench_results(num_insts):
+    """
+    Solves each analysis of a random program through the cache of solutions
+    (see cache.py), in a temporary directory: once on a miss, and once on a
+    hit. Compares the size of each entry with the size of the same solution
+    serialized by `marshal`, without sharing elements or facts.
+    """
+    import marshal
+    import tempfile
+    from cache import Cache
+
+    lines = random_program(num_insts)
+    insts = parse(lines)
+    print(f"{'analysis':>14} {'miss':>8} {'hit':>8} {'entry':>10} {'marshal':>10}")
+    for name, analysis in ANALYSES.items():
+        results = Cache(tempfile.mkdtemp())
+        (table, _), t0 = timed(results.solve, analysis(), lines, insts)
+        (cached, _), t1 = timed(results.solve, analysis(), lines, insts)
+        assert cached == table
+        size = sum(entry[1] for entry in results.entries())
+        plain = len(marshal.dumps(dict(table)))
+        print(f"{name:>14} {t0:>8.3f} {t1:>8.3f} {size:>10} {plain:>10}")
+
+
+def final_values(env, insts):
+    """
+    The last value of each variable of `insts` in the environment `env`.
+    """
+    names = set()
+    for inst in insts:
+        names |= inst.uses() | inst.definition()
+    values = {}
+    for name in names:
+        try:
+            values[name] = env.get(name)
+        except LookupError:
+            pass
+    return values
+
+
+def bench_cse(num_insts, num_programs=10):
+    """
+    Eliminates common subexpressions (see cse.py) in the tests, and counts
+    the instructions, and the arithmetic operations, that they execute before
+    and after. The final value of every variable must not change. Random
+    programs, with 8 variables, are only rewritten, as they seldom stop.
+    """
+    import cse
+
+    print(f"{'program':>18} {'insts':>6} {'removed':>8} {'copies':>7} "
+          f"{'steps':>8} {'after':>8} {'ops':>8} {'after':>8}")
+    for name, lines in test_programs():
+        lang.Inst.next_index = 0
+        env, insts = parallel_parser.load_program(lines)
+        try:
+            before = cse.run(insts[0], env)
+        except LookupError:
+            continue
+        expected = final_values(before[0], insts)
+        lang.Inst.next_index = 0
+        env, insts = parallel_parser.load_program(lines)
+        size = len(insts)
+        insts, removed, copies = cse.eliminate_common_subexpressions(insts, env)
+        after = cse.run(insts[0], env)
+        found = final_values(after[0], insts)
+        assert all(found[name] == value for name, value in expected.items())
+        print(f"{name:>18} {size:>6} {removed:>8} {copies:>7} {before[1]:>8} "
+              f"{after[1]:>8} {before[2]:>8} {after[2]:>8}")
+    print(f"{'program':>18} {'insts':>6} {'removed':>8} {'copies':>7} {'time':>8}")
+    for seed in range(num_programs):
+        insts = parse(random_program(num_insts, num_vars=8, seed=seed))
+        size = len(insts)
+        (insts, removed, copies), t = timed(
+            cse.eliminate_common_subexpressions, insts, lang.Env()
+        )
+        print(f"{f'random_{seed}':>18} {size:>6} {removed:>8} {copies:>7} {t:>8.3f}")
+
+
+def bench_hoist(num_insts, num_programs=10):
+    """
+    Hoists very busy expressions (see hoist.py) in the tests, and counts the
+    instructions of each program, and the instructions that it executes,
+    before and after. The final value of every variable must not change.
+    Random programs, with 8 variables, are only rewritten, as they seldom
+    stop.
+    """
+    import cse
+    import hoist
+
+    print(f"{'program':>18} {'insts':>6} {'after':>6} {'hoisted':>8} "
+          f"{'removed':>8} {'steps':>8} {'after':>8}")
+    for name, lines in test_programs():
+        lang.Inst.next_index = 0
+        env, insts = parallel_parser.load_program(lines)
+        try:
+            before = cse.run(insts[0], env)
+        except LookupError:
+            continue
+        expected = final_values(before[0], insts)
+        lang.Inst.next_index = 0
+        env, insts = parallel_parser.load_program(lines)
+        size = len(insts)
+        insts, hoisted, removed = hoist.hoist_very_busy_expressions(insts)
+        after = cse.run(insts[0], env)
+        found = final_values(after[0], insts)
+        assert all(found[name] == value for name, value in expected.items())
+        print(f"{name:>18} {size:>6} {len(insts):>6} {hoisted:>8} "
+              f"{removed:>8} {before[1]:>8} {after[1]:>8}")
+    print(f"{'program':>18} {'insts':>6} {'after':>6} {'hoisted':>8} "
+          f"{'removed':>8} {'time':>8}")
+    for seed in range(num_programs):
+        insts = parse(random_program(num_insts, num_vars=8, seed=seed))
+        size = len(insts)
+        (insts, hoisted, removed), t = timed(
+            hoist.hoist_very_busy_expressions, insts
+        )
+        print(f"{f'random_{seed}':>18} {size:>6} {len(insts):>6} "
+              f"{hoisted:>8} {removed:>8} {t:>8.3f}")
+
+
+BENCHMARKS = {
+    "solvers": bench_solvers,
+    "strategies": bench_strategies,
+    "bitsets": bench_bitsets,
+    "matrix": bench_matrix,
+    "depgraph": bench_depgraph,
+    "facts": bench_facts,
+    "delta": bench_delta,
+    "scc": bench_scc,
+    "incremental": bench_incremental,
+    "blocks": bench_blocks,
+    "ssa": bench_ssa,
+    "hashcons": bench_hashcons,
+    "collapse": bench_collapse,
+    "chains": bench_chains,
+    "demand": bench_demand,
+    "parallel": bench_parallel,
+    "results": bench_results,
+    "cse": bench_cse,
+    "hoist": bench_hoist,
+}
+
+
+if __name__ == "__main__":
+    bench = sys.argv[1] if len(sys.argv) > 1 else "solvers"
+    num_insts = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    BENCHMARKS[bench](num_insts)
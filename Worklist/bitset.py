@@ -0,0 +1,487 @@
+"""
+This file encodes data-flow facts as bitsets. Each element of the domain of
+an analysis (a variable, in liveness; a pair (variable, ID), in reaching
+definitions) receives a dense number, and a set of elements is represented
+by a Python integer whose i-th bit is set if the set contains the i-th
+element. Thus, union is `a | b`, difference is `a & ~b`, and comparison is
+`a == b`: each one is a single operation on big integers, instead of a loop
+over hashed objects.
+
+The file provides two backends:
+
+    1. Equations that replace the reaching-definitions equations of
+       dataflow.py, with the same names, dependencies and printing.
+    2. Analyses that replace the analyses of analyses.py in the generic
+       engine of solver.py.
+"""
+
+from abc import abstractmethod
+
+import dataflow
+import solver
+
+from analyses import expression
+from dataflow import name_in, name_out
+from lang import BinOp, Bt
+from solver import Analysis, Lattice, FORWARD, BACKWARD
+
+
+class Encoding:
+    """
+    Numbers elements densely, in the order in which they are first seen, and
+    converts sets of elements to bitsets and back.
+
+    Example:
+        >>> enc = Encoding(['a', 'b', 'c'])
+        >>> enc.encode({'a', 'c'})
+        5
+        >>> sorted(enc.decode(6))
+        ['b', 'c']
+        >>> enc.bit('d'), len(enc)
+        (3, 4)
+    """
+
+    def __init__(self, elements=()):
+        self.index = {}
+        self.elements = []
+        for element in elements:
+            self.bit(element)
+
+    def bit(self, element):
+        """
+        The number of `element`. Elements not seen before get a new number.
+        """
+        number = self.index.get(element)
+        if number is None:
+            number = self.index[element] = len(self.elements)
+            self.elements.append(element)
+        return number
+
+    def encode(self, elements):
+        bits = 0
+        for element in elements:
+            bits |= 1 << self.bit(element)
+        return bits
+
+    def decode(self, bits):
+        elements = set()
+        while bits:
+            low = bits & -bits
+            elements.add(self.elements[low.bit_length() - 1])
+            bits ^= low
+        return elements
+
+    def __len__(self):
+        return len(self.elements)
+
+
+def definitions(insts):
+    """
+    Numbers the definitions (v, ID) of the program, and returns the encoding,
+    plus a dictionary that maps each variable to the bitset of all its
+    definitions, i.e., the set that a new definition of the variable kills.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i2 = Add('c', 'c', 'd')
+        >>> enc, kill = definitions([i0, i1, i2])
+        >>> enc.elements
+        [('c', 0), ('d', 1), ('c', 2)]
+        >>> kill
+        {'c': 5, 'd': 2}
+    """
+    encoding = Encoding()
+    kill = {}
+    for inst in insts:
+        for v in sorted(inst.definition()):
+            kill[v] = kill.get(v, 0) | (1 << encoding.bit((v, inst.ID)))
+    return encoding, kill
+
+
+def decode_env(env, encoding):
+    """
+    Converts an environment of bitsets into an environment of sets.
+    """
+    return {name: encoding.decode(bits) for name, bits in env.items()}
+
+
+class ReachingDefs_Bin_OUT_Eq(dataflow.ReachingDefs_Bin_OUT_Eq):
+    """
+    OUT[p] = (v, p) + (IN[p] - (v, _)), where (v, p) and (v, _) are
+    bitsets computed once, when the equation is built.
+
+    Example:
+        >>> from lang import Inst, Add
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> enc = Encoding([('x', 1), ('y', 2), ('x', 0)])
+        >>> df = ReachingDefs_Bin_OUT_Eq(i0, enc, 0b101)
+        >>> sorted(enc.decode(df.eval_aux({'IN_0': 0b011})))
+        [('x', 0), ('y', 2)]
+    """
+
+    def __init__(self, instruction, encoding, kill):
+        super().__init__(instruction)
+        self.encoding = encoding
+        self.gen = 1 << encoding.bit((instruction.dst, instruction.ID))
+        self.keep = ~kill
+
+    def eval_aux(self, data_flow_env):
+        return self.gen | (data_flow_env[name_in(self.inst.ID)] & self.keep)
+
+
+class ReachingDefs_Bt_OUT_Eq(dataflow.ReachingDefs_Bt_OUT_Eq):
+    """
+    OUT[p] = IN[p]: the identity works on bitsets as it works on sets.
+    """
+
+    def __init__(self, instruction, encoding):
+        super().__init__(instruction)
+        self.encoding = encoding
+
+
+class ReachingDefs_IN_Eq(dataflow.ReachingDefs_IN_Eq):
+    """
+    IN[p] = the union of OUT[q], for each predecessor q of p.
+
+    Example:
+        >>> from lang import Inst, Add
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> i1 = Add('x', 'c', 'd')
+        >>> i2 = Add('y', 'x', 'x')
+        >>> i0.add_next(i2)
+        >>> i1.add_next(i2)
+        >>> df = ReachingDefs_IN_Eq(i2, Encoding())
+        >>> df.eval_aux({'OUT_0': 0b01, 'OUT_1': 0b10})
+        3
+    """
+
+    def __init__(self, instruction, encoding):
+        super().__init__(instruction)
+        self.encoding = encoding
+
+    def deps(self):
+        return [name_out(pred.ID) for pred in self.inst.preds]
+
+    def eval_aux(self, data_flow_env):
+        solution = 0
+        for inst in self.inst.preds:
+            solution |= data_flow_env[name_out(inst.ID)]
+        return solution
+
+
+def reaching_defs_constraint_gen(insts):
+    """
+    Builds the same equations as `dataflow.reaching_defs_constraint_gen`,
+    but on bitsets. Every equation has an attribute `encoding`, which
+    converts its facts back into sets of definitions.
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Lth
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i2 = Lth('e', 'c', 'd')
+        >>> i0.add_next(i2)
+        >>> i1.add_next(i2)
+        >>> sol = [str(eq) for eq in reaching_defs_constraint_gen([i0, i1, i2])]
+        >>> sol[0] + " " + sol[-1]
+        'OUT_0: (c, 0) + (IN_0 - (c, _)) IN_2: Union( OUT_0, OUT_1 )'
+    """
+    encoding, kill = definitions(insts)
+    in0 = [
+        ReachingDefs_Bin_OUT_Eq(i, encoding, kill[i.dst])
+        for i in insts
+        if isinstance(i, BinOp)
+    ]
+    in1 = [ReachingDefs_Bt_OUT_Eq(i, encoding) for i in insts if isinstance(i, Bt)]
+    out = [ReachingDefs_IN_Eq(i, encoding) for i in insts]
+    return in0 + in1 + out
+
+
+def abstract_interp(equations, stats=None):
+    """
+    Solves bitset equations with the worklist solver, and returns the
+    environment of sets, plus the number of evaluations, like
+    `solver.interp`, which also describes `stats`.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> (sol, num_evals) = abstract_interp(reaching_defs_constraint_gen([i0, i1]))
+        >>> f"OUT_0: {sorted(sol['OUT_0'])}, Num Evals: {num_evals}"
+        "OUT_0: [('c', 0)], Num Evals: 5"
+        >>> from analyses import ReachingDefinitions
+        >>> sol == solver.interp(ReachingDefinitions().equations([i0, i1]))[0]
+        True
+    """
+    env, num_evals = solver.interp(equations, bottom=int, stats=stats)
+    encoding = equations[0].encoding if equations else Encoding()
+    return (decode_env(env, encoding), num_evals)
+
+
+class BitsetLattice(Lattice):
+    """
+    The union lattice on bitsets. The top is -1, the integer with every bit
+    set.
+
+    Example:
+        >>> l = BitsetLattice()
+        >>> l.join(0b011, 0b110), l.leq(0b010, 0b011), l.leq(0b100, 0b011)
+        (7, True, False)
+        >>> l.leq(0b111, l.top())
+        True
+    """
+
+    def bottom(self):
+        return 0
+
+    def top(self):
+        return -1
+
+    def join(self, a, b):
+        return a | b
+
+    def leq(self, a, b):
+        return a & ~b == 0
+
+
+class BitsetIntersectionLattice(Lattice):
+    """
+    The intersection lattice on bitsets, for must analyses. The bottom is -1,
+    the integer with every bit set, which stands for the universe.
+
+    Example:
+        >>> l = BitsetIntersectionLattice()
+        >>> l.join(0b011, 0b110), l.join(l.bottom(), 0b101)
+        (2, 5)
+        >>> l.leq(l.bottom(), 0b1), l.leq(0b01, 0b11), l.leq(0b11, 0b01)
+        (True, False, True)
+    """
+
+    def bottom(self):
+        return -1
+
+    def top(self):
+        return 0
+
+    def join(self, a, b):
+        return a & b
+
+    def leq(self, a, b):
+        return b & ~a == 0
+
+
+class BitsetAnalysis(Analysis):
+    """
+    A gen/kill analysis on bitsets: transfer(p, fact) = gen[p] | (fact &
+    ~kill[p]). The sets gen and kill of each instruction are computed by
+    `prepare`, once per program, when the equations are built.
+    """
+
+    lattice = BitsetLattice()
+
+    @abstractmethod
+    def prepare(self, insts):
+        """
+        Builds `self.encoding`, and the dictionaries `self.gen` and
+        `self.keep` (the complement of kill), indexed by instruction ID.
+        """
+        raise NotImplementedError
+
+    def equations(self, insts):
+        self.prepare(insts)
+        return super().equations(insts)
+
+    def transfer(self, inst, fact):
+        return self.gen[inst.ID] | (fact & self.keep[inst.ID])
+
+    def decode(self, env):
+        return decode_env(env, self.encoding)
+
+
+class BitsetReachingDefinitions(BitsetAnalysis):
+    """
+    Reaching definitions on bitsets.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> from analyses import ReachingDefinitions
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('c', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> rd = BitsetReachingDefinitions()
+        >>> env, num_evals = solver.solve(rd, [i0, i1])
+        >>> sorted(rd.decode(env)['IN_1']), env['OUT_1']
+        ([('c', 0)], 2)
+        >>> rd.decode(env) == solver.solve(ReachingDefinitions(), [i0, i1])[0]
+        True
+    """
+
+    direction = FORWARD
+
+    def prepare(self, insts):
+        self.encoding, kill = definitions(insts)
+        self.gen = {}
+        self.keep = {}
+        for inst in insts:
+            defs = inst.definition()
+            self.gen[inst.ID] = self.encoding.encode((v, inst.ID) for v in defs)
+            killed = 0
+            for v in defs:
+                killed |= kill[v]
+            self.keep[inst.ID] = ~killed
+
+
+class BitsetLiveness(BitsetAnalysis):
+    """
+    Liveness analysis on bitsets.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> from analyses import Liveness
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> live = BitsetLiveness()
+        >>> env, num_evals = solver.solve(live, [i0, i1])
+        >>> sorted(live.decode(env)['IN_0'])
+        ['a', 'b']
+        >>> live.decode(env) == solver.solve(Liveness(), [i0, i1])[0]
+        True
+    """
+
+    direction = BACKWARD
+
+    def prepare(self, insts):
+        self.encoding = Encoding()
+        for inst in insts:
+            for v in sorted(inst.uses() | inst.definition()):
+                self.encoding.bit(v)
+        self.gen = {inst.ID: self.encoding.encode(inst.uses()) for inst in insts}
+        self.keep = {
+            inst.ID: ~self.encoding.encode(inst.definition()) for inst in insts
+        }
+
+
+class BitsetAvailableExpressions(BitsetAnalysis):
+    """
+    Available expressions on bitsets. Instructions that are never reached
+    keep the bottom of the lattice, -1, which is decoded as the universe.
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Bt
+        >>> from analyses import AvailableExpressions
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> i1 = Bt('c')
+        >>> i2 = Mul('a', 'a', 'b')
+        >>> i3 = Add('y', 'b', 'a')
+        >>> i0.add_next(i1)
+        >>> i1.add_true_next(i2)
+        >>> i1.add_next(i3)
+        >>> i2.add_next(i3)
+        >>> insts = [i0, i1, i2, i3]
+        >>> avail = BitsetAvailableExpressions()
+        >>> env, num_evals = solver.solve(avail, insts)
+        >>> env['IN_2'], env['OUT_2'], avail.decode(env)['OUT_3']
+        (1, 0, {('+', 'a', 'b')})
+        >>> avail.decode(env) == solver.solve(AvailableExpressions(), insts)[0]
+        True
+    """
+
+    lattice = BitsetIntersectionLattice()
+
+    direction = FORWARD
+
+    version = 2
+
+    def prepare(self, insts):
+        self.encoding = Encoding()
+        kill = {}
+        for inst in insts:
+            e = expression(inst)
+            if e is not None:
+                bit = 1 << self.encoding.bit(e)
+                for v in e[1:]:
+                    kill[v] = kill.get(v, 0) | bit
+        self.gen = {}
+        self.keep = {}
+        for inst in insts:
+            defs = inst.definition()
+            killed = 0
+            for v in defs:
+                killed |= kill.get(v, 0)
+            e = expression(inst)
+            gen = self.encoding.encode([e]) if e is not None else 0
+            self.gen[inst.ID] = self.generates(gen, killed)
+            self.keep[inst.ID] = ~killed
+
+    def generates(self, gen, killed):
+        """
+        The expressions that an instruction adds to its fact, given the bits
+        of the expression that it computes, and the bits that it kills. The
+        computation happens before the definition: in forward analyses, the
+        definition might kill the expression itself.
+        """
+        return gen & ~killed
+
+    def transfer(self, inst, fact):
+        if fact == -1:
+            return fact
+        return super().transfer(inst, fact)
+
+    def boundary(self, inst):
+        return 0
+
+    def decode(self, env):
+        return {
+            name: solver.UNIVERSE if bits == -1 else self.encoding.decode(bits)
+            for name, bits in env.items()
+        }
+
+
+class BitsetVeryBusyExpressions(BitsetAvailableExpressions):
+    """
+    Very busy expressions on bitsets.
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Bt
+        >>> from analyses import VeryBusyExpressions
+        >>> Inst.next_index = 0
+        >>> i0 = Bt('c')
+        >>> i1 = Add('x', 'a', 'b')
+        >>> i2 = Mul('z', 'b', 'a')
+        >>> i3 = Add('a', 'b', 'a')
+        >>> i0.add_true_next(i1)
+        >>> i0.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> i1.add_next(i3)
+        >>> insts = [i0, i1, i2, i3]
+        >>> vbe = BitsetVeryBusyExpressions()
+        >>> env, num_evals = solver.solve(vbe, insts)
+        >>> vbe.decode(env)['OUT_0'], env['IN_3']
+        ({('+', 'a', 'b')}, 1)
+        >>> vbe.decode(env) == solver.solve(VeryBusyExpressions(), insts)[0]
+        True
+    """
+
+    direction = BACKWARD
+
+    def generates(self, gen, killed):
+        return gen
+
+
+BITSET_ANALYSES = {
+    "reaching_defs": BitsetReachingDefinitions,
+    "liveness": BitsetLiveness,
+}
@@ -0,0 +1,240 @@
+"""
+This file solves gen/kill analyses at the granularity of basic blocks. The
+transfer function of a block is the composition of the transfer functions of
+its instructions, and, as the composition of gen/kill functions is also a
+gen/kill function, it is summarized by a pair (gen, kill). The solver of
+solver.py finds the facts at the boundaries of the blocks; the facts of each
+instruction are recovered on demand, with one sweep over its block.
+"""
+
+from solver import Analysis, FactTable, FORWARD, IN, OUT, solve, successors
+
+
+def basic_blocks(insts):
+    """
+    Splits the instructions into basic blocks. Each block is a list of
+    instructions, in program order. An instruction joins the block of its
+    predecessor if it is the only successor of its only predecessor. As this
+    condition is symmetric, blocks are the same in both directions of
+    analysis.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'x', 'y')
+        >>> i1 = Add('y', 'x', 'y')
+        >>> i2 = Bt('x', i0)
+        >>> i3 = Add('z', 'x', 'y')
+        >>> i0.add_next(i1)
+        >>> i1.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> [[inst.ID for inst in block] for block in basic_blocks([i0, i1, i2, i3])]
+        [[0, 1, 2], [3]]
+    """
+
+    def joins(inst):
+        if len(inst.preds) != 1:
+            return False
+        succs = successors(inst.preds[0])
+        return len(succs) == 1 and succs[0] is inst
+
+    blocks = []
+    assigned = set()
+
+    def grow(leader):
+        block = [leader]
+        assigned.add(leader.ID)
+        while True:
+            succs = successors(block[-1])
+            if len(succs) != 1 or not joins(succs[0]) or succs[0].ID in assigned:
+                break
+            block.append(succs[0])
+            assigned.add(succs[0].ID)
+        blocks.append(block)
+
+    for inst in insts:
+        if not joins(inst):
+            grow(inst)
+    # Cycles of instructions without a leader (unreachable loops):
+    for inst in insts:
+        if inst.ID not in assigned:
+            grow(inst)
+    return blocks
+
+
+class Summary:
+    """
+    A gen/kill transfer function: apply(fact) = gen + (fact - kill), where an
+    element e of fact is killed if key(e) is in kill.
+
+    Example:
+        >>> f = Summary({('x', 0)}, {'x'}, key=lambda e: e[0])
+        >>> g = Summary({('y', 1)}, {'y'}, key=lambda e: e[0])
+        >>> sorted(f.then(g).apply({('x', 5), ('y', 5), ('z', 5)}))
+        [('x', 0), ('y', 1), ('z', 5)]
+    """
+
+    def __init__(self, gen, kill, key):
+        self.gen = frozenset(gen)
+        self.kill = frozenset(kill)
+        self.key = key
+
+    def apply(self, fact):
+        kept = {e for e in fact if self.key(e) not in self.kill} if self.kill else fact
+        return kept | self.gen if self.gen else kept
+
+    def then(self, other):
+        """
+        The composition that applies `self` first, and `other` afterwards.
+        """
+        return Summary(
+            other.apply(self.gen), self.kill | other.kill, self.key
+        )
+
+
+class Block:
+    """
+    A basic block, seen as a node of the control-flow graph of blocks. It has
+    the attributes `ID`, `preds` and `nexts`, like instructions; hence, the
+    solver of solver.py can solve analyses on blocks.
+    """
+
+    def __init__(self, ID, insts):
+        self.ID = ID
+        self.insts = insts
+        self.preds = []
+        self.nexts = []
+
+    def __str__(self):
+        return f"B{self.ID}: {[inst.ID for inst in self.insts]}"
+
+
+class BlockAnalysis(Analysis):
+    """
+    Lifts a gen/kill analysis to basic blocks: the transfer function of a
+    block is its summary.
+    """
+
+    def __init__(self, summaries):
+        analysis = summaries.analysis
+        self.summaries = summaries
+        self.analysis = analysis
+        self.lattice = analysis.lattice
+        self.direction = analysis.direction
+
+    def transfer(self, block, fact):
+        return self.summaries.summary(block).apply(fact)
+
+    def boundary(self, block):
+        if self.direction == FORWARD:
+            return self.analysis.boundary(block.insts[0])
+        return self.analysis.boundary(block.insts[-1])
+
+    def at_boundary(self, block, entry):
+        if self.direction == FORWARD:
+            return self.analysis.at_boundary(block.insts[0], entry.insts[0])
+        return self.analysis.at_boundary(block.insts[-1], None)
+
+
+class BlockSummaries:
+    """
+    Solves a gen/kill analysis (see solver.GenKillAnalysis) on basic blocks.
+    The summary of each block is computed once, the first time that the
+    solver needs it, and cached. The facts of an instruction are recovered
+    by `facts(inst)`, which sweeps only its block.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import ReachingDefinitions, Liveness
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> rd = BlockSummaries(ReachingDefinitions(), insts)
+        >>> [str(block) for block in rd.blocks]
+        ['B0: [0]', 'B1: [1, 2]', 'B2: [3]', 'B3: [4]']
+        >>> sorted(rd.summary(rd.blocks[1]).gen)
+        [('repeat', 1)]
+        >>> IN, OUT = rd.facts(bt)
+        >>> sorted(IN)
+        [('c', 0), ('c', 3), ('repeat', 1)]
+        >>> rd.to_table() == solve(ReachingDefinitions(), insts)[0]
+        True
+        >>> live = BlockSummaries(Liveness(), insts)
+        >>> live.to_table() == solve(Liveness(), insts)[0]
+        True
+    """
+
+    def __init__(self, analysis, insts, strategy=None):
+        self.analysis = analysis
+        self.insts = insts
+        self.blocks = []
+        self.block_of = {}
+        for insts_of_block in basic_blocks(insts):
+            block = Block(len(self.blocks), insts_of_block)
+            self.blocks.append(block)
+            for inst in insts_of_block:
+                self.block_of[inst.ID] = block
+        for block in self.blocks:
+            for succ in successors(block.insts[-1]):
+                block.nexts.append(self.block_of[succ.ID])
+            for pred in block.insts[0].preds:
+                block.preds.append(self.block_of[pred.ID])
+        self.summaries = {}
+        self.recovered = {}
+        self.table, self.num_evals = solve(
+            BlockAnalysis(self), self.blocks, strategy=strategy
+        )
+
+    def flow_order(self, block):
+        if self.analysis.direction == FORWARD:
+            return block.insts
+        return block.insts[::-1]
+
+    def summary(self, block):
+        summary = self.summaries.get(block.ID)
+        if summary is None:
+            analysis = self.analysis
+            summary = Summary((), (), analysis.key)
+            for inst in self.flow_order(block):
+                step = Summary(analysis.gen(inst), analysis.kill(inst), analysis.key)
+                summary = summary.then(step)
+            self.summaries[block.ID] = summary
+        return summary
+
+    def facts(self, inst):
+        """
+        Returns the pair (IN, OUT) of `inst`. The first query about a block
+        computes the facts of all the instructions of the block, in one sweep.
+        """
+        if inst.ID not in self.recovered:
+            block = self.block_of[inst.ID]
+            side = IN if self.analysis.direction == FORWARD else OUT
+            fact = self.table.facts[self.table.index(block.ID, side)]
+            for member in self.flow_order(block):
+                new_fact = self.analysis.transfer(member, fact)
+                if self.analysis.direction == FORWARD:
+                    self.recovered[member.ID] = (fact, new_fact)
+                else:
+                    self.recovered[member.ID] = (new_fact, fact)
+                fact = new_fact
+        return self.recovered[inst.ID]
+
+    def to_table(self):
+        """
+        The facts of every instruction, in a FactTable.
+        """
+        table = FactTable(self.insts, None)
+        for inst in self.insts:
+            IN_fact, OUT_fact = self.facts(inst)
+            table.facts[table.index(inst.ID, IN)] = IN_fact
+            table.facts[table.index(inst.ID, OUT)] = OUT_fact
+        return table
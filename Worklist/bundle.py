@@ -0,0 +1,79 @@
+"""
+This file implements bundles: text files that contain many programs. Each
+program starts with a header line, formed by the character '#' followed by the
+name of the program. The lines after the header are a program in the usual
+format: the environment first, and then one instruction per line. Empty lines
+between programs are ignored. As an example, the bundle below contains two
+programs:
+
+    # sum
+    {"a": 1, "b": 3, "c": 5}
+    x = add a b
+    x = add x c
+
+    # jump
+    {"a": 1, "b": 3, "x": 42, "z": 0}
+    bt a 2
+    x = add a b
+    x = add x z
+"""
+
+import os
+
+HEADER = "#"
+
+
+def read_bundle(lines):
+    """
+    Splits the lines of a bundle into a list of pairs (name, lines), where
+    `lines` is the text of a program, as `file2cfg_and_env` expects it.
+
+    Example:
+        >>> b = ['# p0', '{"a": 1}', 'x = add a a', '', '# p1', '{}']
+        >>> read_bundle(b)
+        [('p0', ['{"a": 1}', 'x = add a a']), ('p1', ['{}'])]
+
+        >>> read_bundle(['{}'])
+        Traceback (most recent call last):
+        ...
+        ValueError: Line 1 does not belong to any program.
+    """
+    programs = []
+    for number, line in enumerate(lines, 1):
+        if line.startswith(HEADER):
+            programs.append((line[len(HEADER) :].strip(), []))
+        elif line.strip():
+            if not programs:
+                raise ValueError(f"Line {number} does not belong to any program.")
+            programs[-1][1].append(line)
+    return programs
+
+
+def write_bundle(programs, file):
+    """
+    Writes a list of pairs (name, lines) as a bundle into `file`.
+
+    Example:
+        >>> import io
+        >>> f = io.StringIO()
+        >>> write_bundle([('p0', ['{"a": 1}\\n', 'x = add a a\\n'])], f)
+        >>> read_bundle(f.getvalue().splitlines())
+        [('p0', ['{"a": 1}', 'x = add a a'])]
+    """
+    for name, lines in programs:
+        file.write(f"{HEADER} {name}\n")
+        for line in lines:
+            file.write(line.rstrip("\n") + "\n")
+        file.write("\n")
+
+
+def files2bundle(paths, file):
+    """
+    Writes the programs in the text files in `paths` as a bundle into `file`.
+    Each program is named after its file.
+    """
+    programs = []
+    for path in paths:
+        with open(path) as program:
+            programs.append((os.path.basename(path), program.readlines()))
+    write_bundle(programs, file)
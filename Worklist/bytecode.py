@@ -0,0 +1,312 @@
+"""
+This file implements a compact binary format for programs, plus a loader that
+maps such files into memory, and decodes instructions only when they are
+needed. All the integers are little-endian. A file has eight sections:
+
+    1. Header: the magic number b"DCC8", the version of the format (u16), a
+       reserved field (u16), and four counters (u32): the number of constants
+       in the environment (E), of instructions (N), of names (S) and of
+       branches (B).
+    2. Environment: E triples (name: i32, type: u8, value: i64). The name is
+       an index into the string table, and the type is the position of the
+       type of the value in `ENV_TYPES` (0 for int, 1 for bool).
+    3. Operands: N triples (dst: i32, src0: i32, src1: i32) of indices into
+       the string table. Absent fields are -1. The condition of a branch is
+       its src0.
+    4. Targets: N values (i32). The i-th value is the index of the
+       instruction to where the i-th instruction jumps, or -1 if it is not
+       a branch.
+    5. Branches: B pairs (target: i32, source: i32), sorted by target, and
+       then by source. This table lets us find the predecessors of an
+       instruction in logarithmic time.
+    6. String offsets: S + 1 values (u32). The i-th name is stored between
+       offsets i and i + 1 of the string data.
+    7. Opcodes: N values (u8), numbered as in `parallel_parser.py`.
+    8. String data: the names of all the variables, encoded in UTF-8.
+
+Instructions always fall through into the next one, as in the text format.
+"""
+
+import mmap
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left, bisect_right
+from lang import Env, Inst, Add, Mul, Lth, Geq, Bt
+from lazy import LazyProgram, NO_TARGET
+from parallel_parser import Table, NO_FIELD, OP_ADD, OP_MUL, OP_LTH, OP_GEQ
+from parallel_parser import OP_BT, BIN_OPS
+
+
+MAGIC = b"DCC8"
+
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHIIII")
+
+ENV_ENTRY = struct.Struct("<iBq")
+
+ENV_TYPES = (int, bool)
+
+OPCODE_OF = {Add: OP_ADD, Mul: OP_MUL, Lth: OP_LTH, Geq: OP_GEQ, Bt: OP_BT}
+
+
+def env2dict(env):
+    """
+    Returns the current value of each variable bound in `env`.
+
+    Example:
+        >>> env = Env({'a': 1})
+        >>> env.set('a', 2)
+        >>> env2dict(env)
+        {'a': 2}
+    """
+    values = {}
+    for var, value in env.env:
+        values.setdefault(var, value)
+    return values
+
+
+def insts2table(insts):
+    """
+    Converts a list of instructions into a table. Every instruction must fall
+    through into the next instruction of the list, as it happens with the
+    programs produced by our parsers.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> i1 = Bt('x', i0)
+        >>> i0.add_next(i1)
+        >>> t = insts2table([i0, i1])
+        >>> list(t.ops), list(t.targets), t.names
+        ([0, 4], [-1, 0], ['x', 'a', 'b'])
+
+        >>> insts2table([i1, i0])
+        Traceback (most recent call last):
+        ...
+        ValueError: Instruction 1 does not fall through to the next one.
+    """
+    index_of = {inst.ID: i for i, inst in enumerate(insts)}
+    table = Table()
+    for i, inst in enumerate(insts):
+        op = OPCODE_OF[type(inst)]
+        nexts = inst.nexts[1:] if op == OP_BT else inst.nexts
+        next_inst = insts[i + 1] if i + 1 < len(insts) else None
+        if (nexts[0] if nexts else None) is not next_inst:
+            raise ValueError(
+                f"Instruction {inst.ID} does not fall through to the next one."
+            )
+        if op == OP_BT:
+            target = inst.nexts[0]
+            table.append(OP_BT, None, inst.cond, None, index_of[target.ID])
+        else:
+            table.append(op, inst.dst, inst.src0, inst.src1)
+    return table
+
+
+def dump_table(env_dict, table, file):
+    """
+    Writes the program formed by `env_dict` and `table` into `file`, which
+    must have been opened in binary mode. The environment might only hold
+    64-bit integers and booleans; other values raise ValueError, instead of
+    being converted.
+    """
+    for name, value in env_dict.items():
+        if type(value) not in ENV_TYPES or not -(2**63) <= value < 2**63:
+            raise ValueError(f"Cannot store the value of {name}: {value!r}")
+    env_items = [(table.intern(k), v) for k, v in env_dict.items()]
+    edges = sorted(
+        (target, source)
+        for source, target in enumerate(table.targets)
+        if target != NO_FIELD
+    )
+    data = [name.encode("utf-8") for name in table.names]
+    offsets = array("I", [0])
+    for name in data:
+        offsets.append(offsets[-1] + len(name))
+    operands = array("i")
+    for i in range(len(table)):
+        operands.extend((table.dst[i], table.src0[i], table.src1[i]))
+    targets = array("i", table.targets)
+    branches = array("i", [i for edge in edges for i in edge])
+    if sys.byteorder != "little":
+        for column in (offsets, operands, targets, branches):
+            column.byteswap()
+    file.write(
+        HEADER.pack(
+            MAGIC, VERSION, 0, len(env_items), len(table), len(data), len(edges)
+        )
+    )
+    for name, value in env_items:
+        file.write(ENV_ENTRY.pack(name, ENV_TYPES.index(type(value)), value))
+    file.write(operands.tobytes())
+    file.write(targets.tobytes())
+    file.write(branches.tobytes())
+    file.write(offsets.tobytes())
+    file.write(bytes(table.ops))
+    file.write(b"".join(data))
+
+
+def dump(env, insts, file):
+    """
+    Writes a parsed program (an environment plus a list of instructions) in
+    binary format into `file`.
+    """
+    dump_table(env2dict(env), insts2table(insts), file)
+
+
+def dumps(env, insts):
+    """
+    Returns the binary representation of a parsed program.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> len(dumps(Env({'a': 1, 'b': 2}), [i0]))
+        86
+        >>> loads(dumps(Env({'a': True, 'b': 2}), [i0])).env().get('a')
+        True
+        >>> dumps(Env({'a': 1.5, 'b': 2}), [i0])
+        Traceback (most recent call last):
+        ...
+        ValueError: Cannot store the value of a: 1.5
+    """
+    from io import BytesIO
+
+    file = BytesIO()
+    dump(env, insts, file)
+    return file.getvalue()
+
+
+def _column(buffer, offset, count, code):
+    """
+    Returns a view of `count` integers of type `code`, starting at `offset`.
+    No data is copied, unless the host is big-endian.
+    """
+    size = count * struct.calcsize(code)
+    view = memoryview(buffer)[offset : offset + size]
+    if sys.byteorder == "little":
+        return view.cast("B").cast(code)
+    column = array(code, view.tobytes())
+    column.byteswap()
+    return column
+
+
+class BytecodeProgram(LazyProgram):
+    """
+    A program stored in binary format. Creating a program only reads the
+    header and builds views over the tables; instructions are decoded when
+    they are accessed, as in any other `LazyProgram`.
+
+    Example:
+        >>> from parallel_parser import load_program
+        >>> Inst.next_index = 0
+        >>> lines = ['{"a": 1, "b": 3, "x": 42, "z": 0}', 'bt a 2', \\
+        ...          'x = add a b', 'x = add x z']
+        >>> env, insts = load_program(lines)
+        >>> data = dumps(env, insts)
+        >>> Inst.next_index = 0
+        >>> prog = loads(data)
+        >>> prog.interp(prog.env()).get("x")
+        42
+        >>> prog.num_materialized, prog.is_materialized(1)
+        (2, False)
+        >>> [str(i) for i in prog.insts()] == [str(i) for i in insts]
+        True
+    """
+
+    def __init__(self, buffer):
+        magic, version, _, num_env, num_insts, num_names, num_edges = (
+            HEADER.unpack_from(buffer, 0)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a program in binary format.")
+        self._buffer = buffer
+        offset = HEADER.size
+        self._env_offset = offset
+        self._num_env = num_env
+        offset += num_env * ENV_ENTRY.size
+        self._operands = _column(buffer, offset, 3 * num_insts, "i")
+        offset += 12 * num_insts
+        self._targets = _column(buffer, offset, num_insts, "i")
+        offset += 4 * num_insts
+        branches = _column(buffer, offset, 2 * num_edges, "i")
+        self._edge_targets = branches[0::2]
+        self._edge_sources = branches[1::2]
+        offset += 8 * num_edges
+        self._offsets = _column(buffer, offset, num_names + 1, "I")
+        offset += 4 * (num_names + 1)
+        self._ops = memoryview(buffer)[offset : offset + num_insts]
+        self._data_offset = offset + num_insts
+        self._names = {}
+        super().__init__(num_insts)
+
+    def name(self, index):
+        """
+        Decodes the index-th name of the string table.
+        """
+        if index == NO_FIELD:
+            return None
+        name = self._names.get(index)
+        if name is None:
+            start = self._data_offset + self._offsets[index]
+            end = self._data_offset + self._offsets[index + 1]
+            name = bytes(self._buffer[start:end]).decode("utf-8")
+            self._names[index] = name
+        return name
+
+    def env(self):
+        """
+        Builds the initial environment of the program.
+        """
+        entries = ENV_ENTRY.iter_unpack(
+            self._buffer[
+                self._env_offset : self._env_offset + self._num_env * ENV_ENTRY.size
+            ]
+        )
+        return Env(
+            {self.name(name): ENV_TYPES[tag](value) for name, tag, value in entries}
+        )
+
+    def decode(self, index):
+        dst, src0, src1 = self._operands[3 * index : 3 * index + 3]
+        op = self._ops[index]
+        if op == OP_BT:
+            return Bt(self.name(src0))
+        return BIN_OPS[op](self.name(dst), self.name(src0), self.name(src1))
+
+    def target(self, index):
+        return self._targets[index]
+
+    def branch_sources(self, index):
+        lo = bisect_left(self._edge_targets, index)
+        hi = bisect_right(self._edge_targets, index, lo)
+        return list(self._edge_sources[lo:hi])
+
+
+def loads(data):
+    """
+    Creates a program out of a buffer with its binary representation.
+    """
+    return BytecodeProgram(data)
+
+
+def load(path):
+    """
+    Maps the file at `path` into memory, and returns the program that it
+    contains. Loading a program does not depend on its size: only the header
+    is read eagerly.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return BytecodeProgram(buffer)
+
+
+def write(path, env, insts):
+    """
+    Saves a parsed program in binary format into the file at `path`.
+    """
+    with open(path, "wb") as file:
+        dump(env, insts, file)
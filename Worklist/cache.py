@@ -0,0 +1,448 @@
+"""
+This file implements a cache of parsed programs. Programs are identified by a
+hash of their text, plus the name of the dialect of the language that parsed
+them. Parsed programs are stored in the binary format of `bytecode.py`; thus,
+a hit in the cache skips parsing altogether: the program is mapped into
+memory, and its instructions are decoded on demand. The cache can also store
+the results of analyses, which are serialized with `marshal`.
+
+Solutions of data-flow analyses are keyed by a canonical hash of the program
+(which ignores spacing, and the order of the keys of the environment), by the
+name of the analysis and by its version. They are stored in a compact format:
+each element and each distinct fact appears only once, and the whole entry is
+compressed. Hence, a program that has not changed is not solved again.
+
+The cache has a maximum size. Whenever it grows beyond this size, the entries
+that have been used least recently are removed. Entries that have not been
+used for `max_age` seconds are removed as well.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import struct
+import time
+import zlib
+
+from array import array
+from io import BytesIO
+from bytecode import dump_table, load, loads, VERSION
+from parallel_parser import parse_table
+from lazy import LazyProgram
+
+DIALECT = "Worklist"
+
+DEFAULT_DIR = ".dcc888_cache"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+# The version of the format of cached solutions (see `encode_solution`).
+SOLUTION_FORMAT = 1
+
+PROGRAM_EXT = ".prog"
+
+RESULT_EXT = ".res"
+
+
+def program_key(lines, dialect=DIALECT):
+    """
+    The key of a program in the cache: a hash of its text, of the dialect of
+    the language, and of the version of the binary format.
+
+    Example:
+        >>> k0 = program_key(['{"a": 1}', 'x = add a a'])
+        >>> k1 = program_key(['{"a": 1}', 'x = add a a'], 'ConstantPropagation')
+        >>> len(k0), k0 == k1
+        (64, False)
+    """
+    digest = hashlib.sha256(f"{dialect}\0{VERSION}\0".encode("utf-8"))
+    for line in lines:
+        digest.update(line.rstrip("\n").encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def canonical_key(lines, dialect=DIALECT):
+    """
+    The key of a program whose text might differ only in spacing, in empty
+    lines, or in the order of the keys of the environment. Unlike
+    `program_key`, it does not depend on the binary format of programs, as
+    it only identifies solutions of analyses.
+
+    Example:
+        >>> k0 = canonical_key(['{"a": 1, "b": 2}', 'x = add a b'])
+        >>> k1 = canonical_key(['{"b":2,"a":1}\\n', 'x  =  add a  b', ''])
+        >>> k0 == k1, k0 == canonical_key(['{"a": 1, "b": 2}', 'x = add b a'])
+        (True, False)
+    """
+    digest = hashlib.sha256(f"{dialect}\0canonical\0".encode("utf-8"))
+    env = json.dumps(json.loads(lines[0]), sort_keys=True)
+    for line in [env] + [" ".join(line.split()) for line in lines[1:]]:
+        if line:
+            digest.update(line.encode("utf-8"))
+            digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def source_version(paths, *extra):
+    """
+    A version that changes whenever one of the source files in `paths`
+    changes (or one of the strings in `extra`, such as command-line flags).
+    Results cached under this version are discarded once the code that
+    computed them is edited.
+
+    Example:
+        >>> import lang, solver
+        >>> paths = [lang.__file__, solver.__file__]
+        >>> v = source_version(paths)
+        >>> len(v), v == source_version(paths)
+        (16, True)
+        >>> v == source_version(paths[:1]), v == source_version(paths, '--engine')
+        (False, False)
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+        digest.update(b"\0")
+    for text in extra:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def encode_solution(env, num_evals=0):
+    """
+    Encodes an environment that maps names to facts (sets of elements that
+    `marshal` handles), plus the number of evaluations that solved it. Each
+    element is stored once, and facts become sorted tuples of element
+    numbers; each distinct fact is stored once, and each name refers to its
+    fact via an array of integers. Facts that are not sets (such as the top
+    of the lattice) are stored as they are.
+
+    Example:
+        >>> from solver import UNIVERSE
+        >>> env = {'IN_0': set(), 'OUT_0': {('x', 0)}, 'IN_1': {('x', 0)}, 'OUT_1': UNIVERSE}
+        >>> decode_solution(encode_solution(env, 7))
+        ({'IN_0': set(), 'OUT_0': {('x', 0)}, 'IN_1': {('x', 0)}, 'OUT_1': UNIVERSE}, 7)
+    """
+    elements = {}
+    distinct = {}
+    others = []
+    refs = array("i")
+    for fact in env.values():
+        if isinstance(fact, (set, frozenset)):
+            numbers = [elements.setdefault(e, len(elements)) for e in fact]
+            refs.append(distinct.setdefault(tuple(sorted(numbers)), len(distinct)))
+        else:
+            refs.append(-1 - len(others))
+            others.append(repr(fact))
+    data = (
+        SOLUTION_FORMAT,
+        num_evals,
+        list(env),
+        list(elements),
+        list(distinct),
+        others,
+        refs.tobytes(),
+    )
+    return zlib.compress(marshal.dumps(data))
+
+
+def decode_solution(data):
+    """
+    The pair (environment, number of evaluations) encoded by
+    `encode_solution`. Raises ValueError if `data` is not in the format that
+    this version of the cache writes.
+    """
+    try:
+        fields = marshal.loads(zlib.decompress(data))
+    except (zlib.error, EOFError, TypeError) as e:
+        raise ValueError(f"Invalid solution: {e}")
+    if fields[0] != SOLUTION_FORMAT:
+        raise ValueError(f"Unknown solution format: {fields[0]}")
+    _, num_evals, names, elements, distinct, others, raw_refs = fields
+    refs = array("i")
+    refs.frombytes(raw_refs)
+    facts = [{elements[e] for e in fact} for fact in distinct]
+    env = {}
+    for name, ref in zip(names, refs):
+        env[name] = set(facts[ref]) if ref >= 0 else named_fact(others[-1 - ref])
+    return (env, num_evals)
+
+
+def named_fact(text):
+    """
+    The fact that is not a set whose representation is `text`.
+    """
+    from solver import UNIVERSE
+
+    if text == repr(UNIVERSE):
+        return UNIVERSE
+    raise ValueError(f"Unknown fact: {text}")
+
+
+class Cache:
+    """
+    A directory of cached programs and analysis results.
+
+    Attributes:
+        directory: where the entries of the cache are stored.
+        max_bytes: the maximum size of all the entries, together.
+        max_age: the time, in seconds, after which unused entries expire.
+        hits, misses, evictions: counters, reported by `report`.
+
+    Example:
+        >>> import tempfile
+        >>> from lang import Inst
+        >>> cache = Cache(tempfile.mkdtemp())
+        >>> lines = ['{"a": 1, "b": 3}', 'x = add a b', 'bt x 0']
+        >>> Inst.next_index = 0
+        >>> env, prog = cache.file2cfg_and_env(lines)
+        >>> Inst.next_index = 0
+        >>> env, prog = cache.file2cfg_and_env(lines)
+        >>> str(prog[0]), env.get('b')
+        ('0: x = a+b\\n  P: 1\\n  N: 1', 3)
+        >>> cache.report()
+        'hits: 1, misses: 1, evictions: 0'
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.directory = directory or os.environ.get("DCC888_CACHE", DEFAULT_DIR)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # An upper bound on the size of the entries, or None before the first
+        # scan of the directory (see `_write` and `evict`).
+        self.size = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def _touch(self, path):
+        """
+        Marks the entry at `path` as the most recently used one.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path, data):
+        """
+        Writes an entry atomically: concurrent drivers either see the whole
+        entry, or no entry at all. The directory is scanned by `evict` only in
+        the first write, and when the writes of this object might have filled
+        the cache; thus, a batch of n writes does not scan it n times.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        if self.size is None or self.size + len(data) > self.max_bytes:
+            self.evict()
+        else:
+            self.size += len(data)
+
+    def get_program(self, key):
+        """
+        Returns the program stored under `key`, or None on a miss.
+        """
+        path = self._path(key, PROGRAM_EXT)
+        try:
+            program = load(path)
+        except (OSError, ValueError, struct.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(path)
+        return program
+
+    def put_program(self, key, env_dict, table):
+        """
+        Stores the program formed by `env_dict` and `table` under `key`, and
+        returns its binary representation.
+        """
+        file = BytesIO()
+        dump_table(env_dict, table, file)
+        data = file.getvalue()
+        self._write(self._path(key, PROGRAM_EXT), data)
+        return data
+
+    def load_program(self, lines, dialect=DIALECT) -> LazyProgram:
+        """
+        Returns the lazy program described by `lines`, parsing it only if it
+        is not in the cache yet. The initial environment can be obtained via
+        the method `env` of the program.
+        """
+        key = program_key(lines, dialect)
+        program = self.get_program(key)
+        if program is None:
+            table = parse_table(lines[1:])
+            program = loads(self.put_program(key, json.loads(lines[0]), table))
+        return program
+
+    def file2cfg_and_env(self, lines, dialect=DIALECT):
+        """
+        A replacement for `parser.file2cfg_and_env` that goes through the
+        cache.
+        """
+        program = self.load_program(lines, dialect)
+        return (program.env(), program.insts())
+
+    def get_result(self, key, analysis):
+        """
+        Returns the result of `analysis` on the program stored under `key`, or
+        None on a miss.
+        """
+        path = self._path(f"{key}.{analysis}", RESULT_EXT)
+        try:
+            with open(path, "rb") as file:
+                result = marshal.load(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(path)
+        return result
+
+    def put_result(self, key, analysis, result):
+        """
+        Stores the result of `analysis` on the program stored under `key`. The
+        result can be any value that `marshal` handles, e.g., dictionaries of
+        sets of strings and tuples.
+
+        Example:
+            >>> import tempfile
+            >>> cache = Cache(tempfile.mkdtemp())
+            >>> cache.put_result('k', 'liveness', {'IN_0': {'a', 'b'}})
+            >>> sorted(cache.get_result('k', 'liveness')['IN_0'])
+            ['a', 'b']
+            >>> cache.get_result('k', 'dominance') is None
+            True
+        """
+        path = self._path(f"{key}.{analysis}", RESULT_EXT)
+        self._write(path, marshal.dumps(result))
+
+    def cached(self, key, name, version, compute):
+        """
+        The pair (environment, number of evaluations) that `compute()`
+        returns, for the analysis `name`, at `version`, of the program whose
+        canonical key is `key`. On a hit, `compute` is not called.
+
+        Example:
+            >>> import tempfile
+            >>> cache = Cache(tempfile.mkdtemp())
+            >>> solve = lambda: ({'IN_0': {'a'}, 'OUT_0': set()}, 2)
+            >>> cache.cached('k', 'liveness', 1, solve) == cache.cached('k', 'liveness', 1, None)
+            True
+            >>> cache.report()
+            'hits: 1, misses: 1, evictions: 0'
+        """
+        analysis = f"{name}.v{version}"
+        data = self.get_result(key, analysis)
+        if data is not None:
+            try:
+                return decode_solution(data)
+            except ValueError:
+                self.hits -= 1
+                self.misses += 1
+        env, num_evals = compute()
+        self.put_result(key, analysis, encode_solution(env, num_evals))
+        return (env, num_evals)
+
+    def solve(self, analysis, lines, insts, dialect=DIALECT, **kwargs):
+        """
+        The same as `solver.solve(analysis, insts, **kwargs)`, where `insts`
+        are the instructions of the program in `lines`, but the solution is
+        taken from the cache if the program has been solved before by the
+        same version of the analysis. On a hit, the number of evaluations is
+        the one of the run that filled the cache.
+
+        Example:
+            >>> import tempfile
+            >>> from analyses import Liveness
+            >>> from lang import Inst
+            >>> from parallel_parser import load_program
+            >>> cache = Cache(tempfile.mkdtemp())
+            >>> lines = ['{"a": 1, "b": 3}', 'x = add a b', 'bt x 0']
+            >>> Inst.next_index = 0
+            >>> env, insts = load_program(lines)
+            >>> t0, n0 = cache.solve(Liveness(), lines, insts)
+            >>> t1, n1 = cache.solve(Liveness(), lines, insts)
+            >>> t0 == t1, n0 == n1, cache.hits, type(t1).__name__
+            (True, True, 1, 'FactTable')
+            >>> len(insts), sorted(t1['IN_0'])
+            (2, ['a', 'b'])
+        """
+        import solver
+
+        def compute():
+            table, num_evals = solver.solve(analysis, insts, **kwargs)
+            return (dict(table), num_evals)
+
+        key = canonical_key(lines, dialect)
+        name = type(analysis).__name__
+        env, num_evals = self.cached(key, name, analysis.version, compute)
+        table = solver.FactTable(insts, analysis.lattice.bottom())
+        for name, fact in env.items():
+            table[name] = fact
+        return (table, num_evals)
+
+    def entries(self):
+        """
+        The entries in the cache, as a list of (last use, size, path) triples.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith((PROGRAM_EXT, RESULT_EXT)):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """
+        Removes the entries that have not been used for `max_age` seconds,
+        and then the least recently used entries, until the size of the cache
+        is not larger than three quarters of `max_bytes`, which leaves room
+        for the next writes.
+
+        Example:
+            >>> import tempfile
+            >>> cache = Cache(tempfile.mkdtemp(), max_bytes=100)
+            >>> cache.put_result('k0', 'a', 'x' * 60)
+            >>> cache.put_result('k1', 'a', 'x' * 60)
+            >>> cache.get_result('k0', 'a') is None, cache.evictions
+            (True, 1)
+            >>> cache.size == sum(entry[1] for entry in cache.entries())
+            True
+            >>> cache.max_age = -1
+            >>> cache.evict()
+            >>> cache.entries(), cache.evictions
+            ([], 2)
+        """
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        expiry = time.time() - self.max_age
+        for last_use, entry_size, path in entries:
+            if size <= self.max_bytes * 3 // 4 and last_use >= expiry:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self.size = size
+
+    def report(self):
+        """
+        A summary of how the cache has been used so far.
+        """
+        return f"hits: {self.hits}, misses: {self.misses}, evictions: {self.evictions}"
@@ -0,0 +1,117 @@
+"""
+This file builds def-use and use-def chains out of the solution of reaching
+definitions. A use-def chain links an instruction u that uses a variable v to
+an instruction d that defines v, such that the definition (v, d) reaches u.
+A def-use chain is the same link, seen from the definition.
+
+Chains are stored in the compressed sparse row (CSR) format: the chains of
+the instruction in row r are the entries start[r] to start[r + 1] - 1 of flat
+arrays. Thus, the chains of an instruction are found in constant time, and
+iterating over them does not touch any set of data-flow facts.
+"""
+
+from array import array
+
+from solver import name_in
+
+
+class Chains:
+    """
+    The def-use and use-def chains of a program, given the environment (or
+    FactTable) with the solution of reaching definitions.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import ReachingDefinitions
+        >>> from solver import solve
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> chains = Chains(insts, solve(ReachingDefinitions(), insts)[0])
+        >>> list(chains.defs_of(repeat.ID)), list(chains.uses_of(c1.ID))
+        ([0, 3], [1, 3, 4])
+        >>> list(chains.defs_of(answer.ID, 'zero')), list(chains.defs_of(bt.ID))
+        ([], [1])
+        >>> len(chains), sorted(chains.data_slice(answer.ID))
+        (7, [0, 3, 4])
+    """
+
+    def __init__(self, insts, reaching):
+        self.ids = [inst.ID for inst in insts]
+        self.row = {ID: r for r, ID in enumerate(self.ids)}
+        self.def_start = array("l", [0])
+        self.def_ids = array("l")
+        self.def_vars = []
+        for inst in insts:
+            uses = inst.uses()
+            reaching_defs = [
+                (v, d) for (v, d) in reaching[name_in(inst.ID)] if v in uses
+            ]
+            for v, d in sorted(reaching_defs):
+                self.def_vars.append(v)
+                self.def_ids.append(d)
+            self.def_start.append(len(self.def_ids))
+        self.transpose()
+
+    def transpose(self):
+        """
+        Builds the def-use chains out of the use-def chains, with a counting
+        sort on the rows of the definitions.
+        """
+        num_rows = len(self.ids)
+        counts = [0] * (num_rows + 1)
+        for d in self.def_ids:
+            counts[self.row[d] + 1] += 1
+        for r in range(num_rows):
+            counts[r + 1] += counts[r]
+        self.use_start = array("l", counts)
+        self.use_ids = array("l", [0]) * len(self.def_ids)
+        fill = counts[:-1]
+        for r, ID in enumerate(self.ids):
+            for i in range(self.def_start[r], self.def_start[r + 1]):
+                d = self.row[self.def_ids[i]]
+                self.use_ids[fill[d]] = ID
+                fill[d] += 1
+
+    def defs_of(self, ID, var=None):
+        """
+        The IDs of the definitions that reach the uses of `var` (or of any
+        variable, if `var` is None) in the instruction `ID`.
+        """
+        r = self.row[ID]
+        for i in range(self.def_start[r], self.def_start[r + 1]):
+            if var is None or self.def_vars[i] == var:
+                yield self.def_ids[i]
+
+    def uses_of(self, ID):
+        """
+        The IDs of the instructions that use the definition `ID`.
+        """
+        r = self.row[ID]
+        return iter(self.use_ids[self.use_start[r] : self.use_start[r + 1]])
+
+    def data_slice(self, ID):
+        """
+        The IDs of the instructions that the instruction `ID` depends on, via
+        use-def chains, including `ID` itself.
+        """
+        visited = {ID}
+        worklist = [ID]
+        while worklist:
+            for d in self.defs_of(worklist.pop()):
+                if d not in visited:
+                    visited.add(d)
+                    worklist.append(d)
+        return visited
+
+    def __len__(self):
+        return len(self.def_ids)
@@ -0,0 +1,196 @@
+"""
+This file removes copy equations from a system of equations before solving
+it. Branches produce identity equations, such as "OUT[p] = IN[p]" in
+reaching definitions, and instructions with a single predecessor produce
+joins that copy the OUT fact of that predecessor. Such equations do not need
+to be solved: their facts are aliases of the facts that they copy. The
+pre-pass below maps each copied fact to a representative (the first fact,
+along a chain of copies, that is not a copy), solves the other equations,
+and then fills in the facts of the copies.
+
+Equations declare that they are copies via the method `copy_of`, which
+returns the name of the fact that they copy, or None. Equations without this
+method, such as the ones of dataflow.py, are never copies.
+"""
+
+import solver
+
+from solver import FactTable, bind, phase
+
+
+def aliases(equations):
+    """
+    Maps the name of each fact defined by a copy equation to its
+    representative. If copies form a cycle, then one equation of the cycle
+    is kept, and the other facts of the cycle become its aliases.
+
+    Example:
+        >>> class Eq:
+        ...     def __init__(self, n, c): self.n, self.c = n, c
+        ...     def name(self): return self.n
+        ...     def copy_of(self): return self.c
+        >>> eqs = [Eq('a', None), Eq('b', 'a'), Eq('c', 'b'), Eq('d', 'e'), Eq('e', 'd')]
+        >>> sorted(aliases(eqs).items())
+        [('b', 'a'), ('c', 'a'), ('e', 'd')]
+    """
+    sources = {}
+    for eq in equations:
+        source = eq.copy_of() if hasattr(eq, "copy_of") else None
+        if source is not None and source != eq.name():
+            sources[eq.name()] = source
+    rep = {}
+    for name in list(sources):
+        path = []
+        on_path = set()
+        current = name
+        while current in sources and current not in rep:
+            if current in on_path:
+                # A cycle of copies: `current` keeps its equation.
+                del sources[current]
+                break
+            on_path.add(current)
+            path.append(current)
+            current = sources[current]
+        root = rep.get(current, current)
+        for member in path:
+            if member in sources:
+                rep[member] = root
+    return rep
+
+
+class AliasEnv(dict):
+    """
+    An environment in which aliases are read from their representatives.
+
+    Example:
+        >>> env = AliasEnv({'b': 'a'})
+        >>> env['a'] = {1}
+        >>> env['b'], 'b' in env
+        ({1}, False)
+    """
+
+    def __init__(self, rep):
+        super().__init__()
+        self.rep = rep
+
+    def __getitem__(self, name):
+        return dict.__getitem__(self, self.rep.get(name, name))
+
+
+class AliasedEq:
+    """
+    An equation whose dependences are replaced by their representatives. It
+    reads its facts from an AliasEnv.
+    """
+
+    def __init__(self, eq, rep):
+        self.eq = eq
+        self.rep = rep
+
+    def name(self):
+        return self.eq.name()
+
+    def deps(self):
+        return [self.rep.get(dep, dep) for dep in self.eq.deps()]
+
+    def eval(self, env):
+        return self.eq.eval(env)
+
+    def __str__(self):
+        return str(self.eq)
+
+
+def collapsed_interp(equations, bottom=set, stats=None):
+    """
+    Solves `equations` with the worklist solver, after collapsing the copy
+    equations. Returns the environment of every fact, including the copies,
+    and the number of evaluations. Facts start as `bottom()`.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> from analyses import ReachingDefinitions
+        >>> from solver import interp
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'x', 'y')
+        >>> i1 = Bt('x')
+        >>> i2 = Add('y', 'x', 'y')
+        >>> i3 = Add('z', 'x', 'y')
+        >>> i0.add_next(i1)
+        >>> i1.add_true_next(i0)
+        >>> i1.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> eqs = ReachingDefinitions().equations([i0, i1, i2, i3])
+        >>> sorted(aliases(eqs).items())
+        [('IN_1', 'OUT_0'), ('IN_2', 'OUT_0'), ('IN_3', 'OUT_2'), ('OUT_1', 'OUT_0')]
+        >>> env, num_evals = collapsed_interp(eqs)
+        >>> env == interp(eqs)[0], num_evals, interp(eqs)[1]
+        (True, 5, 16)
+    """
+    with phase(stats, "collapse"):
+        rep = aliases(equations)
+        reduced = [AliasedEq(eq, rep) for eq in equations if eq.name() not in rep]
+    env = AliasEnv(rep)
+    for eq in reduced:
+        env[eq.name()] = bottom()
+    with phase(stats, "solve"):
+        num_evals = solver.worklist_solve(reduced, env, stats=stats)
+    solution = dict(env)
+    for name in rep:
+        solution[name] = env[name]
+    return (solution, num_evals)
+
+
+def collapse_bound(equations, table):
+    """
+    Collapses equations bound to `table`: the equations that read an alias
+    read its representative instead. Returns the equations that remain,
+    plus the pairs (slot of a copy, slot of its representative).
+    """
+    rep = aliases(equations)
+    rep_slot = {table.slot(name): table.slot(root) for name, root in rep.items()}
+    reduced = []
+    for eq in equations:
+        if eq.slot not in rep_slot:
+            eq.dep_slots = [rep_slot.get(slot, slot) for slot in eq.dep_slots]
+            reduced.append(eq)
+    return reduced, list(rep_slot.items())
+
+
+def collapsed_solve(analysis, insts, strategy=None, stats=None):
+    """
+    The same as `solver.solve(analysis, insts, "worklist", strategy)`, but
+    the copy equations are collapsed before solving.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import ReachingDefinitions
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> table, num_evals = collapsed_solve(ReachingDefinitions(), insts)
+        >>> table == solver.solve(ReachingDefinitions(), insts)[0]
+        True
+    """
+    with phase(stats, "equations"):
+        equations = analysis.equations(insts)
+    with phase(stats, "bind"):
+        table = FactTable(insts, analysis.lattice.bottom())
+        bind(equations, table)
+    with phase(stats, "collapse"):
+        reduced, copies = collapse_bound(equations, table)
+    with phase(stats, "solve"):
+        num_evals = solver.indexed_worklist_solve(reduced, table, strategy, stats)
+    for slot, rep_slot in copies:
+        table.facts[slot] = table.facts[rep_slot]
+    if stats is not None:
+        stats.record_facts(table.facts)
+    return (table, num_evals)
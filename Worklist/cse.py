@@ -0,0 +1,299 @@
+"""
+This file eliminates common subexpressions. A binary operation p: x = a op b
+is redundant if the expression 'a op b' is available before p (see
+`analyses.AvailableExpressions`, solved here on bitsets): every path that
+reaches p has already computed it. If all the computations that reach p
+store the expression into the same variable v, and v is not redefined
+before p, then p is replaced by the copy x = v + zero, where zero is a new
+variable bound to 0. If v is x itself, then p is removed altogether.
+
+Each rewrite keeps the values of every variable at every program point;
+hence, all the rewrites can be decided on the solution of the analysis for
+the original program. Copies still execute; thus, once all the rewrites are
+done, `forward_copies` makes the uses of x read v, wherever they can, and
+removes the copies that no instruction reads anymore. The effect is
+measured by `run`, an interpreter that counts the instructions, and the
+arithmetic operations, that it executes.
+"""
+
+import solver
+
+from analyses import expression
+from bitset import BitsetAvailableExpressions
+from incremental import insert_after, remove
+from lang import Add, BinOp, Bt
+
+ZERO = "_zero"
+
+
+class Copy(Add):
+    """
+    The copy dst = src, encoded as dst = src + zero. Copies are counted
+    apart from the other operations by `run`.
+    """
+
+    def __str__(self):
+        inst_s = f"{self.ID}: {self.dst} = {self.src0}"
+        pred_s = f"\n  P: {', '.join([str(inst.ID) for inst in self.preds])}"
+        next_s = f"\n  N: {self.nexts[0].ID if len(self.nexts) > 0 else ''}"
+        return inst_s + pred_s + next_s
+
+
+def run(entry, env, max_steps=None):
+    """
+    Interprets the program that starts at `entry`, like `lang.interp`, but
+    without recursion. Returns the environment, the number of instructions
+    executed, and the number of binary operations executed, not counting
+    copies. Raises RuntimeError after `max_steps` instructions, if given.
+
+    Example:
+        >>> from lang import Env, Add, Lth, Bt
+        >>> env = Env({"m": 3, "n": 2, "zero": 0})
+        >>> m_min = Add("answer", "m", "zero")
+        >>> n_min = Add("answer", "n", "zero")
+        >>> p = Lth("p", "n", "m")
+        >>> b = Bt("p", n_min, m_min)
+        >>> p.add_next(b)
+        >>> env, steps, ops = run(p, env)
+        >>> env.get("answer"), steps, ops
+        (2, 3, 2)
+    """
+    steps = 0
+    ops = 0
+    inst = entry
+    while inst:
+        if steps == max_steps:
+            raise RuntimeError(f"More than {max_steps} steps.")
+        inst.eval(env)
+        steps += 1
+        if isinstance(inst, BinOp) and not isinstance(inst, Copy):
+            ops += 1
+        inst = inst.get_next()
+    return (env, steps, ops)
+
+
+def holder(inst, expr):
+    """
+    The variable that holds the value of `expr` before `inst`, or None if
+    there is no such variable. `expr` must be available before `inst`; thus,
+    walking backwards from `inst`, every path meets a computation of `expr`
+    before meeting a redefinition of its operands.
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Bt('c')
+        >>> i1 = Add('x', 'a', 'b')
+        >>> i2 = Add('x', 'b', 'a')
+        >>> i3 = Mul('y', 'a', 'b')
+        >>> i4 = Add('z', 'a', 'b')
+        >>> i0.add_true_next(i1)
+        >>> i0.add_next(i2)
+        >>> i1.add_next(i3)
+        >>> i2.add_next(i3)
+        >>> i3.add_next(i4)
+        >>> holder(i4, ('+', 'a', 'b')), holder(i3, ('*', 'a', 'b'))
+        ('x', None)
+    """
+    operands = set(expr[1:])
+    holders = set()
+    defined = set()
+    visited = set()
+    worklist = list(inst.preds)
+    while worklist:
+        pred = worklist.pop()
+        if pred in visited:
+            continue
+        visited.add(pred)
+        defs = pred.definition()
+        if expression(pred) == expr and not defs & operands:
+            holders |= defs
+        elif not pred.preds:
+            return None
+        else:
+            defined |= defs
+            worklist.extend(pred.preds)
+    if len(holders) == 1 and not holders & defined:
+        return holders.pop()
+    return None
+
+
+def fresh_name(insts, name=ZERO):
+    """
+    `name`, or `name` followed by a number, so that no instruction in `insts`
+    uses or defines it.
+    """
+    names = set()
+    for inst in insts:
+        names |= inst.uses() | inst.definition()
+    fresh = name
+    suffix = 0
+    while fresh in names:
+        suffix += 1
+        fresh = f"{name}{suffix}"
+    return fresh
+
+
+def reached_uses(copy):
+    """
+    The instructions that read the variable that `copy` defines, before it
+    is redefined, plus True if the definition of `copy` reaches the end of
+    the program, where the variable is part of the result.
+    """
+    var = copy.dst
+    uses = []
+    visited = {copy}
+    worklist = [copy]
+    reaches_exit = False
+    while worklist:
+        inst = worklist.pop()
+        if None in inst.nexts or not inst.nexts:
+            reaches_exit = True
+        for succ in inst.nexts:
+            if succ is None or succ in visited:
+                continue
+            visited.add(succ)
+            if var in succ.uses():
+                uses.append(succ)
+            if var not in succ.definition():
+                worklist.append(succ)
+    return (uses, reaches_exit)
+
+
+def copied_value(copy, use, entry):
+    """
+    True if the variable `src` of the copy `dst = src` holds the same value
+    as `dst` before `use`: walking backwards from `use`, every path meets the
+    copy before meeting a definition of `dst` or of `src`, or the entry of
+    the program.
+    """
+    variables = {copy.dst, copy.src0}
+    visited = set()
+    worklist = list(use.preds)
+    while worklist:
+        pred = worklist.pop()
+        if pred is copy or pred in visited:
+            continue
+        visited.add(pred)
+        if pred is entry or not pred.preds or pred.definition() & variables:
+            return False
+        worklist.extend(pred.preds)
+    return use is not entry
+
+
+def rename_use(inst, old, new):
+    """
+    Makes `inst` read the variable `new` instead of `old`.
+    """
+    if isinstance(inst, Bt):
+        inst.cond = new if inst.cond == old else inst.cond
+    else:
+        inst.src0 = new if inst.src0 == old else inst.src0
+        inst.src1 = new if inst.src1 == old else inst.src1
+
+
+def forward_copies(copies, entry):
+    """
+    Removes each copy x = v whose definition does not reach the end of the
+    program, and such that v still holds the value of x at every instruction
+    that reads x; these instructions read v instead. `entry` is the first
+    instruction of the program. Returns the set of copies removed.
+
+    Example:
+        >>> from lang import Inst, Env, Add, Mul
+        >>> Inst.next_index = 0
+        >>> i0 = Add('v', 'a', 'b')
+        >>> i1 = Copy('x', 'v', '_zero')
+        >>> i2 = Mul('y', 'x', 'x')
+        >>> i3 = Add('x', 'y', 'a')
+        >>> i4 = Copy('z', 'y', '_zero')
+        >>> for inst, succ in [(i0, i1), (i1, i2), (i2, i3), (i3, i4)]:
+        ...     inst.add_next(succ)
+        >>> removed = forward_copies([i1, i4], i0)
+        >>> [inst.ID for inst in removed], str(i2).split('\\n')[0], i0.nexts == [i2]
+        ([1], '2: y = v*v', True)
+    """
+    removed = set()
+    for copy in copies:
+        uses, reaches_exit = reached_uses(copy)
+        if reaches_exit or copy is entry:
+            continue
+        if all(copied_value(copy, use, entry) for use in uses):
+            for use in uses:
+                rename_use(use, copy.dst, copy.src0)
+            remove(copy)
+            removed.add(copy)
+    return removed
+
+
+def eliminate_common_subexpressions(insts, env):
+    """
+    Rewrites the redundant binary operations of `insts`, and returns the list
+    of instructions that remain, plus the number of operations removed and
+    the number of operations replaced by copies that remain (see
+    `forward_copies`). If there are copies, then their variable zero is
+    added to the environment `env`.
+
+    Example:
+        >>> from lang import Inst, Env, Add, Mul, Lth, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> i1 = Lth('c', 'x', 'b')
+        >>> i2 = Bt('c')
+        >>> i3 = Mul('a', 'a', 'b')
+        >>> i4 = Add('y', 'b', 'a')
+        >>> i5 = Add('x', 'a', 'b')
+        >>> i6 = Add('x', 'b', 'a')
+        >>> for inst, succ in [(i0, i1), (i1, i2), (i2, i4), (i4, i5), (i5, i6)]:
+        ...     inst.add_next(succ)
+        >>> i2.add_true_next(i3)
+        >>> i3.add_next(i4)
+        >>> insts = [i0, i1, i2, i3, i4, i5, i6]
+        >>> before = run(i0, Env({'a': 2, 'b': 3}))
+        >>> env = Env({'a': 2, 'b': 3})
+        >>> insts, num_removed, num_copies = eliminate_common_subexpressions(insts, env)
+        >>> num_removed, num_copies
+        (1, 1)
+        >>> print(insts[-1])
+        7: x = y
+          P: 4
+          N: 
+        >>> after = run(i0, env)
+        >>> after[0].get('x') == before[0].get('x'), before[1:], after[1:]
+        (True, (6, 5), (5, 3))
+    """
+    avail = BitsetAvailableExpressions()
+    table, _ = solver.solve(avail, insts)
+    zero = fresh_name(insts)
+    rewrites = []
+    for inst in insts:
+        e = expression(inst)
+        facts = table[solver.name_in(inst.ID)]
+        if e is None or facts == -1 or inst in inst.nexts:
+            continue
+        if facts >> avail.encoding.bit(e) & 1:
+            v = holder(inst, e)
+            if v is not None:
+                rewrites.append((inst, v))
+    removed = set()
+    copies = {}
+    for inst, v in rewrites:
+        if v not in inst.definition():
+            copies[inst] = Copy(inst.dst, v, zero)
+            insert_after(inst, copies[inst])
+        removed.add(inst)
+        remove(inst)
+    remaining = []
+    for inst in insts:
+        if inst in copies:
+            remaining.append(copies[inst])
+        elif inst not in removed:
+            remaining.append(inst)
+    forwarded = set()
+    if copies:
+        forwarded = forward_copies(list(copies.values()), remaining[0])
+        remaining = [inst for inst in remaining if inst not in forwarded]
+    num_copies = len(copies) - len(forwarded)
+    if num_copies:
+        env.set(zero, 0)
+    return (remaining, len(removed) - num_copies, num_copies)
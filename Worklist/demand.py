@@ -0,0 +1,157 @@
+"""
+This file answers liveness questions on demand, without solving liveness
+analysis for the whole program. A variable v is alive at the entry of an
+instruction p if there is a path from p to a use of v that does not cross a
+definition of v. Thus, to know if v is alive at p, it suffices to walk the
+control-flow graph backwards, from the uses of v, stopping at definitions of
+v, until p is found. The walk stops as soon as it answers the question, and
+the next question about v resumes it: the part of the live range of v that
+was already found is never visited again.
+
+The oracle only relies on the methods `definition` and `uses`, plus the
+attributes `preds` and `nexts`, of instructions.
+"""
+
+from solver import successors
+
+
+class LiveRange:
+    """
+    The part of the live range of `var` found so far. `live_in` and
+    `live_out` are the IDs of the instructions where `var` is known to be
+    alive at the entry and at the exit, and `frontier` holds the
+    instructions whose predecessors have not been visited yet.
+    """
+
+    def __init__(self, var, uses):
+        self.var = var
+        self.live_in = {inst.ID for inst in uses}
+        self.live_out = set()
+        self.frontier = list(uses)
+
+    def search(self, ID, found):
+        """
+        Walks backwards until `ID` is in `found` (either `live_in` or
+        `live_out`), or until the whole live range is known. Returns True if
+        `ID` is in `found`.
+        """
+        while ID not in found and self.frontier:
+            inst = self.frontier.pop()
+            for pred in inst.preds:
+                if pred.ID in self.live_out:
+                    continue
+                self.live_out.add(pred.ID)
+                if self.var not in pred.definition() and pred.ID not in self.live_in:
+                    self.live_in.add(pred.ID)
+                    self.frontier.append(pred)
+        return ID in found
+
+
+class LivenessOracle:
+    """
+    Answers questions such as "is v alive at the entry of p?".
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> oracle = LivenessOracle([i0, i1])
+        >>> oracle.is_live('a', i1), oracle.is_live('c', i0), oracle.is_live('c', i1)
+        (True, False, True)
+        >>> sorted(oracle.live_in(i0)), sorted(oracle.live_out(i0))
+        (['a', 'b'], ['a', 'c'])
+    """
+
+    def __init__(self, insts):
+        self.insts = insts
+        self.uses = None
+        self.ranges = {}
+
+    def index(self):
+        """
+        Maps each variable to the instructions that use it, in one pass over
+        the program, and forgets the live ranges found so far. The oracle
+        calls this method before its first question; call it again if the
+        program changes.
+        """
+        self.uses = {}
+        self.ranges = {}
+        for inst in self.insts:
+            for v in inst.uses():
+                self.uses.setdefault(v, []).append(inst)
+
+    def live_range(self, var):
+        """
+        The LiveRange of `var`, as far as it is known.
+        """
+        if self.uses is None:
+            self.index()
+        if var not in self.ranges:
+            self.ranges[var] = LiveRange(var, self.uses.get(var, []))
+        return self.ranges[var]
+
+    def is_live(self, var, inst):
+        """
+        True if `var` is alive at the entry of `inst`.
+
+        Example:
+            >>> from lang import Inst, Add, Lth, Bt
+            >>> Inst.next_index = 0
+            >>> i0 = Add('x', 'a', 'b')
+            >>> i1 = Lth('c', 'x', 'n')
+            >>> i2 = Bt('c')
+            >>> i3 = Add('x', 'x', 'one')
+            >>> i4 = Add('y', 'x', 'x')
+            >>> i0.add_next(i1)
+            >>> i1.add_next(i2)
+            >>> i2.add_true_next(i3)
+            >>> i2.add_next(i4)
+            >>> i3.add_next(i1)
+            >>> oracle = LivenessOracle([i0, i1, i2, i3, i4])
+            >>> oracle.is_live('x', i4), sorted(oracle.live_range('x').live_in)
+            (True, [1, 3, 4])
+            >>> [oracle.is_live('x', i) for i in [i0, i1, i2, i3, i4]]
+            [False, True, True, True, True]
+        """
+        live = self.live_range(var)
+        return live.search(inst.ID, live.live_in)
+
+    def is_live_out(self, var, inst):
+        """
+        True if `var` is alive at the exit of `inst`.
+        """
+        live = self.live_range(var)
+        return live.search(inst.ID, live.live_out)
+
+    def reachable_uses(self, starts):
+        """
+        The variables used by the instructions that can be reached from the
+        instructions in `starts`. Only these variables can be alive there.
+        """
+        variables = set()
+        seen = {inst.ID for inst in starts}
+        worklist = list(starts)
+        while worklist:
+            inst = worklist.pop()
+            variables |= inst.uses()
+            for succ in successors(inst):
+                if succ.ID not in seen:
+                    seen.add(succ.ID)
+                    worklist.append(succ)
+        return variables
+
+    def live_in(self, inst):
+        """
+        The IN set of liveness analysis at `inst`.
+        """
+        candidates = self.reachable_uses([inst])
+        return {v for v in candidates if self.is_live(v, inst)}
+
+    def live_out(self, inst):
+        """
+        The OUT set of liveness analysis at `inst`.
+        """
+        candidates = self.reachable_uses(successors(inst))
+        return {v for v in candidates if self.is_live_out(v, inst)}
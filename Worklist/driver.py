@@ -16,15 +16,125 @@ def worklist_solver(program):
     return dataflow.abstract_interp(equations)
 
 
+def watched_solver(stats):
+    """
+    The solver of dataflow.py, with its equations watched by `stats` (see
+    instrument.watch), which records each evaluation, the time of each phase,
+    and the sizes of the facts in the solution.
+    """
+    from instrument import watch
+
+    def solve(program):
+        with stats.phase("equations"):
+            equations = dataflow.reaching_defs_constraint_gen(program)
+        with stats.phase("solve"):
+            (env, num_evals) = dataflow.abstract_interp(watch(equations, stats))
+        stats.record_facts(env.values())
+        return (env, num_evals)
+
+    return solve
+
+
+def engine_solvers(stats):
+    """
+    The chaotic and the worklist solvers of reaching definitions, built on
+    the engine of solver.py, instead of dataflow.py. The dictionary `stats`
+    maps the name of each solver to an Instrumentation (see instrument.py),
+    or to None.
+    """
+    import solver
+    from analyses import ReachingDefinitions
+
+    def solver_of(method):
+        return lambda program: solver.solve(
+            ReachingDefinitions(), program, method, stats=stats[method]
+        )
+
+    return {"chaotic": solver_of("chaotic"), "worklist": solver_of("worklist")}
+
+
 if __name__ == "__main__":
     """
     This function reads a program, and solves reaching definition analysis
     for it, using either chaotic iterations or the worklist-based algorithm.
+    The other flags are not part of the assignment:
+
+    * `--engine`: solves the analysis with the engine of solver.py, and
+      reads the program with parallel_parser.py, instead of using the
+      solvers of dataflow.py and the parser of parser.py.
+    * `--stats`: prints the statistics of both solvers (see instrument.py),
+      as JSON, in the standard error. It works with the solvers of
+      dataflow.py, and with the engine, if `--engine` is given too.
+    * `--cache`: reads the program via the cache of parsed programs (see
+      cache.py).
+    * `--cache-results`: takes the solutions of both solvers from the cache,
+      when the same program has been solved before, with the same flags and
+      the same code; in this case, the program is not even parsed.
+      Statistics require solving, so `--stats` disables this flag.
     """
     lang.Inst.next_index = 0
     lines = sys.stdin.readlines()
-    env, program = parser.file2cfg_and_env(lines)
-    (env_chaotic, n_chaotic) = chaotic_solver(program)
-    (env_worklist, n_worklist) = worklist_solver(program)
+    stats = {"chaotic": None, "worklist": None}
+    if "--stats" in sys.argv:
+        from instrument import Instrumentation
+
+        stats = {name: Instrumentation() for name in stats}
+    engine = "--engine" in sys.argv
+    solvers = {"chaotic": chaotic_solver, "worklist": worklist_solver}
+    if engine:
+        solvers = engine_solvers(stats)
+    elif "--stats" in sys.argv:
+        solvers = {name: watched_solver(s) for name, s in stats.items()}
+    program_cache = None
+    if "--cache" in sys.argv or "--cache-results" in sys.argv:
+        import cache
+
+        program_cache = cache.Cache()
+    program = None
+
+    def load_program():
+        global program
+        if program is None:
+            if "--cache" in sys.argv:
+                _, program = program_cache.file2cfg_and_env(lines)
+            elif engine:
+                from parallel_parser import load_program as load
+
+                _, program = load(lines)
+            else:
+                _, program = parser.file2cfg_and_env(lines)
+        return program
+
+    if "--cache-results" in sys.argv:
+        # Results are keyed by the way the program was read and solved, and
+        # by a hash of the code that did it: editing this driver, the parser,
+        # the solvers or the language discards the results cached before.
+        import analyses, bytecode, graphs, instrument, lazy, parallel_parser
+        import solver, strategies
+
+        modules = [lang, parser, dataflow, cache, bytecode, lazy, parallel_parser]
+        modules += [solver, analyses, strategies, graphs, instrument]
+        paths = [__file__] + [module.__file__ for module in modules]
+        version = cache.source_version(paths)
+        loader = "cache" if "--cache" in sys.argv else "loader" if engine else "parser"
+        method = "engine" if engine else "dataflow"
+    results = {}
+    for name, solve in solvers.items():
+        compute = lambda: solve(load_program())
+        if "--cache-results" in sys.argv and stats[name] is None:
+            key = cache.canonical_key(lines)
+            analysis = f"{name}_{method}_{loader}"
+            results[name] = program_cache.cached(key, analysis, version, compute)
+        else:
+            results[name] = compute()
+    (env_chaotic, n_chaotic) = results["chaotic"]
+    (env_worklist, n_worklist) = results["worklist"]
+    if program_cache:
+        print(f"Cache: {program_cache.report()}", file=sys.stderr)
+    if "--stats" in sys.argv:
+        import json
+
+        report = {name: s.to_dict() for name, s in stats.items()}
+        print(json.dumps(report), file=sys.stderr)
     print(f"Are the environments the same? {env_chaotic == env_worklist}")
     print(f"Does it iterate less than chaotic-sol? {n_worklist <= n_chaotic}")
@@ -0,0 +1,194 @@
+"""
+This file contains graph algorithms used by the solvers. Graphs are given as
+a list of nodes, plus a function that maps each node to its successors. All
+the algorithms are iterative; hence, they work on graphs of any depth.
+"""
+
+
+def postorder(nodes, succs):
+    """
+    Returns the nodes of the graph in post-order. The depth-first search
+    starts from each node of `nodes`, in order, that has not been visited yet.
+
+    Example:
+        >>> g = {0: [1, 2], 1: [3], 2: [3], 3: [0]}
+        >>> postorder([0, 1, 2, 3], lambda n: g[n])
+        [3, 1, 2, 0]
+    """
+    order = []
+    visited = set()
+    for root in nodes:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(succs(root)))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(succs(child))))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    return order
+
+
+def reverse_postorder(nodes, succs):
+    """
+    Returns the nodes of the graph in reverse post-order.
+
+    Example:
+        >>> g = {0: [1, 2], 1: [3], 2: [3], 3: [0]}
+        >>> reverse_postorder([0, 1, 2, 3], lambda n: g[n])
+        [0, 2, 1, 3]
+    """
+    return postorder(nodes, succs)[::-1]
+
+
+def back_edges(nodes, succs):
+    """
+    Returns the back edges of the depth-first search of `postorder`, as
+    pairs (source, target): the edges that go from a node to one of its
+    ancestors in the search tree, or to itself.
+
+    Example:
+        >>> g = {0: [1, 2], 1: [3], 2: [3], 3: [0, 3]}
+        >>> back_edges([0, 1, 2, 3], lambda n: g[n])
+        [(3, 0), (3, 3)]
+    """
+    order = postorder(nodes, succs)
+    position = {node: i for i, node in enumerate(order)}
+    return [
+        (node, succ)
+        for node in order
+        for succ in succs(node)
+        if position[succ] >= position[node]
+    ]
+
+
+def natural_loops(nodes, succs, preds):
+    """
+    Maps the target of each back edge (see `back_edges`), which is the
+    header of a loop, to the set of nodes of the loop: the header, plus the
+    nodes that reach the source of one of its back edges without crossing
+    the header. Loops that share a header are merged.
+
+    Example:
+        >>> g = {0: [1], 1: [2, 4], 2: [3], 3: [1], 4: [4]}
+        >>> p = {0: [], 1: [0, 3], 2: [1], 3: [2], 4: [1, 4]}
+        >>> loops = natural_loops([0, 1, 2, 3, 4], lambda n: g[n], lambda n: p[n])
+        >>> sorted((header, sorted(body)) for header, body in loops.items())
+        [(1, [1, 2, 3]), (4, [4])]
+    """
+    loops = {}
+    for latch, header in back_edges(nodes, succs):
+        body = loops.setdefault(header, {header})
+        if latch in body:
+            continue
+        body.add(latch)
+        worklist = [latch]
+        while worklist:
+            node = worklist.pop()
+            for pred in preds(node):
+                if pred not in body:
+                    body.add(pred)
+                    worklist.append(pred)
+    return loops
+
+
+def strongly_connected_components(nodes, succs):
+    """
+    Finds the strongly connected components of the graph, using Tarjan's
+    algorithm. Components are returned in topological order: if there is an
+    edge from a node in component C0 to a node in component C1, then C0
+    appears before C1.
+
+    Example:
+        >>> g = {0: [1], 1: [2], 2: [1, 3], 3: []}
+        >>> strongly_connected_components([0, 1, 2, 3], lambda n: g[n])
+        [[0], [1, 2], [3]]
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(succs(root)))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(succs(child))))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component, key=index.get))
+    components.reverse()
+    return components
+
+
+def immediate_dominators(root, succs):
+    """
+    Finds the immediate dominator of each node reachable from `root`, with
+    the algorithm of Cooper, Harvey and Kennedy ("A Simple, Fast Dominance
+    Algorithm"). Returns a dictionary from nodes to their immediate
+    dominators; the root is its own immediate dominator.
+
+    Example:
+        >>> g = {0: [1, 2], 1: [3], 2: [3], 3: [1, 4], 4: []}
+        >>> idom = immediate_dominators(0, lambda n: g[n])
+        >>> [idom[n] for n in range(5)]
+        [0, 0, 0, 0, 3]
+    """
+    order = reverse_postorder([root], succs)
+    number = {node: i for i, node in enumerate(order)}
+    preds = {node: [] for node in order}
+    for node in order:
+        for succ in succs(node):
+            preds[succ].append(node)
+    idom = {root: root}
+
+    def intersect(a, b):
+        while a != b:
+            while number[a] > number[b]:
+                a = idom[a]
+            while number[b] > number[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for node in order[1:]:
+            new_idom = None
+            for pred in preds[node]:
+                if pred in idom:
+                    new_idom = pred if new_idom is None else intersect(pred, new_idom)
+            if idom.get(node) != new_idom:
+                idom[node] = new_idom
+                changed = True
+    return idom
@@ -0,0 +1,242 @@
+"""
+This file shares data-flow facts among program points. Many facts are equal
+to the fact of a neighbour: a branch copies IN to OUT, and the join of an
+instruction with a single predecessor is the OUT fact of that predecessor.
+Facts are frozen sets, and a `FactPool` interns them: equal sets are stored
+only once, so two facts are equal if, and only if, they are the same object.
+Hence, the solver compares facts by identity, and the results of union and
+difference are memoized in dictionaries indexed by the identities of their
+operands.
+
+`Interned(analysis)` solves any gen/kill analysis of analyses.py on interned
+facts, with the engine of solver.py.
+"""
+
+import sys
+
+from solver import GenKillAnalysis, JoinEq, Lattice, TransferEq, UNIVERSE
+
+
+class FactPool:
+    """
+    A set of interned facts, plus the memoized results of unions and of
+    differences among them.
+
+    Example:
+        >>> pool = FactPool()
+        >>> a, b = pool.intern({1, 2}), pool.intern([2, 1])
+        >>> a is b, type(a).__name__
+        (True, 'frozenset')
+        >>> c = pool.union(a, pool.intern({3}))
+        >>> c is pool.intern({1, 2, 3}), c is pool.union(pool.intern({3}), a)
+        (True, True)
+        >>> pool.union(a, pool.empty) is a, pool.hits
+        (True, 1)
+    """
+
+    def __init__(self):
+        self.facts = {}
+        self.unions = {}
+        self.differences = {}
+        self.hits = 0
+        self.misses = 0
+        self.empty = self.intern(frozenset())
+
+    def intern(self, fact):
+        """
+        The canonical copy of `fact`. The pool keeps its canonical facts
+        alive; hence, their identities can be used as keys.
+        """
+        if not isinstance(fact, frozenset):
+            fact = frozenset(fact)
+        return self.facts.setdefault(fact, fact)
+
+    def union(self, a, b):
+        if a is b or not b:
+            return a
+        if not a:
+            return b
+        key = (id(a), id(b)) if id(a) < id(b) else (id(b), id(a))
+        result = self.unions.get(key)
+        if result is None:
+            self.misses += 1
+            if len(a) < len(b):
+                a, b = b, a
+            result = a if b <= a else self.intern(a | b)
+            self.unions[key] = result
+        else:
+            self.hits += 1
+        return result
+
+    def difference(self, fact, kill, key):
+        """
+        The elements e of `fact` such that key(e) is not in the interned set
+        `kill`.
+        """
+        if not fact or not kill:
+            return fact
+        memo = (id(fact), id(kill))
+        result = self.differences.get(memo)
+        if result is None:
+            self.misses += 1
+            kept = frozenset(e for e in fact if key(e) not in kill)
+            result = fact if len(kept) == len(fact) else self.intern(kept)
+            self.differences[memo] = result
+        else:
+            self.hits += 1
+        return result
+
+    def compact(self, live):
+        """
+        Forgets every fact that is not in `live`, together with the memoized
+        operations. Solving produces many intermediate facts; once the
+        analysis is solved, only the facts of the solution are needed.
+        """
+        self.facts = {}
+        self.unions = {}
+        self.differences = {}
+        self.empty = self.intern(frozenset())
+        for fact in live:
+            self.intern(fact)
+
+    def __len__(self):
+        return len(self.facts)
+
+
+class InternedLattice(Lattice):
+    """
+    The union lattice on interned facts.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def bottom(self):
+        return self.pool.empty
+
+    def top(self):
+        return UNIVERSE
+
+    def join(self, a, b):
+        if a is UNIVERSE or b is UNIVERSE:
+            return UNIVERSE
+        return self.pool.union(a, b)
+
+    def leq(self, a, b):
+        return b is UNIVERSE or (a is not UNIVERSE and a <= b)
+
+
+class IdentityEq:
+    """
+    Equations whose facts are interned: a fact changes if, and only if, the
+    new fact is another object.
+    """
+
+    def eval(self, env) -> bool:
+        name = self.name()
+        old_fact = env[name]
+        env[name] = self.eval_aux(env)
+        return env[name] is not old_fact
+
+    def eval_slots(self, facts) -> bool:
+        old_fact = facts[self.slot]
+        new_fact = facts[self.slot] = self.eval_facts(facts)
+        return new_fact is not old_fact
+
+
+class InternedTransferEq(IdentityEq, TransferEq):
+    pass
+
+
+class InternedJoinEq(IdentityEq, JoinEq):
+    pass
+
+
+class Interned(GenKillAnalysis):
+    """
+    A gen/kill analysis solved on interned facts. The sets gen and kill of
+    each instruction are interned once, so that the transfer function is a
+    memoized difference followed by a memoized union.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import ReachingDefinitions
+        >>> from solver import solve
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> rd = Interned(ReachingDefinitions())
+        >>> table, num_evals = solve(rd, insts)
+        >>> table == solve(ReachingDefinitions(), insts)[0]
+        True
+        >>> table['OUT_2'] is table['IN_2'] is table['IN_4']
+        True
+        >>> report = memory_report(table.facts)
+        >>> report['facts'], report['distinct']
+        (10, 5)
+    """
+
+    def __init__(self, analysis, pool=None):
+        self.analysis = analysis
+        self.pool = pool or FactPool()
+        self.lattice = InternedLattice(self.pool)
+        self.direction = analysis.direction
+        self.gens = {}
+        self.kills = {}
+
+    def gen(self, inst):
+        return self.analysis.gen(inst)
+
+    def kill(self, inst):
+        return self.analysis.kill(inst)
+
+    def key(self, element):
+        return self.analysis.key(element)
+
+    def boundary(self, inst):
+        return self.pool.intern(self.analysis.boundary(inst))
+
+    def equations(self, insts):
+        for inst in insts:
+            self.gens[inst.ID] = self.pool.intern(self.gen(inst))
+            self.kills[inst.ID] = self.pool.intern(self.kill(inst))
+        entry = insts[0] if insts else None
+        transfers = [InternedTransferEq(self, inst) for inst in insts]
+        joins = [InternedJoinEq(self, inst, entry) for inst in insts]
+        return transfers + joins
+
+    def transfer(self, inst, fact):
+        pool = self.pool
+        kept = pool.difference(fact, self.kills[inst.ID], self.analysis.key)
+        return pool.union(kept, self.gens[inst.ID])
+
+
+def memory_report(facts):
+    """
+    Compares the memory of the containers of `facts` (not of their elements)
+    when each program point has its own copy of its fact, and when equal
+    facts are shared. Returns a dictionary with the number of facts, the
+    number of distinct objects, and both sizes, in bytes.
+
+    Example:
+        >>> a = frozenset({1, 2})
+        >>> report = memory_report([a, a, frozenset({1})])
+        >>> report['facts'], report['distinct'], report['shared'] < report['copies']
+        (3, 2, True)
+    """
+    distinct = {id(fact): fact for fact in facts}
+    return {
+        "facts": len(facts),
+        "distinct": len(distinct),
+        "copies": sum(sys.getsizeof(fact) for fact in facts),
+        "shared": sum(sys.getsizeof(fact) for fact in distinct.values()),
+    }
@@ -0,0 +1,343 @@
+"""
+This file hoists very busy expressions. An expression is very busy at a
+point (see `analyses.VeryBusyExpressions`, solved here on bitsets) if every
+path that leaves that point computes it before redefining its operands. The
+file contains two hoistings of a computation x = e:
+
+1. Out of loops. If e is very busy at the entry of a loop header, the
+   operands of e are not defined in the loop, and the computations of e
+   into x are the only definitions of x in the loop, then x = e is computed
+   once, on the edges that enter the loop, and removed from the loop. Each
+   iteration then executes one instruction less.
+2. Above branches. If e is very busy after a branch, then x = e is moved to
+   the point before the branch, which dominates its successors, and every
+   computation of e into x that is reached only by paths on which x already
+   holds e is removed. This hoisting is kept if it removes at least two
+   computations: each path still computes e once, so it shrinks the code,
+   but does not reduce the number of instructions executed.
+
+In both cases, the old value of x must be dead where the computation is
+inserted (see `bitset.BitsetLiveness`), and overwritten on every path to the
+end of the program, where the values of all the variables are the result.
+`cse.run` counts the instructions executed before and after.
+"""
+
+import solver
+
+from analyses import expression
+from bitset import BitsetLiveness, BitsetVeryBusyExpressions
+from graphs import natural_loops
+from incremental import insert_before, remove
+from lang import Bt
+from solver import successors
+
+
+def holds(inst, expr, x, entry):
+    """
+    True if the variable x holds the value of `expr` before `inst`: walking
+    backwards from `inst`, every path meets a computation of `expr` into x
+    before meeting a definition of x or of the operands of `expr`, or the
+    entry of the program, `entry`, where no path has computed `expr` yet.
+
+    Example:
+        >>> from lang import Inst, Add, Mul, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Bt('c')
+        >>> i1 = Add('x', 'a', 'b')
+        >>> i2 = Mul('y', 'x', 'x')
+        >>> i3 = Add('x', 'b', 'a')
+        >>> i0.add_true_next(i1)
+        >>> i0.add_next(i2)
+        >>> i1.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> holds(i3, ('+', 'a', 'b'), 'x', i0)
+        False
+        >>> i4 = Add('x', 'a', 'b')
+        >>> i4.add_next(i0)
+        >>> holds(i3, ('+', 'a', 'b'), 'x', i4)
+        True
+
+        If the entry heads a loop, the program might start there:
+        >>> i5 = Add('b', 'b', 'b')
+        >>> i3.add_next(i5)
+        >>> i5.add_next(i0)
+        >>> holds(i0, ('+', 'a', 'b'), 'x', i0), holds(i2, ('+', 'a', 'b'), 'x', i0)
+        (False, False)
+    """
+    if inst is entry:
+        return False
+    operands = set(expr[1:])
+    visited = set()
+    worklist = list(inst.preds)
+    while worklist:
+        pred = worklist.pop()
+        if pred in visited:
+            continue
+        visited.add(pred)
+        defs = pred.definition()
+        if expression(pred) == expr and defs == {x}:
+            continue
+        if x in defs or defs & operands or pred is entry or not pred.preds:
+            return False
+        worklist.extend(pred.preds)
+    return True
+
+
+def overwritten(inst, x):
+    """
+    True if every path from the entry of `inst` to the end of the program
+    defines x.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Bt('c')
+        >>> i1 = Add('x', 'a', 'b')
+        >>> i2 = Add('y', 'a', 'b')
+        >>> i0.add_true_next(i1)
+        >>> i0.add_next(i2)
+        >>> i2.add_next(i1)
+        >>> overwritten(i0, 'x'), overwritten(i0, 'y')
+        (True, False)
+    """
+    visited = set()
+    worklist = [inst]
+    while worklist:
+        inst = worklist.pop()
+        if inst in visited:
+            continue
+        visited.add(inst)
+        if x in inst.definition():
+            continue
+        if None in inst.nexts or not inst.nexts:
+            return False
+        worklist.extend(inst.nexts)
+    return True
+
+
+def loops(insts):
+    """
+    The loops of the program that can only be entered through their header,
+    as a dictionary that maps each header to the instructions of the loop.
+    The program starts at its first instruction; hence, a loop that contains
+    it must have it as its header.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Bt('c')
+        >>> i1 = Add('x', 'a', 'b')
+        >>> i2 = Bt('p')
+        >>> i0.add_true_next(i2)
+        >>> i0.add_next(i1)
+        >>> i1.add_next(i2)
+        >>> i2.add_true_next(i0)
+        >>> sorted((h.ID, sorted(i.ID for i in b)) for h, b in loops([i0, i1, i2]).items())
+        [(0, [0, 1, 2])]
+        >>> i2.nexts[0] = i1
+        >>> i0.preds.remove(i2)
+        >>> i1.preds.append(i2)
+        >>> loops([i0, i1, i2])
+        {}
+    """
+    entry = insts[0]
+    found = natural_loops(insts, successors, lambda inst: inst.preds)
+    return {
+        header: body
+        for header, body in found.items()
+        if all(
+            inst is header
+            or (inst is not entry and all(pred in body for pred in inst.preds))
+            for inst in body
+        )
+    }
+
+
+def hoist_out_of_loop(insts, header, body, expr, x):
+    """
+    Moves the computations of `expr` into `x` in the loop formed by `header`
+    and `body` to the edges that enter the loop. The hoisted computation is
+    inserted before `header` in the list `insts`; if `header` is the first
+    instruction, then the hoisted computation becomes the first one. Returns
+    the list of removed instructions.
+
+    Example:
+        >>> from lang import Inst
+        >>> from cse import run
+        >>> from parallel_parser import load_program
+        >>> lines = ['{"a": 1, "b": 0, "i": 0, "n": 3}',
+        ...          'x = add a b',
+        ...          'i = add i x',
+        ...          'p = lth i n',
+        ...          'bt p 0',
+        ...          'z = add i x']
+        >>> Inst.next_index = 0
+        >>> env, insts = load_program(lines)
+        >>> before = run(insts[0], env)
+        >>> Inst.next_index = 0
+        >>> env, insts = load_program(lines)
+        >>> header, body = next(iter(loops(insts).items()))
+        >>> [inst.ID for inst in hoist_out_of_loop(insts, header, body, ('+', 'a', 'b'), 'x')]
+        [0]
+        >>> insts[0].nexts[0].ID, insts[3].nexts[0].ID
+        (1, 1)
+        >>> after = run(insts[0], env)
+        >>> before[0].get('z') == after[0].get('z'), before[1], after[1]
+        (True, 13, 11)
+    """
+    sites = [
+        inst for inst in body
+        if expression(inst) == expr and inst.definition() == {x}
+    ]
+    hoisted = type(sites[0])(x, sites[0].src0, sites[0].src1)
+    for pred in [pred for pred in header.preds if pred not in body]:
+        pred.nexts = [hoisted if n is header else n for n in pred.nexts]
+        hoisted.preds.append(pred)
+    header.preds = [pred for pred in header.preds if pred in body]
+    hoisted.add_next(header)
+    insts.insert(insts.index(header), hoisted)
+    for site in sites:
+        remove(site)
+        insts.remove(site)
+    return sites
+
+
+def loop_pass(insts, busy, vbe, alive, live):
+    """
+    Tries to hoist the loop-invariant very busy expressions of each loop,
+    until one hoisting succeeds. Returns the number of instructions removed.
+    """
+    for header, body in loops(insts).items():
+        if header is not insts[0] and all(pred in body for pred in header.preds):
+            continue
+        bits = busy[solver.name_in(header.ID)]
+        if bits in (0, -1):
+            continue
+        defined = {}
+        for inst in body:
+            for v in inst.definition():
+                defined.setdefault(v, []).append(inst)
+        alive_in = alive[solver.name_in(header.ID)]
+        for expr in sorted(vbe.encoding.decode(bits)):
+            if any(v in defined for v in expr[1:]):
+                continue
+            targets = {
+                x for inst in body if expression(inst) == expr
+                for x in inst.definition()
+            }
+            for x in sorted(targets):
+                if alive_in >> live.encoding.bit(x) & 1:
+                    continue
+                if any(expression(inst) != expr for inst in defined[x]):
+                    continue
+                if not overwritten(header, x):
+                    continue
+                return len(hoist_out_of_loop(insts, header, body, expr, x))
+    return 0
+
+
+def hoist(insts, branch, expr, x):
+    """
+    Inserts a computation of `expr` into `x` before `branch`, and removes
+    the computations of `expr` into `x` that become redundant. If fewer than
+    two are removed, then the program is left unchanged. Returns the list of
+    removed instructions.
+    """
+    sites = [
+        inst for inst in insts
+        if expression(inst) == expr and inst.definition() == {x}
+    ]
+    if len(sites) < 2:
+        return []
+    hoisted = type(sites[0])(x, sites[0].src0, sites[0].src1)
+    insert_before(branch, hoisted)
+    entry = hoisted if branch is insts[0] else insts[0]
+    redundant = [site for site in sites if holds(site, expr, x, entry)]
+    if len(redundant) < 2:
+        remove(hoisted)
+        return []
+    insts.insert(insts.index(branch), hoisted)
+    for site in redundant:
+        remove(site)
+        insts.remove(site)
+    return redundant
+
+
+def hoist_pass(insts):
+    """
+    Tries to hoist very busy expressions out of each loop, and then above
+    each branch, until one hoisting succeeds. Returns the number of
+    instructions removed.
+    """
+    vbe = BitsetVeryBusyExpressions()
+    busy, _ = solver.solve(vbe, insts)
+    live = BitsetLiveness()
+    alive, _ = solver.solve(live, insts)
+    removed = loop_pass(insts, busy, vbe, alive, live)
+    if removed:
+        return removed
+    targets = {}
+    for inst in insts:
+        e = expression(inst)
+        if e is not None:
+            targets.setdefault(e, set()).update(inst.definition())
+    for inst in list(insts):
+        if not isinstance(inst, Bt):
+            continue
+        bits = busy[solver.name_out(inst.ID)]
+        if bits in (0, -1):
+            continue
+        alive_in = alive[solver.name_in(inst.ID)]
+        for expr in sorted(vbe.encoding.decode(bits)):
+            for x in sorted(targets[expr]):
+                if alive_in >> live.encoding.bit(x) & 1:
+                    continue
+                if not overwritten(inst, x):
+                    continue
+                removed = hoist(insts, inst, expr, x)
+                if removed:
+                    return len(removed)
+    return 0
+
+
+def hoist_very_busy_expressions(insts):
+    """
+    Hoists very busy expressions until no more can be hoisted. Returns the
+    list of instructions that remain, the number of computations inserted
+    before branches, and the number of computations removed.
+
+    Example:
+        >>> from lang import Inst
+        >>> from cse import run
+        >>> from parallel_parser import load_program
+        >>> lines = ['{"a": 1, "b": 2, "c": 1, "one": 1}',
+        ...          'bt c 4',
+        ...          'x = add a b',
+        ...          'y = mul x x',
+        ...          'bt one 6',
+        ...          'x = add b a',
+        ...          'y = add x x',
+        ...          'z = add y one']
+        >>> Inst.next_index = 0
+        >>> env, insts = load_program(lines)
+        >>> before = run(insts[0], env)
+        >>> Inst.next_index = 0
+        >>> env, insts = load_program(lines)
+        >>> insts, num_hoisted, num_removed = hoist_very_busy_expressions(insts)
+        >>> len(insts), num_hoisted, num_removed
+        (6, 1, 2)
+        >>> str(insts[0]).splitlines()[0], insts[0].nexts[0].ID
+        ('7: x = a+b', 0)
+        >>> after = run(insts[0], env)
+        >>> after[0].get('z') == before[0].get('z'), before[1], after[1]
+        (True, 4, 4)
+    """
+    insts = list(insts)
+    num_hoisted = 0
+    num_removed = 0
+    removed = hoist_pass(insts)
+    while removed:
+        num_hoisted += 1
+        num_removed += removed
+        removed = hoist_pass(insts)
+    return (insts, num_hoisted, num_removed)
@@ -0,0 +1,253 @@
+"""
+This file implements an incremental data-flow solver. Once an optimization
+inserts, removes or rewires a few instructions, the solver rebuilds only the
+equations of these instructions, and re-solves only the facts that depend on
+them. Facts that might shrink (e.g., reaching definitions, once a definition
+is removed) are first reset to the bottom of the lattice, and then solved
+again: this is the "reset and re-solve" approach. The other facts do not
+depend on the edited instructions; hence, they are already solved.
+
+The file also contains two edits, `insert_after` and `remove`, which return
+the instructions that they change, in the format that `update` expects.
+"""
+
+from collections import deque
+
+from lang import Bt
+from solver import FactTable, TransferEq, JoinEq, IN, OUT
+
+
+def insert_after(inst, new_inst):
+    """
+    Inserts `new_inst` between `inst`, which must not be a branch, and its
+    successor. Returns the instructions whose edges have changed.
+
+    Example:
+        >>> from lang import Inst, Add
+        >>> Inst.next_index = 0
+        >>> i0 = Add('a', 'a', 'b')
+        >>> i1 = Add('b', 'a', 'b')
+        >>> i0.add_next(i1)
+        >>> i2 = Add('c', 'a', 'a')
+        >>> sorted(i.ID for i in insert_after(i0, i2))
+        [0, 1, 2]
+        >>> [n.ID for n in i0.nexts], [p.ID for p in i1.preds]
+        ([2], [2])
+    """
+    assert not isinstance(inst, Bt), "Cannot insert after a branch."
+    changed = {inst, new_inst}
+    for succ in inst.nexts:
+        succ.preds = [new_inst if p is inst else p for p in succ.preds]
+        new_inst.nexts.append(succ)
+        changed.add(succ)
+    inst.nexts = []
+    inst.add_next(new_inst)
+    return changed
+
+
+def insert_before(inst, new_inst):
+    """
+    Inserts `new_inst`, which must not be a branch, between `inst` and its
+    predecessors. Returns the instructions whose edges have changed.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Add('a', 'a', 'b')
+        >>> i1 = Bt('a', i0)
+        >>> i0.add_next(i1)
+        >>> i2 = Add('c', 'a', 'a')
+        >>> sorted(i.ID for i in insert_before(i0, i2))
+        [0, 1, 2]
+        >>> i1.nexts[0].ID, [p.ID for p in i2.preds], [p.ID for p in i0.preds]
+        (2, [1], [2])
+    """
+    assert not isinstance(new_inst, Bt), "Cannot insert a branch."
+    changed = {inst, new_inst} | set(inst.preds)
+    for pred in inst.preds:
+        pred.nexts = [new_inst if n is inst else n for n in pred.nexts]
+    new_inst.preds = inst.preds
+    inst.preds = []
+    new_inst.add_next(inst)
+    return changed
+
+
+def remove(inst):
+    """
+    Removes `inst`, which must not be a branch, connecting its predecessors
+    to its successor. Returns the instructions whose edges have changed.
+
+    Example:
+        >>> from lang import Inst, Add
+        >>> Inst.next_index = 0
+        >>> i0 = Add('a', 'a', 'b')
+        >>> i1 = Add('b', 'a', 'b')
+        >>> i2 = Add('c', 'a', 'a')
+        >>> i0.add_next(i1)
+        >>> i1.add_next(i2)
+        >>> sorted(i.ID for i in remove(i1))
+        [0, 2]
+        >>> [n.ID for n in i0.nexts], [p.ID for p in i2.preds]
+        ([2], [0])
+    """
+    assert not isinstance(inst, Bt), "Cannot remove a branch."
+    succ = inst.get_next()
+    changed = set(inst.preds)
+    for pred in inst.preds:
+        nexts = [succ if n is inst else n for n in pred.nexts]
+        pred.nexts = nexts if isinstance(pred, Bt) else [n for n in nexts if n]
+    if succ is not None:
+        position = succ.preds.index(inst)
+        succ.preds[position : position + 1] = inst.preds
+        changed.add(succ)
+    inst.preds = []
+    inst.nexts = []
+    return changed
+
+
+class IncrementalSolver:
+    """
+    Solves an analysis once, and then updates the solution after each edit of
+    the program. The analysis must use the default equations of the engine
+    (TransferEq and JoinEq), like the analyses in analyses.py.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import ReachingDefinitions
+        >>> from solver import solve
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> rd = IncrementalSolver(ReachingDefinitions(), insts)
+        >>> sorted(rd.table['IN_4'])
+        [('c', 0), ('c', 3), ('repeat', 1)]
+
+        Inserting a definition of 'c' in the loop:
+        >>> c2 = Add('c', 'c', 'c')
+        >>> insts.insert(4, c2)
+        >>> num_evals = rd.update(insts, insert_after(c1, c2))
+        >>> sorted(rd.table['IN_4'])
+        [('c', 0), ('c', 5), ('repeat', 1)]
+        >>> rd.table == solve(ReachingDefinitions(), insts)[0]
+        True
+
+        Removing it again:
+        >>> insts.remove(c2)
+        >>> num_evals = rd.update(insts, remove(c2))
+        >>> rd.table == solve(ReachingDefinitions(), insts)[0]
+        True
+    """
+
+    def __init__(self, analysis, insts):
+        self.analysis = analysis
+        self.bottom = analysis.lattice.bottom()
+        self.table = FactTable(insts, self.bottom)
+        self.entry = insts[0] if insts else None
+        self.equations = {}
+        self.readers = {}
+        for inst in insts:
+            self.add_equations(inst)
+        equations = [eq for eqs in self.equations.values() for eq in eqs]
+        self.num_evals = self.resolve(equations)
+
+    def add_equations(self, inst):
+        equations = [
+            TransferEq(self.analysis, inst),
+            JoinEq(self.analysis, inst, self.entry),
+        ]
+        for eq in equations:
+            eq.bind(self.table)
+            for slot in eq.dep_slots:
+                self.readers.setdefault(slot, []).append(eq)
+        self.equations[inst.ID] = equations
+
+    def remove_equations(self, ID):
+        for eq in self.equations.pop(ID):
+            for slot in eq.dep_slots:
+                self.readers[slot].remove(eq)
+
+    def affected(self, seeds):
+        """
+        The equations in `seeds`, plus every equation that depends on them,
+        directly or transitively.
+        """
+        affected = list(seeds)
+        visited = set(map(id, affected))
+        i = 0
+        while i < len(affected):
+            for eq in self.readers.get(affected[i].slot, []):
+                if id(eq) not in visited:
+                    visited.add(id(eq))
+                    affected.append(eq)
+            i += 1
+        return affected
+
+    def resolve(self, equations):
+        """
+        Solves `equations` with a worklist. Every equation that depends on an
+        equation in the list must be in the list too.
+        """
+        facts = self.table.facts
+        worklist = deque(equations)
+        pending = set(map(id, equations))
+        num_evals = 0
+        while worklist:
+            eq = worklist.popleft()
+            pending.discard(id(eq))
+            num_evals += 1
+            if eq.eval_slots(facts):
+                for dep in self.readers.get(eq.slot, []):
+                    if id(dep) not in pending:
+                        pending.add(id(dep))
+                        worklist.append(dep)
+        return num_evals
+
+    def update(self, insts, changed):
+        """
+        Updates the solution after an edit. `insts` is the program after the
+        edit, and `changed` contains the instructions whose edges changed.
+        Instructions in `insts` that the solver has never seen are new, and
+        instructions that it has seen, but that are not in `insts`, were
+        removed. Returns the number of evaluations of the update.
+        """
+        live = {inst.ID for inst in insts}
+        entry = insts[0] if insts else None
+        if entry is not self.entry:
+            # The boundary moves from the old entry to the new one:
+            changed = set(changed) | {e for e in (self.entry, entry) if e is not None}
+            self.entry = entry
+        removed = [ID for ID in self.equations if ID not in live]
+        added = [inst for inst in insts if inst.ID not in self.equations]
+        new = {inst.ID for inst in added}
+        rebuilt = sorted(
+            (inst for inst in changed if inst.ID in live and inst.ID not in new),
+            key=lambda inst: inst.ID,
+        )
+        for ID in removed:
+            self.remove_equations(ID)
+        for inst in rebuilt:
+            self.remove_equations(inst.ID)
+        for ID in removed:
+            self.readers.pop(self.table.index(ID, IN), None)
+            self.readers.pop(self.table.index(ID, OUT), None)
+            self.table.remove(ID)
+        for inst in added:
+            self.table.add(inst.ID, self.bottom)
+        for inst in rebuilt + added:
+            self.add_equations(inst)
+        seeds = [eq for inst in rebuilt + added for eq in self.equations[inst.ID]]
+        affected = self.affected(seeds)
+        for eq in affected:
+            self.table.facts[eq.slot] = self.bottom
+        num_evals = self.resolve(affected)
+        self.num_evals += num_evals
+        return num_evals
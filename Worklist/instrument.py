@@ -0,0 +1,251 @@
+"""
+This file collects statistics about how solvers converge: how many times each
+equation is evaluated, and how many of these evaluations change its fact; the
+length of the worklist at each iteration (or, for chaotic iterations, the
+number of changes in each sweep over the equations); the sizes of the facts in
+the solution; the time spent in each phase of the analysis; and, optionally,
+the peak memory of each phase.
+
+Solvers receive an `Instrumentation` object through their parameter `stats`.
+When `stats` is None, which is the default, solvers collect nothing. Once the
+analysis is solved, `to_json` exports the statistics, so that the equations
+that dominate the time of the fixed point can be found.
+
+The solvers of the labs, such as `abstract_interp` in dataflow.py, do not take
+a `stats` argument. Their equations can be wrapped with `watch`, which counts
+evaluations and changes, but not the length of a worklist that the solver
+keeps to itself. The alias analysis of AliasAnalysis propagates facts along
+the edges of a graph, not along equations; hence, it is not covered.
+"""
+
+import json
+import time
+import tracemalloc
+
+from collections import Counter
+from contextlib import contextmanager
+
+
+def size_of(fact):
+    """
+    The number of elements in a fact, or None if the fact is not a set. Facts
+    encoded as bitsets (see bitset.py) have as many elements as bits set.
+
+    Example:
+        >>> size_of({'a', 'b'}), size_of(0b1011), size_of('NAC')
+        (2, 3, None)
+    """
+    if isinstance(fact, (set, frozenset)):
+        return len(fact)
+    if isinstance(fact, int) and not isinstance(fact, bool) and fact >= 0:
+        return bin(fact).count("1")
+    return None
+
+
+def bucket(size):
+    """
+    Fact sizes are grouped in buckets whose bounds are powers of two: the
+    bucket n contains the sizes in [n, 2n).
+
+    Example:
+        >>> [bucket(size) for size in [0, 1, 2, 3, 4, 7, 8]]
+        [0, 1, 2, 2, 4, 4, 8]
+    """
+    return 0 if size == 0 else 1 << (size.bit_length() - 1)
+
+
+def sample(values, max_points):
+    """
+    At most `max_points` values of the list, evenly spaced.
+
+    Example:
+        >>> sample(list(range(10)), 4)
+        [0, 3, 6, 9]
+    """
+    if len(values) <= max_points:
+        return list(values)
+    step = (len(values) - 1) / (max_points - 1)
+    return [values[round(i * step)] for i in range(max_points)]
+
+
+class Instrumentation:
+    """
+    The statistics of one run of a solver. Memory is only traced if
+    `trace_memory` is True, as tracing slows down the analysis.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> from analyses import ReachingDefinitions
+        >>> from solver import interp
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('c', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> stats = Instrumentation()
+        >>> eqs = ReachingDefinitions().equations([i0, i1])
+        >>> env, num_evals = interp(eqs, stats=stats)
+        >>> stats.num_evals() == num_evals
+        True
+        >>> stats.top(2)
+        [('OUT_1', 2, 1), ('OUT_0', 1, 1)]
+        >>> stats.to_dict()["fact_sizes"]
+        {'0': 1, '1': 3}
+        >>> sorted(stats.phases)
+        ['dependence_graph', 'solve']
+
+        The engine of solver.py also times the construction of equations:
+        >>> from analyses import Liveness
+        >>> from solver import solve
+        >>> stats = Instrumentation(trace_memory=True)
+        >>> table, num_evals = solve(Liveness(), [i0, i1], stats=stats)
+        >>> sorted(stats.phases), sorted(stats.peak_memory) == sorted(stats.phases)
+        (['bind', 'equations', 'solve'], True)
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.evals = Counter()
+        self.changes = Counter()
+        self.worklist = []
+        self.sweeps = []
+        self.fact_sizes = Counter()
+        self.phases = {}
+        self.peak_memory = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measures the time (and, possibly, the peak memory) of the code in a
+        `with` block. Phases with the same name are accumulated.
+        """
+        started = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started = True
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+                if started:
+                    tracemalloc.stop()
+
+    def record(self, name, changed, pending=None):
+        """
+        Records one evaluation of the equation that defines the fact `name`.
+        Worklist solvers also pass the number of equations still pending.
+        """
+        self.evals[name] += 1
+        if changed:
+            self.changes[name] += 1
+        if pending is not None:
+            self.worklist.append(pending)
+
+    def sweep(self, num_changes):
+        """
+        Records one sweep of a chaotic solver over all the equations.
+        """
+        self.sweeps.append(num_changes)
+
+    def record_facts(self, facts):
+        for fact in facts:
+            size = size_of(fact)
+            if size is not None:
+                self.fact_sizes[bucket(size)] += 1
+
+    def num_evals(self):
+        return sum(self.evals.values())
+
+    def top(self, k=10):
+        """
+        The `k` equations evaluated most often, as triples (name, number of
+        evaluations, number of changes).
+        """
+        return [
+            (name, evals, self.changes[name])
+            for name, evals in self.evals.most_common(k)
+        ]
+
+    def to_dict(self, max_points=1000):
+        """
+        The statistics as a dictionary of JSON values. The lengths of the
+        worklist are sampled down to `max_points` values.
+        """
+        worklist = self.worklist
+        return {
+            "num_evals": self.num_evals(),
+            "num_changes": sum(self.changes.values()),
+            "equations": {
+                name: {"evals": evals, "changes": self.changes[name]}
+                for name, evals in self.evals.items()
+            },
+            "hottest": [list(entry) for entry in self.top()],
+            "worklist": {
+                "iterations": len(worklist),
+                "max": max(worklist, default=0),
+                "mean": sum(worklist) / len(worklist) if worklist else 0,
+                "samples": sample(worklist, max_points),
+            },
+            "sweeps": self.sweeps,
+            "fact_sizes": {
+                str(size): count for size, count in sorted(self.fact_sizes.items())
+            },
+            "phases": self.phases,
+            "peak_memory": self.peak_memory,
+        }
+
+    def to_json(self, max_points=1000, **kwargs):
+        return json.dumps(self.to_dict(max_points), **kwargs)
+
+
+class WatchedEq:
+    """
+    An equation that records each of its evaluations in `stats`, and that
+    behaves as the equation `eq` otherwise.
+    """
+
+    def __init__(self, eq, stats):
+        self.eq = eq
+        self.stats = stats
+
+    def __getattr__(self, attr):
+        return getattr(self.eq, attr)
+
+    def __str__(self):
+        return str(self.eq)
+
+    def eval(self, env):
+        changed = self.eq.eval(env)
+        self.stats.record(self.eq.name(), changed)
+        return changed
+
+
+def watch(equations, stats):
+    """
+    Wraps the equations, so that any solver that calls their method `eval`
+    records its evaluations in `stats`.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> from dataflow import reaching_defs_constraint_gen
+        >>> from solver import chaotic_solve
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('c', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> stats = Instrumentation()
+        >>> eqs = watch(reaching_defs_constraint_gen([i0, i1]), stats)
+        >>> env = {eq.name(): set() for eq in eqs}
+        >>> chaotic_solve(eqs, env) == stats.num_evals()
+        True
+        >>> stats.top(1), str(eqs[0])
+        ([('OUT_0', 2, 1)], 'OUT_0: (c, 0) + (IN_0 - (c, _))')
+    """
+    return [WatchedEq(eq, stats) for eq in equations]
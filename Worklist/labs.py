@@ -0,0 +1,145 @@
+"""
+This file runs the driver of any lab on the programs of a bundle (see
+bundle.py), in a single process. A lab is a folder with a file driver.py that
+reads a program from the standard input. `LabRunner` runs that driver once
+per program, with the text of the program as its standard input, and
+captures what it prints. The modules of the lab (e.g., its parser and its
+data-flow equations) are imported only once, and are kept apart from the
+modules of this folder, which have the same names. Usage:
+
+    python3 batch.py --lab=../Dominance < bundle.txt > results.jsonl
+
+The work is done by the code of the lab itself: if a lab is not solved yet,
+then the records of its programs report the errors that its code raises.
+Given a Cache (see cache.py), the runner stores what the driver prints for
+each program, keyed by the canonical hash of the program, by the name of the
+lab, and by a hash of the source files of the lab; thus, a program is not
+run again until it, or the code of the lab, changes:
+
+    python3 batch.py --lab=../Dominance --cache-results < bundle.txt
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+from cache import canonical_key, source_version
+
+
+class LabRunner:
+    """
+    Runs the driver of the lab in `directory`. Each call to `run` executes
+    the driver as a script, but the modules that it imports are loaded only
+    in the first call. If a Cache is given as `results`, then outputs are
+    taken from it, when possible.
+
+    Example:
+        >>> import os, tempfile
+        >>> lab = tempfile.mkdtemp()
+        >>> with open(os.path.join(lab, "lang.py"), "w") as f:
+        ...     _ = f.write("NAME = 'toy'\\n")
+        >>> with open(os.path.join(lab, "driver.py"), "w") as f:
+        ...     _ = f.write("import sys, lang\\nprint(lang.NAME, len(sys.stdin.readlines()))\\n")
+        >>> runner = LabRunner(lab)
+        >>> runner.run(['{}', 'x = add a b']), runner.run(['{}'])
+        ('toy 2\\n', 'toy 1\\n')
+        >>> import lang
+        >>> hasattr(lang, 'NAME')
+        False
+
+        With a cache, the driver runs only once per program:
+        >>> from cache import Cache
+        >>> runner = LabRunner(lab, results=Cache(tempfile.mkdtemp()))
+        >>> runner.run(['{}', 'x = add a b']) == runner.run(['{}', 'x  =  add a b'])
+        True
+        >>> runner.results.report()
+        'hits: 1, misses: 1, evictions: 0'
+    """
+
+    def __init__(self, directory, argv=(), results=None):
+        self.directory = os.path.abspath(directory)
+        self.driver = os.path.join(self.directory, "driver.py")
+        with open(self.driver) as file:
+            self.code = compile(file.read(), self.driver, "exec")
+        self.names = sorted(
+            name[:-3] for name in os.listdir(self.directory) if name.endswith(".py")
+        )
+        self.argv = [self.driver] + list(argv)
+        self.loaded = {}
+        self.results = results
+        if results is not None:
+            self.lab = os.path.basename(self.directory)
+            paths = [os.path.join(self.directory, f"{name}.py") for name in self.names]
+            self.analysis = f"{self.lab}.v{source_version(paths, *argv)}"
+
+    @contextlib.contextmanager
+    def modules(self):
+        """
+        Makes the modules of the lab visible to `import`, and hides the
+        modules of other folders with the same names.
+        """
+        saved = {
+            name: sys.modules.pop(name) for name in self.names if name in sys.modules
+        }
+        sys.modules.update(self.loaded)
+        sys.path.insert(0, self.directory)
+        try:
+            yield
+        finally:
+            sys.path.remove(self.directory)
+            for name in self.names:
+                if name in sys.modules:
+                    self.loaded[name] = sys.modules.pop(name)
+            sys.modules.update(saved)
+
+    def run(self, lines):
+        """
+        Runs the driver with the program in `lines` as its standard input,
+        and returns what the driver prints.
+        """
+        if self.results is None:
+            return self.execute(lines)
+        key = canonical_key(lines, self.lab)
+        output = self.results.get_result(key, self.analysis)
+        if output is None:
+            output = self.execute(lines)
+            self.results.put_result(key, self.analysis, output)
+        return output
+
+    def execute(self, lines):
+        """
+        Runs the driver, without looking up the cache of results.
+        """
+        text = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+        output = io.StringIO()
+        stdin, argv = sys.stdin, sys.argv
+        sys.stdin, sys.argv = io.StringIO(text), list(self.argv)
+        try:
+            with self.modules(), contextlib.redirect_stdout(output):
+                if "lang" in self.loaded and hasattr(self.loaded["lang"], "Inst"):
+                    self.loaded["lang"].Inst.next_index = 0
+                try:
+                    exec(self.code, {"__name__": "__main__", "__file__": self.driver})
+                except SystemExit as e:
+                    if e.code not in (None, 0):
+                        raise RuntimeError(f"The driver exited with {e.code}.")
+        finally:
+            sys.stdin, sys.argv = stdin, argv
+        return output.getvalue()
+
+
+def run_lab(programs, runner):
+    """
+    Runs the driver of a lab on each program in the list of pairs (name,
+    lines), and yields one record per program, with the output of the
+    driver. Errors are reported in the record of the program that caused
+    them, and do not stop the batch.
+    """
+    for name, lines in programs:
+        record = {"name": name}
+        try:
+            record["output"] = runner.run(lines)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        yield record
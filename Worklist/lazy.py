@@ -0,0 +1,315 @@
+"""
+This file implements programs whose instructions are created on demand. A
+lazy program knows, for each instruction index, the successors and the
+predecessors of that instruction, but it only creates the `Inst` object when
+somebody asks for it. Every time a new instruction is created, it is linked
+with the neighbours that already exist; thus, once all the instructions have
+been materialized, the control-flow graph is the same as the one produced by
+the eager parser.
+"""
+
+import json
+import mmap
+import re
+
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from lang import Env, Inst
+from parallel_parser import parse_chunk, record2inst
+
+NO_TARGET = -1
+
+BRANCH = re.compile(rb"^[ \t]*bt[ \t]+\S+[ \t]+(-?\d+)", re.MULTILINE)
+
+
+class LazyProgram(ABC):
+    """
+    A sequence of instructions that are decoded the first time that they are
+    accessed. Concrete subclasses determine how instructions are decoded, and
+    where branches jump to.
+
+    Instructions receive the IDs that they would receive in the eager parser:
+    when the program is created, it reserves a range of IDs, and the i-th
+    instruction gets the i-th ID of that range. Every materialized instruction
+    also has an attribute `index`, with its position in the program.
+    """
+
+    def __init__(self, size):
+        self._insts = [None] * size
+        self.num_materialized = 0
+        self.base_id = Inst.next_index
+        Inst.next_index += size
+
+    def __len__(self):
+        return len(self._insts)
+
+    @abstractmethod
+    def decode(self, index) -> Inst:
+        """
+        Creates the instruction at position `index`, without linking it to
+        other instructions.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def target(self, index) -> int:
+        """
+        The index of the instruction to where the branch at `index` jumps, or
+        NO_TARGET if the instruction at `index` is not a branch.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def branch_sources(self, index) -> list:
+        """
+        The sorted list of indices of the branches that jump to `index`.
+        """
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        inst = self._insts[index]
+        if inst is None:
+            inst = self._materialize(index)
+        return inst
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def is_materialized(self, index):
+        return self._insts[index] is not None
+
+    def successors(self, index):
+        """
+        The edges that leave the instruction at `index`, as pairs formed by
+        the index of the successor, and a flag telling if the edge is the
+        target of a branch. The target of a branch comes first.
+        """
+        succs = []
+        target = self.target(index)
+        if target != NO_TARGET:
+            succs.append((target, True))
+        if index + 1 < len(self):
+            succs.append((index + 1, False))
+        return succs
+
+    def predecessors(self, index):
+        """
+        The edges that reach the instruction at `index`, as pairs formed by
+        the index of the predecessor, and a flag telling if the edge is the
+        target of a branch. The fall-through edge comes first.
+        """
+        preds = [(index - 1, False)] if index > 0 else []
+        return preds + [(src, True) for src in self.branch_sources(index)]
+
+    def _link(self, src, dst, is_target):
+        """
+        Creates the edge src -> dst, where both instructions already exist.
+        The list of predecessors of dst is kept in the same order that the
+        eager parser would produce.
+        """
+        src_inst, dst_inst = self._insts[src], self._insts[dst]
+        if is_target:
+            src_inst.add_true_next(dst_inst)
+        else:
+            src_inst.add_next(dst_inst)
+        if len(dst_inst.preds) > 1:
+            dst_inst.preds.sort(key=lambda p: (p.index != dst - 1, p.index))
+
+    def _materialize(self, index):
+        inst = self.decode(index)
+        inst.ID = self.base_id + index
+        inst.index = index
+        self._insts[index] = inst
+        self.num_materialized += 1
+        for succ, is_target in self.successors(index):
+            if self._insts[succ] is not None:
+                self._link(index, succ, is_target)
+        for pred, is_target in self.predecessors(index):
+            if pred != index and self._insts[pred] is not None:
+                self._link(pred, index, is_target)
+        return inst
+
+    def insts(self):
+        """
+        Materializes every instruction, and returns them as a list.
+        """
+        return list(self)
+
+    def interp(self, env):
+        """
+        Evaluates the program, creating instructions only when control
+        reaches them. Contrary to `lang.interp`, this function is iterative,
+        and hence can run programs of any length.
+        """
+        index = 0 if len(self) > 0 else None
+        while index is not None:
+            inst = self[index]
+            inst.eval(env)
+            index = self.next_index(index, inst)
+        return env
+
+    def next_index(self, index, inst):
+        """
+        The index of the instruction that runs after `inst`, which is at
+        position `index` and has just been evaluated; or None at the end of
+        the program.
+        """
+        target = self.target(index)
+        if target != NO_TARGET and inst.next_iter == 0:
+            return target
+        return index + 1 if index + 1 < len(self) else None
+
+
+def scan_branches(lines):
+    """
+    Returns a dictionary that maps the index of each branch in `lines` to the
+    index of its target. Only lines that start with "bt" are tokenized.
+
+    Example:
+        >>> scan_branches(['x = add a b', 'bt x 0', ' bt y 3', 'btotal = add a b'])
+        {1: 0, 2: 3}
+    """
+    targets = {}
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith("bt"):
+            tokens = line.split()
+            if tokens[0] == "bt":
+                targets[index] = int(tokens[2])
+    return targets
+
+
+class MappedLines:
+    """
+    The lines of a file mapped into memory. Creating this sequence only
+    records the offset where each line starts, skipping blank lines; lines
+    are decoded when they are accessed. Slicing the sequence does not copy
+    the file.
+
+    Example:
+        >>> lines = MappedLines(b'{"a": 1}\\nbt a 0\\n\\nx = add a a\\n \\n\\n')
+        >>> len(lines), lines[2]
+        (3, 'x = add a a')
+        >>> lines[1:].scan_branches()
+        {0: 0}
+    """
+
+    def __init__(self, buffer, starts=None):
+        self._buffer = buffer
+        if starts is None:
+            starts = array("q")
+            pos = 0
+            while pos < len(buffer):
+                end = buffer.find(b"\n", pos)
+                if end == -1:
+                    end = len(buffer)
+                if buffer[pos:end].strip():
+                    starts.append(pos)
+                pos = end + 1
+        self._starts = starts
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _end(self, index):
+        end = self._buffer.find(b"\n", self._starts[index])
+        return len(self._buffer) if end == -1 else end
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MappedLines(self._buffer, self._starts[index])
+        if index < 0:
+            index += len(self)
+        line = self._buffer[self._starts[index] : self._end(index)]
+        return bytes(line).decode("utf-8").rstrip("\r\n")
+
+    def scan_branches(self):
+        """
+        Same as `scan_branches(self)`, but searching for branches directly in
+        the bytes of the file.
+        """
+        targets = {}
+        if len(self) == 0:
+            return targets
+        start, end = self._starts[0], self._end(len(self) - 1)
+        for match in BRANCH.finditer(self._buffer, start, end):
+            index = bisect_right(self._starts, match.start()) - 1
+            targets[index] = int(match.group(1))
+        return targets
+
+
+class LazyTextProgram(LazyProgram):
+    """
+    A program read from text, whose instructions are parsed only when they
+    are needed. Creating the program only records where branches jump to.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> lines = ['bt a 2', 'x = add a b', 'x = add x z']
+        >>> prog = LazyTextProgram(lines)
+        >>> prog.interp(Env({"a": 1, "b": 3, "x": 42, "z": 0})).get("x")
+        42
+        >>> prog.num_materialized, prog.is_materialized(1)
+        (2, False)
+        >>> print(prog[1])
+        1: x = a+b
+          P: 0
+          N: 2
+    """
+
+    def __init__(self, lines):
+        self._lines = lines
+        if isinstance(lines, MappedLines):
+            self._targets = lines.scan_branches()
+        else:
+            self._targets = scan_branches(lines)
+        self._edges = sorted((t, s) for s, t in self._targets.items())
+        self._edge_targets = [t for t, _ in self._edges]
+        for target in self._edge_targets:
+            if not 0 <= target < len(lines):
+                raise ValueError(f"Invalid branch target: {target}")
+        super().__init__(len(lines))
+
+    def decode(self, index):
+        return record2inst(parse_chunk([self._lines[index]]), 0)
+
+    def target(self, index):
+        return self._targets.get(index, NO_TARGET)
+
+    def branch_sources(self, index):
+        lo = bisect_left(self._edge_targets, index)
+        hi = bisect_right(self._edge_targets, index, lo)
+        return [source for _, source in self._edges[lo:hi]]
+
+
+def file2cfg_and_env(lines):
+    """
+    Reads a program lazily: the environment is built eagerly, but the
+    instructions are parsed only when they are accessed, or when control
+    reaches them via `LazyProgram.interp`. Blank lines are skipped, as in
+    `parallel_parser.load_program`.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> lines = ['{"a": 0, "b": 3}', 'bt a 1', 'x = add a b']
+        >>> env, prog = file2cfg_and_env(lines)
+        >>> prog.interp(env).get("x"), len(prog)
+        (3, 2)
+        >>> env, prog = file2cfg_and_env(['{"a": 0, "b": 3}', 'x = add a b', ''])
+        >>> prog.interp(env).get("x"), len(prog)
+        (3, 1)
+    """
+    if not isinstance(lines, MappedLines):
+        lines = [line for line in lines if line and not line.isspace()]
+    return (Env(json.loads(lines[0])), LazyTextProgram(lines[1:]))
+
+
+def load(path):
+    """
+    Maps the text file at `path` into memory, and reads it lazily, as
+    `file2cfg_and_env` does.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return file2cfg_and_env(MappedLines(buffer))
@@ -0,0 +1,355 @@
+"""
+This file implements a data-flow solver that works on all the instructions
+at once, instead of one equation at a time. Facts are rows of a packed bit
+matrix (one row per node, one bit per element of the domain), stored in
+NumPy arrays of 64-bit words. This module requires NumPy, which it imports
+only when it runs (see `numpy`): the other modules of this folder do not
+depend on it.
+
+The solver handles gen/kill problems:
+
+    after[p] = gen[p] | (before[p] & ~kill[p])
+    before[p] = the union of after[q], for each neighbour q of p
+
+where, in forward analyses, `before` is IN, `after` is OUT, and neighbours are
+predecessors; in backward analyses, `before` is OUT, `after` is IN, and
+neighbours are successors. To avoid one sweep per instruction along
+straight-line code, the solver first composes the transfer functions of the
+instructions of each basic block. Then, it iterates Jacobi-style sweeps over
+blocks: each sweep computes the `before` fact of every block out of the
+`after` facts of the previous sweep, with a sparse (CSR) reduction, and then
+applies the transfer function of every block. Once the sweeps reach a fixed
+point, a last pass recovers the facts of each instruction.
+"""
+
+from bitset import Encoding, definitions
+from blocks import basic_blocks as cfg_blocks
+from solver import FORWARD, BACKWARD, successors, name_in, name_out
+
+WORD = "<u8"
+
+
+def numpy():
+    """
+    Imports NumPy, and fails with a clear message if it is not installed.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("matrix.py requires NumPy (pip install numpy)") from None
+    return numpy
+
+
+def pack(rows, num_rows, num_bits):
+    """
+    Builds a bit matrix with `num_rows` rows, where row i has the bits in
+    rows[i] set. Rows not in `rows` are empty.
+
+    Example:
+        >>> m = pack({0: [0, 2], 2: [64]}, 3, 65)
+        >>> m.shape, [int(w) for w in m[:, 0]], [int(w) for w in m[:, 1]]
+        ((3, 2), [5, 0, 0], [0, 0, 1])
+    """
+    np = numpy()
+    matrix = np.zeros((num_rows, (num_bits + 63) // 64), dtype=WORD)
+    coords = [(r, b) for r, bits in rows.items() for b in bits]
+    if coords:
+        r, b = np.array(coords, dtype=np.int64).T
+        words = np.left_shift(np.uint64(1), (b & 63).astype(WORD))
+        np.bitwise_or.at(matrix, (r, b >> 6), words)
+    return matrix
+
+
+def decode(matrix, elements):
+    """
+    Converts each row of a bit matrix into the set of the elements whose bits
+    are set. Only the words that are not zero are unpacked.
+
+    Example:
+        >>> [sorted(s) for s in decode(pack({0: [0, 2], 1: [1]}, 3, 3), 'abc')]
+        [['a', 'c'], ['b'], []]
+    """
+    np = numpy()
+    sets = [set() for _ in range(len(matrix))]
+    rows, words = np.nonzero(matrix)
+    values = np.ascontiguousarray(matrix[rows, words]).view(np.uint8).reshape(-1, 8)
+    which, bits = np.nonzero(np.unpackbits(values, axis=1, bitorder="little"))
+    bits += words[which] * 64
+    for r, b in zip(rows[which].tolist(), bits.tolist()):
+        sets[r].add(elements[b])
+    return sets
+
+
+def meet(facts, indptr, indices):
+    """
+    Computes, for each node i, the union of facts[j], for every j in
+    indices[indptr[i]:indptr[i + 1]]. Nodes without neighbours get an empty
+    row.
+
+    Example:
+        >>> import numpy as np
+        >>> facts = pack({0: [0], 1: [1], 2: [2]}, 3, 3)
+        >>> m = meet(facts, np.array([0, 2, 2, 3]), np.array([1, 2, 0]))
+        >>> [int(w) for w in m[:, 0]]
+        [6, 0, 1]
+    """
+    np = numpy()
+    result = np.zeros((len(indptr) - 1, facts.shape[1]), dtype=WORD)
+    nonempty = indptr[1:] > indptr[:-1]
+    if nonempty.any():
+        starts = indptr[:-1][nonempty]
+        result[nonempty] = np.bitwise_or.reduceat(facts[indices], starts, axis=0)
+    return result
+
+
+class GenKillProblem:
+    """
+    A gen/kill problem on the instructions `insts`. The kill set of each
+    instruction is a row of `kill_rows`, given by `kill_index`; in this way,
+    instructions that kill the same facts (e.g., the definitions of the same
+    variable) share a row. Row 0 of `kill_rows` must be empty.
+    """
+
+    def __init__(self, insts, direction, encoding, gen, kill_rows, kill_index):
+        np = numpy()
+        self.insts = insts
+        self.direction = direction
+        self.encoding = encoding
+        self.gen = gen
+        self.kill_rows = kill_rows
+        self.kill_index = np.asarray(kill_index, dtype=np.int64)
+
+    def flow_preds(self, inst):
+        if self.direction == FORWARD:
+            return inst.preds
+        return successors(inst)
+
+    def flow_succs(self, inst):
+        if self.direction == FORWARD:
+            return successors(inst)
+        return inst.preds
+
+    def keep(self, rows):
+        return ~self.kill_rows[self.kill_index[rows]]
+
+
+def reaching_defs_problem(insts):
+    """
+    Reaching definitions as a gen/kill problem. A definition of v kills every
+    definition of v.
+    """
+    encoding, kill = definitions(insts)
+    variables = {v: i + 1 for i, v in enumerate(kill)}
+    gen = {}
+    kill_index = []
+    for row, inst in enumerate(insts):
+        defs = sorted(inst.definition())
+        assert len(defs) <= 1, "Instructions define at most one variable."
+        gen[row] = [encoding.bit((v, inst.ID)) for v in defs]
+        kill_index.append(variables[defs[0]] if defs else 0)
+    kill_rows = {variables[v]: unpack_int(bits) for v, bits in kill.items()}
+    return GenKillProblem(
+        insts,
+        FORWARD,
+        encoding,
+        pack(gen, len(insts), len(encoding)),
+        pack(kill_rows, len(variables) + 1, len(encoding)),
+        kill_index,
+    )
+
+
+def liveness_problem(insts):
+    """
+    Liveness as a gen/kill problem: gen is the set of variables that an
+    instruction uses, and kill is the set of variables that it defines.
+    """
+    encoding = Encoding()
+    for inst in insts:
+        for v in sorted(inst.uses() | inst.definition()):
+            encoding.bit(v)
+    gen = {row: [encoding.bit(v) for v in inst.uses()] for row, inst in enumerate(insts)}
+    kill_index = []
+    for inst in insts:
+        defs = inst.definition()
+        assert len(defs) <= 1, "Instructions define at most one variable."
+        kill_index.append(encoding.bit(next(iter(defs))) + 1 if defs else 0)
+    kill_rows = {i + 1: [i] for i in range(len(encoding))}
+    return GenKillProblem(
+        insts,
+        BACKWARD,
+        encoding,
+        pack(gen, len(insts), len(encoding)),
+        pack(kill_rows, len(encoding) + 1, len(encoding)),
+        kill_index,
+    )
+
+
+def unpack_int(bits):
+    """
+    The indices of the bits set in a Python integer.
+
+    Example:
+        >>> unpack_int(0b1010)
+        [1, 3]
+    """
+    indices = []
+    while bits:
+        low = bits & -bits
+        indices.append(low.bit_length() - 1)
+        bits ^= low
+    return indices
+
+
+def basic_blocks(problem):
+    """
+    Splits the instructions into basic blocks (see blocks.basic_blocks).
+    Each block is a list of row numbers, in the direction of the analysis.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'x', 'y')
+        >>> i1 = Add('y', 'x', 'y')
+        >>> i2 = Bt('x', i0)
+        >>> i3 = Add('z', 'x', 'y')
+        >>> i0.add_next(i1)
+        >>> i1.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> basic_blocks(reaching_defs_problem([i0, i1, i2, i3]))
+        [[0, 1, 2], [3]]
+        >>> basic_blocks(liveness_problem([i0, i1, i2, i3]))
+        [[2, 1, 0], [3]]
+    """
+    row = {inst.ID: r for r, inst in enumerate(problem.insts)}
+    blocks = [[row[inst.ID] for inst in block] for block in cfg_blocks(problem.insts)]
+    if problem.direction == BACKWARD:
+        blocks = [block[::-1] for block in blocks]
+    return blocks
+
+
+def by_position(blocks):
+    """
+    Groups the rows of the blocks by their position within their block.
+    Returns a list of pairs (rows, owners): rows[j] is at position k of block
+    owners[j].
+
+    Example:
+        >>> [(r.tolist(), o.tolist()) for r, o in by_position([[0, 1], [2], [3, 4]])]
+        [([0, 2, 3], [0, 1, 2]), ([1, 4], [0, 2])]
+    """
+    np = numpy()
+    positions = []
+    for b, block in enumerate(blocks):
+        for k, r in enumerate(block):
+            if k == len(positions):
+                positions.append(([], []))
+            positions[k][0].append(r)
+            positions[k][1].append(b)
+    return [(np.array(rows), np.array(owners)) for rows, owners in positions]
+
+
+def solve(problem):
+    """
+    Solves the gen/kill problem. Returns the bit matrices `before` and
+    `after`, with one row per instruction, plus the number of sweeps until
+    the fixed point.
+    """
+    np = numpy()
+    insts = problem.insts
+    blocks = basic_blocks(problem)
+    positions = by_position(blocks)
+    num_blocks, width = len(blocks), problem.gen.shape[1]
+    # Composes the transfer functions of the instructions of each block:
+    block_gen = np.zeros((num_blocks, width), dtype=WORD)
+    block_keep = np.full((num_blocks, width), np.iinfo(WORD).max, dtype=WORD)
+    for rows, owners in positions:
+        keep = problem.keep(rows)
+        block_gen[owners] = problem.gen[rows] | (block_gen[owners] & keep)
+        block_keep[owners] &= keep
+    # Builds the CSR graph of blocks. Neighbours are the blocks whose last
+    # instruction precedes the first instruction of the block:
+    block_of = {}
+    for b, block in enumerate(blocks):
+        block_of[insts[block[-1]].ID] = b
+    indptr = [0]
+    indices = []
+    for block in blocks:
+        indices.extend(block_of[n.ID] for n in problem.flow_preds(insts[block[0]]))
+        indptr.append(len(indices))
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int64)
+    # Jacobi sweeps:
+    after = block_gen
+    num_sweeps = 0
+    while True:
+        num_sweeps += 1
+        before = meet(after, indptr, indices)
+        new_after = block_gen | (before & block_keep)
+        if np.array_equal(new_after, after):
+            break
+        after = new_after
+    # Recovers the facts of each instruction:
+    inst_before = np.zeros((len(insts), width), dtype=WORD)
+    inst_after = np.zeros((len(insts), width), dtype=WORD)
+    current = before
+    for rows, owners in positions:
+        inst_before[rows] = current[owners]
+        inst_after[rows] = problem.gen[rows] | (current[owners] & problem.keep(rows))
+        current[owners] = inst_after[rows]
+    return inst_before, inst_after, num_sweeps
+
+
+def to_env(problem, before, after):
+    """
+    Converts the bit matrices into an environment that maps names such as
+    'IN_0' and 'OUT_0' to sets, like the environments of dataflow.py.
+    """
+    if problem.direction == FORWARD:
+        name_before, name_after = name_in, name_out
+    else:
+        name_before, name_after = name_out, name_in
+    elements = problem.encoding.elements
+    env = {}
+    for inst, fact in zip(problem.insts, decode(before, elements)):
+        env[name_before(inst.ID)] = fact
+    for inst, fact in zip(problem.insts, decode(after, elements)):
+        env[name_after(inst.ID)] = fact
+    return env
+
+
+PROBLEMS = {"reaching_defs": reaching_defs_problem, "liveness": liveness_problem}
+
+
+def matrix_solve(analysis, insts):
+    """
+    Solves the analysis named `analysis` (a key of PROBLEMS) for `insts`, and
+    returns the environment with the solution, plus the number of sweeps.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from solver import solve
+        >>> from analyses import Liveness, ReachingDefinitions
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> env, num_sweeps = matrix_solve("reaching_defs", insts)
+        >>> sorted(env['IN_1'])
+        [('c', 0), ('c', 3), ('repeat', 1)]
+        >>> env == solve(ReachingDefinitions(), insts)[0]
+        True
+        >>> env, num_sweeps = matrix_solve("liveness", insts)
+        >>> env == solve(Liveness(), insts)[0]
+        True
+    """
+    problem = PROBLEMS[analysis](insts)
+    before, after, num_sweeps = solve(problem)
+    return (to_env(problem, before, after), num_sweeps)
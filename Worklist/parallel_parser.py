@@ -0,0 +1,308 @@
+"""
+This file implements a parallel loader for the large programs used by the
+tools of this lab. It is not a replacement for `parser.py`, which is the
+parser written in the Parsing lab: the driver keeps reading programs with
+that parser. The text format is the same:
+
+    [First line] A dictionary describing the environment
+    [n-th line] The n-th instruction in our program.
+
+Every line, except the first, is parsed independently of all the others. The
+only information that crosses lines are the targets of branches, which are
+given as indices of instructions. Thus, the parser works in three steps:
+
+1. The lines are split into chunks, and each chunk is parsed (in a pool of
+   processes) into a `Table`: a columnar representation of instructions, with
+   one array per field, and a string table for the names of variables.
+   Blank lines are skipped.
+2. The tables are stitched together into a single table, re-numbering the
+   strings of each chunk into a global string table.
+3. The global table is converted into `Inst` objects, and the fall-through
+   edges and branch targets are resolved in linear time.
+"""
+
+import json
+import os
+
+from array import array
+from lang import Env, Inst, Add, Mul, Lth, Geq, Bt
+
+
+OP_ADD, OP_MUL, OP_LTH, OP_GEQ, OP_BT = range(5)
+
+OPCODES = {"add": OP_ADD, "mul": OP_MUL, "lth": OP_LTH, "geq": OP_GEQ}
+
+BIN_OPS = {OP_ADD: Add, OP_MUL: Mul, OP_LTH: Lth, OP_GEQ: Geq}
+
+NO_FIELD = -1
+
+CHUNK_SIZE = 4096
+
+
+class Table:
+    """
+    A columnar representation of a sequence of instructions. Each instruction
+    is a row, and each field of the instructions is a column. Names of
+    variables are stored only once, in the string table `names`; the columns
+    `dst`, `src0` and `src1` contain indices into this table. Fields that do
+    not exist in an instruction are NO_FIELD. The condition of a branch is
+    stored in `src0`, and its target is stored in `targets`.
+
+    Example:
+        >>> t = Table()
+        >>> t.append(OP_ADD, 'x', 'a', 'b')
+        >>> t.append(OP_BT, None, 'x', None, 0)
+        >>> len(t), t.names
+        (2, ['x', 'a', 'b'])
+        >>> list(t.src0), list(t.targets)
+        ([1, 0], [-1, 0])
+    """
+
+    def __init__(self):
+        self.ops = array("b")
+        self.dst = array("l")
+        self.src0 = array("l")
+        self.src1 = array("l")
+        self.targets = array("l")
+        self.names = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self.ops)
+
+    def intern(self, name):
+        """
+        Returns the index of `name` in the string table, adding it there if
+        it is not present yet.
+
+        Example:
+            >>> t = Table()
+            >>> t.intern('x'), t.intern('y'), t.intern('x'), t.intern(None)
+            (0, 1, 0, -1)
+        """
+        if name is None:
+            return NO_FIELD
+        index = self._index.get(name)
+        if index is None:
+            index = len(self.names)
+            self._index[name] = index
+            self.names.append(name)
+        return index
+
+    def append(self, op, dst, src0, src1, target=NO_FIELD):
+        """
+        Adds a new row to the table.
+        """
+        self.ops.append(op)
+        self.dst.append(self.intern(dst))
+        self.src0.append(self.intern(src0))
+        self.src1.append(self.intern(src1))
+        self.targets.append(target)
+
+    def name(self, index):
+        """
+        Returns the string associated with `index` in the string table.
+        """
+        return None if index == NO_FIELD else self.names[index]
+
+    def __getstate__(self):
+        """
+        The dictionary `_index` can be rebuilt out of `names`; hence, we do not
+        send it across processes.
+        """
+        state = self.__dict__.copy()
+        del state["_index"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+
+def line2record(line, table):
+    """
+    Parses one line of text, and appends the corresponding row to `table`.
+
+    Example:
+        >>> t = Table()
+        >>> line2record('x = add a b', t)
+        >>> line2record('bt x 7', t)
+        >>> list(t.ops), list(t.targets)
+        ([0, 4], [-1, 7])
+
+        >>> line2record('x = sub a b', t)
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid instruction: x = sub a b
+    """
+    tokens = line.split()
+    if len(tokens) == 5 and tokens[1] == "=" and tokens[2] in OPCODES:
+        table.append(OPCODES[tokens[2]], tokens[0], tokens[3], tokens[4])
+    elif len(tokens) == 3 and tokens[0] == "bt":
+        table.append(OP_BT, None, tokens[1], None, int(tokens[2]))
+    else:
+        raise ValueError(f"Invalid instruction: {line.strip()}")
+
+
+def parse_chunk(lines):
+    """
+    Parses a list of lines into a table, skipping blank lines. Rows of the
+    table are numbered from zero, regardless of the position of the chunk in
+    the program. Branch targets, however, are kept as absolute instruction
+    indices, as they are written in the text file.
+
+    Example:
+        >>> t = parse_chunk(['x = mul a b', '', 'bt x 0', '  '])
+        >>> len(t), t.names
+        (2, ['x', 'a', 'b'])
+    """
+    table = Table()
+    for line in lines:
+        if line and not line.isspace():
+            line2record(line, table)
+    return table
+
+
+def stitch(tables):
+    """
+    Concatenates a list of tables into a single table, mapping the string
+    table of each chunk into a global string table.
+
+    Example:
+        >>> t0 = parse_chunk(['x = add a b'])
+        >>> t1 = parse_chunk(['y = add x a'])
+        >>> t = stitch([t0, t1])
+        >>> t.names
+        ['x', 'a', 'b', 'y']
+        >>> [t.name(i) for i in t.src0]
+        ['a', 'x']
+    """
+    result = Table()
+    for table in tables:
+        remap = [result.intern(name) for name in table.names]
+        result.ops.extend(table.ops)
+        for src, dst in [
+            (table.dst, result.dst),
+            (table.src0, result.src0),
+            (table.src1, result.src1),
+        ]:
+            dst.extend(NO_FIELD if i == NO_FIELD else remap[i] for i in src)
+        result.targets.extend(table.targets)
+    return result
+
+
+def record2inst(table, i):
+    """
+    Creates the instruction described by the i-th row of `table`. The new
+    instruction is not linked to any other instruction.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> t = parse_chunk(['x = geq a b', 'bt x 0'])
+        >>> record2inst(t, 0).uses() == {'a', 'b'}
+        True
+        >>> record2inst(t, 1).cond
+        'x'
+    """
+    op = table.ops[i]
+    if op == OP_BT:
+        return Bt(table.name(table.src0[i]))
+    return BIN_OPS[op](
+        table.name(table.dst[i]),
+        table.name(table.src0[i]),
+        table.name(table.src1[i]),
+    )
+
+
+def table2insts(table):
+    """
+    Builds the control-flow graph described by `table`. The fall-through edge
+    of each instruction is created first, and then the edge to the target of
+    each branch, so that the predecessors of each instruction appear in the
+    same order as in the sequential parser.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> t = parse_chunk(['c = add zero zero', 'c = add c one', 'bt c 1'])
+        >>> insts = table2insts(t)
+        >>> [p.ID for p in insts[1].preds], insts[2].nexts[0].ID
+        ([0, 2], 1)
+
+        >>> table2insts(parse_chunk(['bt c 3']))
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid branch target: 3
+    """
+    insts = [record2inst(table, i) for i in range(len(table))]
+    for i in range(len(insts) - 1):
+        insts[i].add_next(insts[i + 1])
+    for i, target in enumerate(table.targets):
+        if target != NO_FIELD:
+            if not 0 <= target < len(insts):
+                raise ValueError(f"Invalid branch target: {target}")
+            insts[i].add_true_next(insts[target])
+    return insts
+
+
+def line2env(line):
+    """
+    Maps the first line of a program to an environment.
+
+    Example
+        >>> line2env('{"zero": 0, "one": 1}').get('one')
+        1
+    """
+    return Env(json.loads(line))
+
+
+def split(lines, chunk_size):
+    """
+    Splits a list of lines into chunks with at most `chunk_size` lines.
+
+    Example:
+        >>> split(['a', 'b', 'c', 'd', 'e'], 2)
+        [['a', 'b'], ['c', 'd'], ['e']]
+    """
+    return [lines[i : i + chunk_size] for i in range(0, len(lines), chunk_size)]
+
+
+def parse_table(lines, num_workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Parses the instructions in `lines` (without the environment line) into a
+    single table. Chunks are parsed in a pool of `num_workers` processes; by
+    default, there is only one worker, and no process is created. Passing
+    `num_workers=None` uses one worker per CPU.
+
+    Example:
+        >>> lines = ['x = add a b', 'y = mul x a', 'bt y 0', 'z = lth y x']
+        >>> t = parse_table(lines, num_workers=2, chunk_size=2)
+        >>> len(t), t.names, list(t.targets)
+        (4, ['x', 'a', 'b', 'y', 'z'], [-1, -1, 0, -1])
+    """
+    chunks = split(lines, chunk_size)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if len(chunks) <= 1 or num_workers <= 1:
+        return stitch([parse_chunk(chunk) for chunk in chunks])
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(chunks))) as pool:
+        return stitch(list(pool.map(parse_chunk, chunks)))
+
+
+def load_program(lines, num_workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Returns the environment and the instructions of the program in `lines`,
+    whose first line is the environment. With more than one worker, chunks
+    of the program are parsed in parallel.
+
+    Example:
+        >>> Inst.next_index = 0
+        >>> lines = ['{"n": 2}', 'c = lth n n', 'bt c 0', '', 'd = add c n']
+        >>> env, prog = load_program(lines, num_workers=2, chunk_size=2)
+        >>> len(prog), [p.ID for p in prog[0].preds], env.get('n')
+        (3, [1], 2)
+    """
+    env = line2env(lines[0])
+    table = parse_table(lines[1:], num_workers, chunk_size)
+    return (env, table2insts(table))
@@ -0,0 +1,1011 @@
+"""
+This file implements a generic engine to solve data-flow equations. The engine
+does not depend on the instructions of any particular lab: it only requires
+that equations have three methods:
+
+    name(): the name of the data-flow fact that the equation defines.
+    deps(): the names of the data-flow facts that the equation reads.
+    eval(env): evaluates the equation, and returns True if env changed.
+
+All the equations in our labs (e.g., `ReachingDefs_Bin_OUT_Eq`) follow this
+interface. The engine also produces equations out of a description of an
+analysis: a lattice (bottom, top, join and leq), a direction (forward or
+backward), and a transfer function for each instruction. Instructions, in this
+case, only need the attributes `ID`, `preds` and `nexts`, plus whatever the
+transfer function uses, e.g., `definition()` and `uses()`.
+
+Three solvers are available: `chaotic_solve`, which evaluates every equation
+until no equation changes the environment; `worklist_solve`, which
+re-evaluates an equation only if one of its dependencies has changed; and
+`scc_solve`, which solves the strongly connected components of the
+dependence graph one after the other.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Mapping
+from contextlib import nullcontext
+from graphs import strongly_connected_components
+from strategies import FIFO
+
+FORWARD = "forward"
+
+BACKWARD = "backward"
+
+
+class Universe:
+    """
+    The set of everything. This set is the bottom of lattices whose join is
+    set intersection, e.g., the lattice of must analyses. Contrary to the
+    UniversalSet of the Dominance lab, the universe is not equal to the empty
+    set:
+
+        >>> UNIVERSE == set(), UNIVERSE == UNIVERSE
+        (False, True)
+    """
+
+    def __repr__(self):
+        return "UNIVERSE"
+
+
+UNIVERSE = Universe()
+
+
+class Lattice(ABC):
+    """
+    A semi-lattice of data-flow facts. Solvers start every fact with `bottom`,
+    and combine facts with `join`, moving up in the lattice until reaching a
+    fixed point.
+    """
+
+    @abstractmethod
+    def bottom(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def top(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def join(self, a, b):
+        raise NotImplementedError
+
+    @abstractmethod
+    def leq(self, a, b) -> bool:
+        raise NotImplementedError
+
+
+class UnionLattice(Lattice):
+    """
+    The lattice of may analyses, e.g., liveness and reaching definitions.
+    Facts are sets, and the join is set union.
+
+    Example:
+        >>> l = UnionLattice()
+        >>> sorted(l.join({1, 2}, {2, 3})), l.leq({1}, {1, 2}), l.leq({3}, {1})
+        ([1, 2, 3], True, False)
+        >>> l.leq({1}, l.top())
+        True
+    """
+
+    def bottom(self):
+        return set()
+
+    def top(self):
+        return UNIVERSE
+
+    def join(self, a, b):
+        if a is UNIVERSE or b is UNIVERSE:
+            return UNIVERSE
+        return a | b
+
+    def leq(self, a, b):
+        return b is UNIVERSE or (a is not UNIVERSE and a <= b)
+
+
+class IntersectionLattice(Lattice):
+    """
+    The lattice of must analyses, e.g., dominance and available expressions.
+    Facts are sets, the join is set intersection, and the bottom is the
+    universe.
+
+    Example:
+        >>> l = IntersectionLattice()
+        >>> sorted(l.join({1, 2}, {2, 3})), sorted(l.join(l.bottom(), {1}))
+        ([2], [1])
+        >>> l.leq(l.bottom(), {1}), l.leq({1}, {1, 2})
+        (True, False)
+    """
+
+    def bottom(self):
+        return UNIVERSE
+
+    def top(self):
+        return set()
+
+    def join(self, a, b):
+        if a is UNIVERSE:
+            return b
+        if b is UNIVERSE:
+            return a
+        return a & b
+
+    def leq(self, a, b):
+        return a is UNIVERSE or (b is not UNIVERSE and b <= a)
+
+
+class Analysis(ABC):
+    """
+    The description of a data-flow analysis. Concrete analyses define a
+    lattice, a direction and a transfer function. Facts at the boundary of the
+    program (see `at_boundary`) are given by `boundary`.
+    """
+
+    lattice = UnionLattice()
+
+    direction = FORWARD
+
+    # An analysis is distributive if transfer(inst, a | b) is equal to
+    # transfer(inst, a) | transfer(inst, b). See `delta_solve`.
+    distributive = False
+
+    # Cached solutions (see cache.py) are keyed by the version of the
+    # analysis. Bump it whenever a change alters the solutions.
+    version = 1
+
+    @abstractmethod
+    def transfer(self, inst, fact):
+        """
+        Computes the fact after `inst` (in the direction of the analysis),
+        given the fact before it. This method must not modify `fact`.
+        """
+        raise NotImplementedError
+
+    def boundary(self, inst):
+        return self.lattice.bottom()
+
+    def at_boundary(self, inst, entry):
+        """
+        True if the fact given by `boundary` flows into `inst`. In forward
+        analyses, this is the entry of the program, `entry`, even if it heads
+        a loop, and every instruction without predecessors. In backward
+        analyses, this is every instruction after which the program might
+        end: instructions without successors, and branches with a None
+        successor.
+        """
+        if self.direction == FORWARD:
+            return inst is entry or not inst.preds
+        return not inst.nexts or None in inst.nexts
+
+    def is_identity(self, inst):
+        """
+        True if the transfer function of `inst` returns its input unchanged.
+        """
+        return False
+
+    def equations(self, insts):
+        """
+        Builds the system of equations of this analysis for `insts`: first the
+        transfer equations, and then the join equations.
+        """
+        entry = insts[0] if insts else None
+        transfers = [TransferEq(self, inst) for inst in insts]
+        joins = [JoinEq(self, inst, entry) for inst in insts]
+        return transfers + joins
+
+
+class GenKillAnalysis(Analysis):
+    """
+    An analysis whose transfer functions have the form:
+
+        transfer(p, fact) = gen(p) + (fact - kill(p))
+
+    The kill set of an instruction is a set of keys: an element e of a fact
+    is killed if key(e) is in kill(p). For instance, in reaching definitions,
+    elements are pairs (v, p), their keys are variables, and an instruction
+    that defines v kills every pair (v, _). These analyses are distributive,
+    and their transfer functions can be composed (see blocks.py).
+    """
+
+    distributive = True
+
+    @abstractmethod
+    def gen(self, inst):
+        raise NotImplementedError
+
+    @abstractmethod
+    def kill(self, inst):
+        raise NotImplementedError
+
+    def key(self, element):
+        return element
+
+    def is_identity(self, inst):
+        return not self.gen(inst) and not self.kill(inst)
+
+    def transfer(self, inst, fact):
+        kill = self.kill(inst)
+        kept = {e for e in fact if self.key(e) not in kill} if kill else fact
+        gen = self.gen(inst)
+        return kept | gen if gen else kept
+
+
+def name_in(ID):
+    return f"IN_{ID}"
+
+
+def name_out(ID):
+    return f"OUT_{ID}"
+
+
+def successors(inst):
+    """
+    The successors of `inst`. Branches at the end of a program might have a
+    None successor, which is ignored.
+    """
+    return [n for n in inst.nexts if n is not None]
+
+
+IN = 0
+
+OUT = 1
+
+SIDES = {"IN": IN, "OUT": OUT}
+
+
+class FactTable(Mapping):
+    """
+    The data-flow facts of a program, stored in a list indexed by the pair
+    (instruction, side), where the side is IN or OUT: the IN fact of the
+    instruction in row r is in slot 2 * r, and its OUT fact in slot 2 * r + 1.
+    Solvers read and write `facts` directly, via slots. Names, such as 'IN_0',
+    are only a view of the table, to print it and to compare it with the
+    environments of dataflow.py.
+
+    Example:
+        >>> from lang import Inst, Add
+        >>> Inst.next_index = 0
+        >>> table = FactTable([Add('x', 'a', 'b'), Add('y', 'x', 'x')], set())
+        >>> table.slot('OUT_1'), table.index(1, OUT), table.name(3)
+        (3, 3, 'OUT_1')
+        >>> table['OUT_1'] = {'x'}
+        >>> table.facts
+        [set(), set(), set(), {'x'}]
+        >>> table == {'IN_0': set(), 'OUT_0': set(), 'IN_1': set(), 'OUT_1': {'x'}}
+        True
+        >>> 'OUT_2' in table, 'x' in table
+        (False, False)
+    """
+
+    def __init__(self, insts, bottom):
+        self.ids = [inst.ID for inst in insts]
+        self.row = {ID: r for r, ID in enumerate(self.ids)}
+        self.facts = [bottom] * (2 * len(self.ids))
+
+    def index(self, ID, side):
+        return 2 * self.row[ID] + side
+
+    def slot(self, name):
+        try:
+            side, ID = name.split("_")
+            return self.index(int(ID), SIDES[side])
+        except (KeyError, ValueError):
+            raise KeyError(name)
+
+    def name(self, slot):
+        ID = self.ids[slot // 2]
+        return name_out(ID) if slot % 2 == OUT else name_in(ID)
+
+    def __getitem__(self, name):
+        return self.facts[self.slot(name)]
+
+    def __setitem__(self, name, fact):
+        self.facts[self.slot(name)] = fact
+
+    def add(self, ID, bottom):
+        """
+        Adds the facts of a new instruction to the end of the table.
+        """
+        self.row[ID] = len(self.ids)
+        self.ids.append(ID)
+        self.facts.extend([bottom, bottom])
+
+    def remove(self, ID):
+        """
+        Removes the facts of an instruction. The slots of the other
+        instructions do not change.
+        """
+        r = self.row.pop(ID)
+        self.ids[r] = None
+        self.facts[2 * r] = self.facts[2 * r + 1] = None
+
+    def __iter__(self):
+        for slot in range(len(self.facts)):
+            if self.ids[slot // 2] is not None:
+                yield self.name(slot)
+
+    def __len__(self):
+        return 2 * len(self.row)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class AnalysisEq(ABC):
+    """
+    An equation produced out of an analysis and an instruction. Equations
+    read and write data-flow facts in a dictionary that maps names, such as
+    'IN_0' and 'OUT_0', to facts. Once bound to a FactTable, equations can
+    also be evaluated via `eval_slots`, which reads and writes the list of
+    facts of the table directly, without building names.
+    """
+
+    def __init__(self, analysis, inst):
+        self.analysis = analysis
+        self.inst = inst
+
+    @abstractmethod
+    def name(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def deps(self) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def eval_aux(self, env):
+        raise NotImplementedError
+
+    def eval(self, env) -> bool:
+        name = self.name()
+        old_fact = env[name]
+        env[name] = self.eval_aux(env)
+        return env[name] != old_fact
+
+    def copy_of(self):
+        """
+        The name of the fact that this equation copies, or None if it is not
+        a copy (see collapse.py).
+        """
+        return None
+
+    def bind(self, table):
+        """
+        Finds the slots, in `table`, of the fact that this equation defines,
+        and of the facts that it reads. Subclasses might find the slots from
+        the instruction, without building names.
+        """
+        self.slot = table.slot(self.name())
+        self.dep_slots = [table.slot(dep) for dep in self.deps()]
+
+    @abstractmethod
+    def eval_facts(self, facts):
+        raise NotImplementedError
+
+    def eval_slots(self, facts) -> bool:
+        old_fact = facts[self.slot]
+        new_fact = facts[self.slot] = self.eval_facts(facts)
+        return new_fact != old_fact
+
+    def __str__(self):
+        return f"{self.name()}: {type(self).__name__}({', '.join(self.deps())})"
+
+
+class TransferEq(AnalysisEq):
+    """
+    The equation that applies the transfer function of an instruction: it
+    defines OUT from IN in forward analyses, and IN from OUT in backward
+    analyses.
+    """
+
+    def name(self):
+        if self.analysis.direction == FORWARD:
+            return name_out(self.inst.ID)
+        return name_in(self.inst.ID)
+
+    def deps(self):
+        if self.analysis.direction == FORWARD:
+            return [name_in(self.inst.ID)]
+        return [name_out(self.inst.ID)]
+
+    def eval_aux(self, env):
+        return self.analysis.transfer(self.inst, env[self.deps()[0]])
+
+    def copy_of(self):
+        return self.deps()[0] if self.analysis.is_identity(self.inst) else None
+
+    def bind(self, table):
+        ID = self.inst.ID
+        if self.analysis.direction == FORWARD:
+            self.slot, self.dep_slots = table.index(ID, OUT), [table.index(ID, IN)]
+        else:
+            self.slot, self.dep_slots = table.index(ID, IN), [table.index(ID, OUT)]
+
+    def eval_facts(self, facts):
+        return self.analysis.transfer(self.inst, facts[self.dep_slots[0]])
+
+
+class JoinEq(AnalysisEq):
+    """
+    The equation that combines the facts of neighbours: it defines IN as the
+    join of the OUT facts of the predecessors, in forward analyses, and OUT as
+    the join of the IN facts of the successors, in backward analyses. At the
+    boundary of the program (see `Analysis.at_boundary`), the boundary fact
+    is joined too. `entry` is the first instruction of the program.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> from analyses import Dominance, VeryBusyExpressions
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'a', 'b')
+        >>> i1 = Bt('p')
+        >>> i2 = Add('y', 'x', 'x')
+        >>> i0.add_next(i1)
+        >>> i1.add_true_next(i0)
+        >>> i1.add_next(i2)
+        >>> dom, _ = solve(Dominance(), [i0, i1, i2])
+        >>> dom['IN_0'], dom['OUT_1'], dom['OUT_2']
+        (set(), {0, 1}, {0, 1, 2})
+        >>> i2.preds, i1.nexts = [], [i0, None]
+        >>> busy, _ = solve(VeryBusyExpressions(), [i0, i1])
+        >>> busy['OUT_1'], busy['IN_0']
+        (set(), {('+', 'a', 'b')})
+    """
+
+    def __init__(self, analysis, inst, entry=None):
+        super().__init__(analysis, inst)
+        self.at_boundary = analysis.at_boundary(inst, entry)
+
+    def name(self):
+        if self.analysis.direction == FORWARD:
+            return name_in(self.inst.ID)
+        return name_out(self.inst.ID)
+
+    def deps(self):
+        if self.analysis.direction == FORWARD:
+            return [name_out(pred.ID) for pred in self.inst.preds]
+        return [name_in(succ.ID) for succ in successors(self.inst)]
+
+    def combine(self, facts):
+        lattice = self.analysis.lattice
+        fact = lattice.bottom()
+        if self.at_boundary:
+            fact = self.analysis.boundary(self.inst)
+        for other in facts:
+            fact = lattice.join(fact, other)
+        return fact
+
+    def eval_aux(self, env):
+        return self.combine([env[dep] for dep in self.deps()])
+
+    def copy_of(self):
+        # The join of a single fact with the bottom of the lattice:
+        deps = self.deps()
+        return deps[0] if len(deps) == 1 and not self.at_boundary else None
+
+    def bind(self, table):
+        if self.analysis.direction == FORWARD:
+            self.slot = table.index(self.inst.ID, IN)
+            self.dep_slots = [table.index(pred.ID, OUT) for pred in self.inst.preds]
+        else:
+            self.slot = table.index(self.inst.ID, OUT)
+            succs = successors(self.inst)
+            self.dep_slots = [table.index(succ.ID, IN) for succ in succs]
+
+    def eval_facts(self, facts):
+        return self.combine([facts[slot] for slot in self.dep_slots])
+
+
+class DependenceGraph(Mapping):
+    """
+    The dependence graph of a system of equations: it maps the name of each
+    fact to the list of equations that read it. The graph is built in time
+    linear on the number of dependences: names are indexed once, in a
+    dictionary, and each dependence is visited once. The graph also knows
+    which equation defines each fact, which `to_dot` uses to draw it.
+
+    Example:
+        >>> class Eq:
+        ...     def __init__(self, n, ds): self.n, self.ds = n, ds
+        ...     def name(self): return self.n
+        ...     def deps(self): return self.ds
+        ...     def __str__(self): return self.n
+        >>> g = DependenceGraph([Eq('a', []), Eq('b', ['a']), Eq('c', ['a', 'b'])])
+        >>> {n: [eq.name() for eq in eqs] for n, eqs in g.items()}
+        {'a': ['b', 'c'], 'b': ['c'], 'c': []}
+        >>> [eq.name() for eq in g.dependencies(g.definer['c'])], g.num_edges()
+        (['a', 'b'], 3)
+    """
+
+    def __init__(self, equations):
+        self.equations = equations
+        self.definer = {}
+        self.readers = {}
+        for eq in equations:
+            name = eq.name()
+            self.definer[name] = eq
+            self.readers[name] = []
+        for eq in equations:
+            for dep in eq.deps():
+                readers = self.readers.get(dep)
+                if readers is None:
+                    readers = self.readers[dep] = []
+                readers.append(eq)
+
+    def __getitem__(self, name):
+        return self.readers[name]
+
+    def __iter__(self):
+        return iter(self.readers)
+
+    def __len__(self):
+        return len(self.readers)
+
+    def dependents(self, eq):
+        """
+        The equations that read the fact that `eq` defines.
+        """
+        return self.readers[eq.name()]
+
+    def dependencies(self, eq):
+        """
+        The equations that define the facts that `eq` reads.
+        """
+        return [self.definer[dep] for dep in eq.deps() if dep in self.definer]
+
+    def num_edges(self):
+        return sum(len(readers) for readers in self.readers.values())
+
+    def to_dot(self):
+        """
+        Prints the graph in the DOT format of Graphviz. There is an edge from
+        each equation to the equations that read the fact it defines.
+
+        Example:
+            >>> class Eq:
+            ...     def __init__(self, n, ds): self.n, self.ds = n, ds
+            ...     def name(self): return self.n
+            ...     def deps(self): return self.ds
+            ...     def __str__(self): return f"{self.n} = f({', '.join(self.ds)})"
+            >>> print(DependenceGraph([Eq('a', []), Eq('b', ['a'])]).to_dot())
+            digraph dependences {
+              "a" [label="a = f()"];
+              "b" [label="b = f(a)"];
+              "a" -> "b";
+            }
+        """
+        lines = ["digraph dependences {"]
+        for eq in self.equations:
+            label = str(eq).replace('"', '\\"')
+            lines.append(f'  "{eq.name()}" [label="{label}"];')
+        for name, readers in self.readers.items():
+            for eq in readers:
+                lines.append(f'  "{name}" -> "{eq.name()}";')
+        lines.append("}")
+        return "\n".join(lines)
+
+
+def build_dependence_graph(equations):
+    """
+    Builds the dependence graph of `equations`. See DependenceGraph.
+
+    Example:
+        >>> class Eq:
+        ...     def __init__(self, n, ds): self.n, self.ds = n, ds
+        ...     def name(self): return self.n
+        ...     def deps(self): return self.ds
+        >>> g = build_dependence_graph([Eq('a', []), Eq('b', ['a']), Eq('c', ['a', 'b'])])
+        >>> {n: [eq.name() for eq in eqs] for n, eqs in g.items()}
+        {'a': ['b', 'c'], 'b': ['c'], 'c': []}
+    """
+    return DependenceGraph(equations)
+
+
+def phase(stats, name):
+    """
+    The phase `name` of the instrumentation `stats` (see instrument.py), or
+    a context that measures nothing, if `stats` is None.
+    """
+    return nullcontext() if stats is None else stats.phase(name)
+
+
+def chaotic_solve(equations, env, stats=None):
+    """
+    Evaluates all the equations, in order, until none of them changes `env`.
+    Returns the number of evaluations. If `stats` is given (see
+    instrument.py), it records each evaluation, and each sweep.
+    """
+    num_evals = 0
+    changed = True
+    while changed:
+        changed = False
+        if stats is None:
+            for eq in equations:
+                num_evals += 1
+                changed = eq.eval(env) or changed
+        else:
+            num_changes = 0
+            for eq in equations:
+                num_evals += 1
+                eq_changed = eq.eval(env)
+                stats.record(eq.name(), eq_changed)
+                num_changes += eq_changed
+            stats.sweep(num_changes)
+            changed = num_changes > 0
+    return num_evals
+
+
+def worklist_solve(equations, env, dep_graph=None, strategy=None, stats=None):
+    """
+    Solves the equations with a worklist. Initially, every equation is in the
+    worklist. Once an equation is evaluated, and its evaluation changes `env`,
+    the equations that depend on it are added to the worklist, unless they are
+    already there. The order in which equations leave the worklist is given
+    by `strategy` (see strategies.py); the default is first-in, first-out.
+    Returns the number of evaluations. If `stats` is given, it records each
+    evaluation, and the length of the worklist.
+    """
+    if dep_graph is None:
+        dep_graph = DependenceGraph(equations)
+    worklist = (strategy or FIFO)(equations, dep_graph)
+    for eq in equations:
+        worklist.push(eq)
+    pending = set(map(id, equations))
+    num_evals = 0
+    while worklist:
+        eq = worklist.pop()
+        pending.discard(id(eq))
+        num_evals += 1
+        changed = eq.eval(env)
+        if stats is not None:
+            stats.record(eq.name(), changed, len(worklist))
+        if changed:
+            for dep in dep_graph[eq.name()]:
+                if id(dep) not in pending:
+                    pending.add(id(dep))
+                    worklist.push(dep)
+    return num_evals
+
+
+def solve_components(equations, dependents, evaluate, counts=None, stats=None):
+    """
+    Solves the strongly connected components of the dependence graph in
+    topological order. An equation in an acyclic component is evaluated only
+    once, as its dependences are already solved. The equations of a cyclic
+    component are solved with a worklist that never leaves the component.
+    The function `evaluate(eq)` evaluates `eq`, and returns True if it
+    changed some fact. If `counts` is a list, this function appends to it a
+    pair (size, number of evaluations) for each component. If `stats` is
+    given, it records each evaluation, and the length of the worklist of
+    the component.
+    """
+    num_evals = 0
+    for component in strongly_connected_components(equations, dependents):
+        start = num_evals
+        eq = component[0]
+        if len(component) == 1 and all(dep is not eq for dep in dependents(eq)):
+            changed = evaluate(eq)
+            num_evals += 1
+            if stats is not None:
+                stats.record(eq.name(), changed, 0)
+        else:
+            members = set(map(id, component))
+            worklist = deque(component)
+            pending = set(members)
+            while worklist:
+                eq = worklist.popleft()
+                pending.discard(id(eq))
+                num_evals += 1
+                changed = evaluate(eq)
+                if stats is not None:
+                    stats.record(eq.name(), changed, len(worklist))
+                if changed:
+                    for dep in dependents(eq):
+                        if id(dep) in members and id(dep) not in pending:
+                            pending.add(id(dep))
+                            worklist.append(dep)
+        if counts is not None:
+            counts.append((len(component), num_evals - start))
+    return num_evals
+
+
+def scc_solve(equations, env, dep_graph=None, counts=None, stats=None):
+    """
+    Solves the equations component by component (see `solve_components`).
+    Returns the number of evaluations.
+    """
+    if dep_graph is None:
+        dep_graph = DependenceGraph(equations)
+    return solve_components(
+        equations, dep_graph.dependents, lambda eq: eq.eval(env), counts, stats
+    )
+
+
+SOLVERS = {"chaotic": chaotic_solve, "worklist": worklist_solve, "scc": scc_solve}
+
+
+def interp(equations, method="worklist", bottom=set, dep_graph=None, stats=None):
+    """
+    Solves a system of equations, such as the ones of dataflow.py, with the
+    solver `method` (a key of SOLVERS). Facts start as `bottom()`. Callers
+    that solve the same equations more than once can build their dependence
+    graph once, and pass it as `dep_graph`. Returns the environment with the
+    solution, and the number of evaluations. If
+    `stats` is given (see instrument.py), it also receives the time of each
+    phase, and the sizes of the facts in the solution.
+
+    Example:
+        >>> from lang import Inst, Add, Mul
+        >>> from analyses import ReachingDefinitions
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'a', 'b')
+        >>> i1 = Mul('d', 'c', 'a')
+        >>> i0.add_next(i1)
+        >>> eqs = ReachingDefinitions().equations([i0, i1])
+        >>> (sol, num_evals) = interp(eqs)
+        >>> f"OUT_0: {sorted(sol['OUT_0'])}, Num Evals: {num_evals}"
+        "OUT_0: [('c', 0)], Num Evals: 5"
+        >>> interp(eqs, "chaotic")[0] == sol
+        True
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown solver: {method}")
+    env = {eq.name(): bottom() for eq in equations}
+    if method != "chaotic" and dep_graph is None:
+        with phase(stats, "dependence_graph"):
+            dep_graph = DependenceGraph(equations)
+    with phase(stats, "solve"):
+        if method == "chaotic":
+            num_evals = chaotic_solve(equations, env, stats)
+        else:
+            num_evals = SOLVERS[method](equations, env, dep_graph, stats=stats)
+    if stats is not None:
+        stats.record_facts(env.values())
+    return (env, num_evals)
+
+
+def bind(equations, table):
+    for eq in equations:
+        eq.bind(table)
+
+
+class SlotGraph:
+    """
+    The dependence graph of equations bound to a FactTable: it maps each slot
+    to the equations that read it.
+    """
+
+    def __init__(self, equations, table):
+        self.readers = [[] for _ in table.facts]
+        for eq in equations:
+            for slot in eq.dep_slots:
+                self.readers[slot].append(eq)
+
+    def dependents(self, eq):
+        return self.readers[eq.slot]
+
+
+def indexed_chaotic_solve(equations, table, stats=None):
+    """
+    The same as `chaotic_solve`, but on equations bound to `table`.
+    """
+    facts = table.facts
+    num_evals = 0
+    changed = True
+    while changed:
+        changed = False
+        if stats is None:
+            for eq in equations:
+                num_evals += 1
+                changed = eq.eval_slots(facts) or changed
+        else:
+            num_changes = 0
+            for eq in equations:
+                num_evals += 1
+                eq_changed = eq.eval_slots(facts)
+                stats.record(eq.name(), eq_changed)
+                num_changes += eq_changed
+            stats.sweep(num_changes)
+            changed = num_changes > 0
+    return num_evals
+
+
+def indexed_worklist_solve(equations, table, strategy=None, stats=None):
+    """
+    The same as `worklist_solve`, but on equations bound to `table`. The
+    dependences are indexed by slot, and so is the set of equations in the
+    worklist; hence, the loop of the solver does not touch names.
+    """
+    facts = table.facts
+    dep_graph = SlotGraph(equations, table)
+    readers = dep_graph.readers
+    worklist = (strategy or FIFO)(equations, dep_graph)
+    pending = bytearray(len(facts))
+    for eq in equations:
+        worklist.push(eq)
+        pending[eq.slot] = 1
+    num_evals = 0
+    while worklist:
+        eq = worklist.pop()
+        pending[eq.slot] = 0
+        num_evals += 1
+        changed = eq.eval_slots(facts)
+        if stats is not None:
+            stats.record(eq.name(), changed, len(worklist))
+        if changed:
+            for dep in readers[eq.slot]:
+                if not pending[dep.slot]:
+                    pending[dep.slot] = 1
+                    worklist.push(dep)
+    return num_evals
+
+
+def indexed_scc_solve(equations, table, counts=None, stats=None):
+    """
+    The same as `scc_solve`, but on equations bound to `table`.
+    """
+    facts = table.facts
+    dependents = SlotGraph(equations, table).dependents
+    return solve_components(
+        equations, dependents, lambda eq: eq.eval_slots(facts), counts, stats
+    )
+
+
+def solve(analysis, insts, method="worklist", strategy=None, stats=None):
+    """
+    Solves `analysis` for the program `insts`, and returns the environment
+    with the solution (a FactTable), plus the number of equations that were
+    evaluated. The strategy only matters for the worklist solver. If `stats`
+    is given (see instrument.py), it also receives the time of each phase,
+    and the sizes of the facts in the solution. See analyses.py for examples.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown solver: {method}")
+    with phase(stats, "equations"):
+        equations = analysis.equations(insts)
+    with phase(stats, "bind"):
+        table = FactTable(insts, analysis.lattice.bottom())
+        bind(equations, table)
+    with phase(stats, "solve"):
+        if method == "worklist":
+            num_evals = indexed_worklist_solve(equations, table, strategy, stats)
+        elif method == "scc":
+            num_evals = indexed_scc_solve(equations, table, stats=stats)
+        else:
+            num_evals = indexed_chaotic_solve(equations, table, stats)
+    if stats is not None:
+        stats.record_facts(table.facts)
+    return (table, num_evals)
+
+
+def delta_solve(analysis, insts, stats=None):
+    """
+    Solves a distributive analysis on the union lattice by propagating
+    differences. Instead of recomputing each fact out of the facts of its
+    neighbours, the solver sends to each instruction only the elements that
+    are new to it, and applies the transfer function to these elements only.
+    As the analysis is distributive, the result is the same; however, the
+    work per evaluation is proportional to the size of the change, not to
+    the size of the facts. Returns the FactTable with the solution, and the
+    number of instructions evaluated. If `stats` is given, each evaluation is
+    recorded under the name of the fact that the transfer function defines.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import ReachingDefinitions, Liveness
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> insts = [c0, repeat, bt, c1, answer]
+        >>> table, num_evals = delta_solve(ReachingDefinitions(), insts)
+        >>> sorted(table['IN_1'])
+        [('c', 0), ('c', 3), ('repeat', 1)]
+        >>> table == solve(ReachingDefinitions(), insts)[0]
+        True
+        >>> delta_solve(Liveness(), insts)[0] == solve(Liveness(), insts)[0]
+        True
+    """
+    if not (isinstance(analysis.lattice, UnionLattice) and analysis.distributive):
+        raise ValueError("Delta propagation requires a distributive union analysis.")
+    table = FactTable(insts, None)
+    row = table.row
+    if analysis.direction == FORWARD:
+        before_side, after_side = IN, OUT
+        targets = [[row[n.ID] for n in successors(inst)] for inst in insts]
+    else:
+        before_side, after_side = OUT, IN
+        targets = [[row[n.ID] for n in inst.preds] for inst in insts]
+    before = [set() for _ in insts]
+    after = [set() for _ in insts]
+    entry = insts[0] if insts else None
+    incoming = [
+        set(analysis.boundary(inst)) if analysis.at_boundary(inst, entry) else set()
+        for inst in insts
+    ]
+    # Instructions are visited in the direction of the analysis:
+    order = range(len(insts))
+    worklist = deque(order if analysis.direction == FORWARD else reversed(order))
+    queued = bytearray([1]) * len(insts)
+    num_evals = 0
+    with phase(stats, "solve"):
+        while worklist:
+            r = worklist.popleft()
+            queued[r] = 0
+            num_evals += 1
+            delta = incoming[r] - before[r]
+            incoming[r] = set()
+            before[r] |= delta
+            new = analysis.transfer(insts[r], delta) - after[r]
+            if stats is not None:
+                name = table.name(table.index(insts[r].ID, after_side))
+                stats.record(name, bool(new), len(worklist))
+            if new:
+                after[r] |= new
+                for t in targets[r]:
+                    incoming[t] |= new
+                    if not queued[t]:
+                        queued[t] = 1
+                        worklist.append(t)
+    for r, inst in enumerate(insts):
+        table.facts[table.index(inst.ID, before_side)] = before[r]
+        table.facts[table.index(inst.ID, after_side)] = after[r]
+    if stats is not None:
+        stats.record_facts(table.facts)
+    return (table, num_evals)
+
+
+def scc_report(analysis, insts):
+    """
+    Solves `analysis` component by component, and reports how many
+    components the dependence graph has, how many of them are acyclic (and
+    hence evaluated once), and the sizes and evaluations of the cyclic ones.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import Liveness
+        >>> Inst.next_index = 0
+        >>> c0 = Add('c', 'zero', 'zero')
+        >>> repeat = Lth('repeat', 'c', 'N')
+        >>> bt = Bt('repeat')
+        >>> c1 = Add('c', 'c', 'one')
+        >>> answer = Add('answer', 'c', 'zero')
+        >>> c0.add_next(repeat)
+        >>> repeat.add_next(bt)
+        >>> bt.add_next(answer)
+        >>> bt.add_true_next(c1)
+        >>> c1.add_next(repeat)
+        >>> scc_report(Liveness(), [c0, repeat, bt, c1, answer])
+        {'components': 5, 'acyclic': 4, 'cyclic': [(6, 10)], 'num_evals': 14}
+    """
+    equations = analysis.equations(insts)
+    table = FactTable(insts, analysis.lattice.bottom())
+    bind(equations, table)
+    counts = []
+    num_evals = indexed_scc_solve(equations, table, counts)
+    cyclic = [(size, evals) for size, evals in counts if size > 1 or evals > 1]
+    return {
+        "components": len(counts),
+        "acyclic": len(counts) - len(cyclic),
+        "cyclic": cyclic,
+        "num_evals": num_evals,
+    }
+
+
+def compare(analysis, insts):
+    """
+    Solves `analysis` with every solver, and reports the number of
+    evaluations of each one, and whether they all found the same solution.
+    """
+    results = {method: solve(analysis, insts, method) for method in SOLVERS}
+    envs = [env for env, _ in results.values()]
+    report = {method: num_evals for method, (_, num_evals) in results.items()}
+    report["same"] = all(env == envs[0] for env in envs)
+    return report
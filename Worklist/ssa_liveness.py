@@ -0,0 +1,241 @@
+"""
+This file computes liveness analysis for programs in Static Single Assignment
+form without iterating data-flow equations. It implements the two passes of
+Boissinot et al. ("Computing Liveness Sets for SSA-Form Programs", 2011):
+
+    1. A backward pass over the control-flow graph without its back edges.
+       As this graph is acyclic, visiting instructions in post-order computes
+       every fact in one step.
+    2. A pass over the loop-nesting forest: a variable that is alive at the
+       entry of a loop header, and that is not defined in the loop, is alive
+       everywhere in the loop.
+
+The passes are correct for variables whose unique definition dominates all
+their uses, in programs with reducible control-flow graphs. Other variables
+(e.g., variables defined more than once, or the arguments of phi-functions
+that come through back edges) are solved by walking backwards from their
+uses, up to their definitions. The result is the same as the
+solution of liveness analysis by the iterative solvers.
+
+This file is not part of the assignment: it only relies on the methods
+`definition` and `uses`, plus the attributes `ID`, `preds` and `nexts`, of
+instructions. Hence, it also handles the SSA dialects of other labs, whose
+phi-functions return a string as their definition, and a list as uses.
+"""
+
+import graphs
+
+from dataflow import name_in, name_out
+from graphs import immediate_dominators, postorder
+from solver import successors
+
+
+def as_set(names):
+    """
+    The variables in `names`, which might be a single name, or a collection
+    of names and constants.
+
+    Example:
+        >>> as_set('x'), sorted(as_set(['a', 1, 'b', 'a']))
+        ({'x'}, ['a', 'b'])
+    """
+    if isinstance(names, str):
+        return {names}
+    return {name for name in names if isinstance(name, str)}
+
+
+class DominatorTree:
+    """
+    The dominator tree of the instructions reachable from `entry`. Each node
+    is numbered in a depth-first traversal of the tree, so that `dominates`
+    is answered in constant time.
+    """
+
+    def __init__(self, entry):
+        self.idom = immediate_dominators(entry, successors)
+        children = {inst: [] for inst in self.idom}
+        for inst, parent in self.idom.items():
+            if inst is not entry:
+                children[parent].append(inst)
+        self.pre = {}
+        self.post = {}
+        stack = [(entry, iter(children[entry]))]
+        self.pre[entry] = 0
+        while stack:
+            inst, kids = stack[-1]
+            for kid in kids:
+                self.pre[kid] = len(self.pre)
+                stack.append((kid, iter(children[kid])))
+                break
+            else:
+                stack.pop()
+                self.post[inst] = len(self.post)
+
+    def __contains__(self, inst):
+        return inst in self.idom
+
+    def dominates(self, a, b):
+        return self.pre[a] <= self.pre[b] and self.post[b] <= self.post[a]
+
+
+class SSALiveness:
+    """
+    The IN and OUT sets of liveness analysis, indexed by instruction ID. The
+    attribute `strict` contains the variables solved by the two passes, and
+    `other` contains the variables solved by walking backwards.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import Liveness
+        >>> from solver import solve
+        >>> Inst.next_index = 0
+        >>> i0 = Add('a', 'x', 'x')
+        >>> i1 = Add('b', 'a', 'one')
+        >>> i2 = Lth('c', 'b', 'a')
+        >>> i3 = Bt('c', i1)
+        >>> i4 = Add('b', 'a', 'b')
+        >>> i0.add_next(i1)
+        >>> i1.add_next(i2)
+        >>> i2.add_next(i3)
+        >>> i3.add_next(i4)
+        >>> insts = [i0, i1, i2, i3, i4]
+        >>> live = SSALiveness(insts)
+        >>> sorted(live.strict), sorted(live.other)
+        (['a', 'c', 'one', 'x'], ['b'])
+        >>> sorted(live.live_in[1]), sorted(live.live_out[3])
+        (['a', 'one'], ['a', 'b', 'one'])
+        >>> live.to_env() == solve(Liveness(), insts)[0]
+        True
+    """
+
+    def __init__(self, insts):
+        self.insts = insts
+        self.defs = {inst.ID: as_set(inst.definition()) for inst in insts}
+        self.uses = {inst.ID: as_set(inst.uses()) for inst in insts}
+        self.live_in = {inst.ID: set() for inst in insts}
+        self.live_out = {inst.ID: set() for inst in insts}
+        self.strict = set()
+        self.other = set()
+        if insts:
+            self.solve()
+
+    def classify(self, dom, back_edges):
+        """
+        Splits the variables into `strict` and `other`. A variable is strict
+        if it has only one definition, which dominates all its uses, or if it
+        is an input of the program, which is never defined. If the
+        control-flow graph is not reducible, or if some instruction is
+        unreachable, then no variable is strict.
+        """
+        definer = {}
+        users = {}
+        for inst in self.insts:
+            for v in self.defs[inst.ID]:
+                definer[v] = None if v in definer else inst
+            for v in self.uses[inst.ID]:
+                users.setdefault(v, []).append(inst)
+        variables = set(definer) | set(users)
+        reducible = all(dom.dominates(h, u) for u, h in back_edges)
+        if not reducible or len(dom.idom) < len(self.insts):
+            self.other = variables
+            return
+        for v in variables:
+            d = definer.get(v)
+            if v not in definer:
+                # Inputs of the program are defined before its first
+                # instruction; hence, their definition dominates every use.
+                self.strict.add(v)
+            elif d is not None and all(
+                u is not d and dom.dominates(d, u) for u in users.get(v, [])
+            ):
+                self.strict.add(v)
+            else:
+                self.other.add(v)
+
+    def solve(self):
+        entry = self.insts[0]
+        dom = DominatorTree(entry)
+        order = postorder([entry], successors)
+        back_edges = graphs.back_edges([entry], successors)
+        self.classify(dom, back_edges)
+        if self.strict:
+            self.dag_pass(order, set(back_edges))
+            self.loop_pass(back_edges)
+        for v in self.other:
+            self.explore(v)
+
+    def dag_pass(self, order, back_edges):
+        """
+        Computes the facts of the strict variables on the graph without back
+        edges, in post-order, so that successors come before predecessors.
+        """
+        strict = self.strict
+        for inst in order:
+            out = self.live_out[inst.ID]
+            for succ in successors(inst):
+                if (inst, succ) not in back_edges:
+                    out |= self.live_in[succ.ID]
+            self.live_in[inst.ID] = (
+                (out - self.defs[inst.ID]) | (self.uses[inst.ID] & strict)
+            )
+
+    def loop_pass(self, back_edges):
+        """
+        Propagates the variables alive at the entry of each loop header to
+        the whole body of the loop. Loops that share a header are merged.
+        """
+        latches = {}
+        for latch, header in back_edges:
+            latches.setdefault(header, []).append(latch)
+        for header in latches:
+            live_loop = set(self.live_in[header.ID])
+            if not live_loop:
+                continue
+            body = {header}
+            worklist = [l for l in latches[header] if l is not header]
+            body.update(worklist)
+            while worklist:
+                inst = worklist.pop()
+                for pred in inst.preds:
+                    if pred not in body:
+                        body.add(pred)
+                        worklist.append(pred)
+            for inst in body:
+                self.live_in[inst.ID] |= live_loop
+                self.live_out[inst.ID] |= live_loop
+
+    def explore(self, var):
+        """
+        Finds where `var` is alive by walking backwards from its uses,
+        stopping at its definitions.
+        """
+        worklist = [inst for inst in self.insts if var in self.uses[inst.ID]]
+        for inst in worklist:
+            self.live_in[inst.ID].add(var)
+        while worklist:
+            inst = worklist.pop()
+            for pred in inst.preds:
+                if var in self.live_out[pred.ID]:
+                    continue
+                self.live_out[pred.ID].add(var)
+                if var not in self.defs[pred.ID] and var not in self.live_in[pred.ID]:
+                    self.live_in[pred.ID].add(var)
+                    worklist.append(pred)
+
+    def to_env(self):
+        """
+        The solution as an environment, like the ones of the solvers.
+        """
+        env = {}
+        for inst in self.insts:
+            env[name_in(inst.ID)] = self.live_in[inst.ID]
+            env[name_out(inst.ID)] = self.live_out[inst.ID]
+        return env
+
+
+def ssa_liveness(insts):
+    """
+    Solves liveness analysis for `insts`, and returns the environment that
+    maps names such as 'IN_0' to sets of variables.
+    """
+    return SSALiveness(insts).to_env()
@@ -0,0 +1,324 @@
+"""
+This file implements the strategies that determine the order in which the
+worklist solver evaluates equations. A strategy is a worklist: a container of
+equations with the methods `push` and `pop`. The solver never pushes an
+equation that is already in the worklist. Strategies are created out of the
+list of equations and of their dependence graph, which some of them use to
+compute priorities.
+
+The order of evaluation has a large impact on the number of evaluations that
+the solver performs until reaching a fixed point. The class
+`StrategySelector` picks, for each shape of program, the strategy that runs
+faster.
+"""
+
+import heapq
+import time
+
+from collections import deque
+from graphs import back_edges, postorder, strongly_connected_components
+
+
+class Strategy:
+    """
+    The interface of worklists.
+    """
+
+    name = "strategy"
+
+    def __init__(self, equations, dep_graph):
+        pass
+
+    def push(self, eq):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class FIFO(Strategy):
+    """
+    Equations leave the worklist in the order in which they enter it.
+    """
+
+    name = "fifo"
+
+    def __init__(self, equations, dep_graph):
+        self.queue = deque()
+
+    def push(self, eq):
+        self.queue.append(eq)
+
+    def pop(self):
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class LIFO(Strategy):
+    """
+    The last equation that enters the worklist is the first one to leave it.
+    """
+
+    name = "lifo"
+
+    def __init__(self, equations, dep_graph):
+        self.stack = []
+
+    def push(self, eq):
+        self.stack.append(eq)
+
+    def pop(self):
+        return self.stack.pop()
+
+    def __len__(self):
+        return len(self.stack)
+
+
+def dependents(dep_graph):
+    """
+    Returns the function that maps an equation to the equations that depend
+    on it. Dependence graphs, such as solver.DependenceGraph and
+    solver.SlotGraph, provide this function as the method `dependents`.
+    """
+    return dep_graph.dependents
+
+
+class Priority(Strategy):
+    """
+    Equations leave the worklist in the order of their ranks: the equation
+    with the smallest rank leaves first. Concrete strategies determine the
+    rank of each equation via the method `ranks`.
+    """
+
+    def __init__(self, equations, dep_graph):
+        self.rank = {id(eq): r for r, eq in enumerate(self.ranks(equations, dep_graph))}
+        self.heap = []
+        self.counter = 0
+
+    def ranks(self, equations, dep_graph):
+        raise NotImplementedError
+
+    def push(self, eq):
+        self.counter += 1
+        heapq.heappush(self.heap, (self.rank[id(eq)], self.counter, eq))
+
+    def pop(self):
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class ReversePostorder(Priority):
+    """
+    Ranks equations in reverse post-order of the dependence graph. Thus, an
+    equation is evaluated only after the equations that it depends on, except
+    along back edges.
+    """
+
+    name = "rpo"
+
+    def ranks(self, equations, dep_graph):
+        return postorder(equations, dependents(dep_graph))[::-1]
+
+
+def successors(inst):
+    return [succ for succ in inst.nexts if succ is not None]
+
+
+def predecessors(inst):
+    return inst.preds
+
+
+class Postorder(Priority):
+    """
+    The order of backward analyses: ranks equations by the position of their
+    instructions in reverse post-order of the reversed control-flow graph,
+    which starts at the instructions without successors. Thus, information
+    flows from the end of the program towards its beginning. Among the
+    equations of the same instruction, the ones that read facts of that
+    instruction come last.
+
+    Example:
+        >>> from lang import Inst, Add, Lth, Bt
+        >>> from analyses import Liveness
+        >>> from solver import DependenceGraph
+        >>> Inst.next_index = 0
+        >>> i0 = Add('c', 'zero', 'zero')
+        >>> i1 = Lth('p', 'c', 'n')
+        >>> i2 = Bt('p')
+        >>> i3 = Add('c', 'c', 'one')
+        >>> i4 = Add('r', 'c', 'zero')
+        >>> for inst, succ in [(i0, i1), (i1, i2), (i2, i4), (i3, i1)]:
+        ...     inst.add_next(succ)
+        >>> i2.add_true_next(i3)
+        >>> eqs = Liveness().equations([i0, i1, i2, i3, i4])
+        >>> graph = DependenceGraph(eqs)
+        >>> [eq.name() for eq in Postorder(eqs, graph).ranks(eqs, graph)]
+        ['OUT_4', 'IN_4', 'OUT_2', 'IN_2', 'OUT_1', 'IN_1', 'OUT_3', 'IN_3', 'OUT_0', 'IN_0']
+    """
+
+    name = "po"
+
+    def ranks(self, equations, dep_graph):
+        insts = []
+        seen = set()
+        for eq in equations:
+            if id(eq.inst) not in seen:
+                seen.add(id(eq.inst))
+                insts.append(eq.inst)
+        exits = [inst for inst in insts if not successors(inst)]
+        order = postorder(exits + insts, predecessors)[::-1]
+        position = {id(inst): i for i, inst in enumerate(order)}
+        defined = {}
+        for eq in equations:
+            defined.setdefault(id(eq.inst), set()).add(eq.name())
+
+        def rank(eq):
+            own = defined[id(eq.inst)]
+            return (position[id(eq.inst)], sum(dep in own for dep in eq.deps()))
+
+        return sorted(equations, key=rank)
+
+
+class SCCThenRPO(Priority):
+    """
+    Ranks equations by the strongly connected component of the dependence
+    graph that contains them, in topological order, and then, within each
+    component, in reverse post-order. Thus, the solver stabilizes each
+    component before moving on to the next one.
+    """
+
+    name = "scc_rpo"
+
+    def ranks(self, equations, dep_graph):
+        succs = dependents(dep_graph)
+        rpo = postorder(equations, succs)[::-1]
+        position = {id(eq): i for i, eq in enumerate(rpo)}
+        ranks = []
+        for component in strongly_connected_components(rpo, succs):
+            ranks.extend(sorted(component, key=lambda eq: position[id(eq)]))
+        return ranks
+
+
+class RoundRobin(ReversePostorder):
+    """
+    Evaluates equations in sweeps: each sweep visits the pending equations in
+    reverse post-order. Equations pushed during a sweep are visited in the
+    same sweep, if they come after the current equation; otherwise, they are
+    visited in the next sweep.
+    """
+
+    name = "round_robin"
+
+    def __init__(self, equations, dep_graph):
+        super().__init__(equations, dep_graph)
+        self.next_sweep = []
+        self.position = -1
+
+    def push(self, eq):
+        self.counter += 1
+        rank = self.rank[id(eq)]
+        heap = self.heap if rank > self.position else self.next_sweep
+        heapq.heappush(heap, (rank, self.counter, eq))
+
+    def pop(self):
+        if not self.heap:
+            self.heap, self.next_sweep = self.next_sweep, []
+        rank, _, eq = heapq.heappop(self.heap)
+        self.position = rank
+        return eq
+
+    def __len__(self):
+        return len(self.heap) + len(self.next_sweep)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in [FIFO, LIFO, ReversePostorder, Postorder, SCCThenRPO, RoundRobin]
+}
+
+
+def program_shape(analysis, insts):
+    """
+    A coarse description of a program, used to group programs for which the
+    same strategy is likely to be the best one: the direction of the
+    analysis, the order of magnitude of the number of instructions, and the
+    density of branches and of back edges (in tenths). Back edges are the
+    ones of a depth-first search of the control-flow graph, so they do not
+    depend on the numbering of instructions.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> from analyses import Liveness
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'x', 'y')
+        >>> i1 = Bt('x', i0)
+        >>> i0.add_next(i1)
+        >>> program_shape(Liveness(), [i0, i1])
+        ('backward', 2, 5, 5)
+    """
+    num_branches = sum(1 for inst in insts if len(inst.nexts) > 1)
+    num_back_edges = len(back_edges(insts, successors))
+    size = max(len(insts), 1)
+    return (
+        analysis.direction,
+        size.bit_length(),
+        round(10 * num_branches / size),
+        round(10 * num_back_edges / size),
+    )
+
+
+def benchmark_strategies(analysis, insts, strategies=STRATEGIES):
+    """
+    Solves `analysis` with each strategy, and returns a dictionary that maps
+    the name of each strategy to its number of evaluations and wall time.
+    """
+    from solver import solve
+
+    report = {}
+    for name, strategy in strategies.items():
+        start = time.perf_counter()
+        _, num_evals = solve(analysis, insts, strategy=strategy)
+        report[name] = {"num_evals": num_evals, "time": time.perf_counter() - start}
+    return report
+
+
+class StrategySelector:
+    """
+    Picks the fastest strategy for each shape of program. The first time that
+    the selector sees a shape, it benchmarks every strategy on the program;
+    afterwards, it reuses the winner for every program with the same shape.
+
+    Example:
+        >>> from lang import Inst, Add, Bt
+        >>> from analyses import ReachingDefinitions
+        >>> Inst.next_index = 0
+        >>> i0 = Add('x', 'x', 'y')
+        >>> i1 = Bt('x', i0)
+        >>> i0.add_next(i1)
+        >>> selector = StrategySelector()
+        >>> selector.select(ReachingDefinitions(), [i0, i1]) in STRATEGIES.values()
+        True
+        >>> sorted(selector.reports[('forward', 2, 5, 5)])
+        ['fifo', 'lifo', 'po', 'round_robin', 'rpo', 'scc_rpo']
+    """
+
+    def __init__(self, strategies=STRATEGIES):
+        self.strategies = strategies
+        self.best = {}
+        self.reports = {}
+
+    def select(self, analysis, insts):
+        shape = program_shape(analysis, insts)
+        if shape not in self.best:
+            report = benchmark_strategies(analysis, insts, self.strategies)
+            winner = min(report, key=lambda name: report[name]["time"])
+            self.best[shape] = self.strategies[winner]
+            self.reports[shape] = report
+        return self.best[shape]